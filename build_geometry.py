@@ -0,0 +1,111 @@
+"""Build the bundled Africa geometry used by the Maps tab.
+
+Reads a Natural Earth admin-0 countries GeoJSON (any scale; 1:50m is a
+good source), keeps the ``pipeline.african_targets`` countries, simplifies
+every ring with Douglas-Peucker and rounds coordinates, then writes a
+compact GeoJSON keyed by ``properties.ISO_A3``:
+
+    python build_geometry.py ne_50m_admin_0_countries.geojson
+
+The output (``assets/africa_targets.geojson`` by default) is not shipped
+with the app; once it is built, rendering never fetches map data from
+the network.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import country_converter as coco
+
+import maps
+import pipeline
+
+
+def simplify(ring, tolerance):
+    """Douglas-Peucker simplification of one closed ring (n x 2 array)."""
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg = ring[end] - ring[start]
+        pts = ring[start + 1:end] - ring[start]
+        norm = np.hypot(*seg)
+        if norm:
+            dist = np.abs(seg[0] * pts[:, 1] - seg[1] * pts[:, 0]) / norm
+        else:
+            dist = np.hypot(pts[:, 0], pts[:, 1])
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            keep[start + 1 + i] = True
+            stack += [(start, start + 1 + i), (start + 1 + i, end)]
+    return ring[keep]
+
+
+def simplify_polygon(polygon, tolerance, digits):
+    out = []
+    for ring in polygon:
+        r = np.round(simplify(np.asarray(ring, dtype=float), tolerance), digits)
+        # Drop repeated points left by rounding; a ring needs 4 points
+        r = r[np.r_[True, np.any(np.diff(r, axis=0) != 0, axis=1)]]
+        if len(r) >= 4:
+            out.append(r.tolist())
+    return out
+
+
+def build(source, tolerance, digits):
+    iso = dict(zip(
+        sorted(pipeline.african_targets),
+        coco.CountryConverter().convert(names=sorted(pipeline.african_targets), to="ISO3", not_found=None),
+    ))
+    for name, code in iso.items():
+        iso[name] = code or pipeline.fuzzy_iso(name)
+    wanted = {code: name for name, code in iso.items() if code}
+
+    features = []
+    for feature in source["features"]:
+        props = feature["properties"]
+        code = props.get("ISO_A3")
+        if code in (None, "-99"):
+            code = props.get("ADM0_A3")
+        if code not in wanted:
+            continue
+        geom = feature["geometry"]
+        polygons = geom["coordinates"] if geom["type"] == "MultiPolygon" else [geom["coordinates"]]
+        polygons = [p for p in (simplify_polygon(p, tolerance, digits) for p in polygons) if p]
+        features.append({
+            "type": "Feature",
+            "properties": {"ISO_A3": code, "Country": wanted[code]},
+            "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+        })
+
+    missing = sorted(set(wanted) - {f["properties"]["ISO_A3"] for f in features})
+    return {"type": "FeatureCollection", "features": features}, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("source", help="Natural Earth admin-0 countries GeoJSON")
+    parser.add_argument("--out", default=maps.GEOMETRY_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="simplification tolerance in degrees")
+    parser.add_argument("--digits", type=int, default=3, help="decimal places kept in coordinates")
+    args = parser.parse_args()
+
+    with open(args.source, encoding="utf-8") as f:
+        geometry, missing = build(json.load(f), args.tolerance, args.digits)
+    if missing:
+        print(f"warning: no geometry for {', '.join(missing)}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(geometry, f, separators=(",", ":"))
+    points = sum(len(r) for feat in geometry["features"] for p in feat["geometry"]["coordinates"] for r in p)
+    print(f"{len(geometry['features'])} countries, {points} points, "
+          f"{os.path.getsize(args.out) / 1024:.1f} KiB -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Cooperative cancellation of superseded reruns.
+
+Every widget change starts a new script run; Streamlit stops the previous
+run only when it next talks to the frontend, so a run busy in pandas or
+plotly keeps going until its next ``st.*`` call. ``checkpoint`` is an
+explicit yield point: reading session state makes Streamlit check for a
+pending rerun and raise its RerunException, which ends the superseded run
+there. The results page calls it between tab builders and inside the
+heavy loops.
+
+``debounce`` holds a changed selection for ``DASHBOARD_DEBOUNCE`` seconds
+(default 0.3) at a checkpoint before anything is computed for it, so a
+burst of clicks only renders the last selection.
+
+Counters (per server process) are shown in the results page diagnostics.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+import streamlit as st
+from streamlit.runtime.scriptrunner_utils.exceptions import ScriptControlException
+
+
+DEBOUNCE_SECONDS = float(os.environ.get("DASHBOARD_DEBOUNCE", 0.3))
+
+_lock = threading.Lock()
+_counts = Counter()
+_cancelled_at = Counter()
+
+
+def count(name, n=1):
+    with _lock:
+        _counts[name] += n
+
+
+def checkpoint(stage):
+    """End this run here if a newer rerun of the session is pending."""
+    try:
+        st.session_state.get("_checkpoint")
+    except ScriptControlException:
+        with _lock:
+            _counts["cancelled"] += 1
+            _cancelled_at[stage] += 1
+        raise
+
+
+def debounce(name, value, seconds=DEBOUNCE_SECONDS):
+    """Wait ``seconds`` when ``value`` differs from the last one seen, yielding
+    to newer reruns meanwhile."""
+    last_key = f"_debounce_{name}"
+    if last_key not in st.session_state:
+        st.session_state[last_key] = value
+    if st.session_state[last_key] == value:
+        return
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        time.sleep(min(0.05, seconds))
+        checkpoint(f"{name} (debounced)")
+    st.session_state[last_key] = value
+
+
+def snapshot():
+    """Counters so far: runs, completed, cancelled and cancellations per stage."""
+    with _lock:
+        return dict(_counts), dict(_cancelled_at)
@@ -0,0 +1,170 @@
+"""Crosstabs of any two categorical fields, served from a cube of codes.
+
+``build_cube`` encodes every categorical field of the site frame once per
+dataset (alongside the metrics bundle): Country, the harmonized survey
+answers with few distinct values, and the derived flags and scores. Each
+field becomes an integer code array plus its levels, in numeric order for
+numbers and natural order ("2" before "10") for text. A crosstab of
+two fields is then ``np.bincount`` over the combined code
+``row * n_cols + col``, counted once per field pair; a measure adds one
+weighted bincount over the same codes. Results are memoized on the cube,
+which every session of the dataset shares.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import pipeline
+
+
+# Survey columns with more distinct answers than this are free text
+MAX_LEVELS = 20
+BLANK = "(blank)"
+
+STATS = ("Mean", "Sum")
+
+
+def flag_names(definitions):
+    """Metrics that are yes/no flags: bool, or a yes/binary read reduced with any/max/min.
+
+    Scores (sums, means) are not flags even when a dataset only has 0 and 1.
+    """
+    flags = set()
+    for d in definitions:
+        if d.get("dtype") == "bool":
+            flags.add(d["name"])
+        elif d.get("agg") in ("any", "max", "min") and (
+                d.get("read") in ("yes", "binary") or ("inputs" in d and set(d["inputs"]) <= flags)):
+            flags.add(d["name"])
+    return flags
+
+
+def _labels(values, flag):
+    if values.dtype == bool or flag:
+        return values.astype(bool).map({True: "Yes", False: "No"})
+    return values.astype(str).str.strip().replace("", BLANK)
+
+
+def _level_key(numeric):
+    """Sort key of a level label: by value for numeric fields, else natural."""
+    def key(label):
+        if numeric:
+            try:
+                value = float(label)
+            except ValueError:
+                value = math.nan
+            if not math.isnan(value):
+                return (0, value, ())
+        if label in (BLANK, "nan"):
+            return (2, 0, ())
+        # Natural order: digit runs compare as numbers, the rest case-insensitively
+        parts = tuple((0, int(t), "") if t.isdigit() else (1, 0, t.lower())
+                      for t in re.split(r"(\d+)", label) if t)
+        return (1, 0, parts)
+    return key
+
+
+def encode(values, flag=False):
+    """Integer codes and ordered levels of one field (Yes/No for flags)."""
+    labels = _labels(values, flag)
+    codes, levels = pd.factorize(labels)
+    numeric = pd.api.types.is_numeric_dtype(values) and values.dtype != bool
+    key = _level_key(numeric)
+    order = sorted(range(len(levels)), key=lambda i: key(levels[i]))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[codes], np.asarray(levels, dtype=object)[order]
+
+
+class Cube:
+    """Categorical codes and numeric measures of one dataset's sites."""
+
+    def __init__(self, fields, measures):
+        # fields: {name: (codes, levels)}; measures: {name: float array}
+        self.fields = fields
+        self.measures = measures
+        self._counts = {}
+        self._sums = {}
+
+    def _combined(self, row, col):
+        rows, row_levels = self.fields[row]
+        cols, col_levels = self.fields[col]
+        return rows * len(col_levels) + cols, (len(row_levels), len(col_levels))
+
+    def counts(self, row, col):
+        """Sites per (row level, column level), as an array (memoized)."""
+        key = (row, col)
+        if key not in self._counts:
+            combined, shape = self._combined(row, col)
+            self._counts[key] = np.bincount(combined, minlength=shape[0] * shape[1]).reshape(shape)
+        return self._counts[key]
+
+    def sums(self, row, col, measure):
+        """Sum of ``measure`` per (row level, column level) (memoized)."""
+        key = (row, col, measure)
+        if key not in self._sums:
+            combined, shape = self._combined(row, col)
+            values = self.measures[measure]
+            # NaN measures count as missing: left out of sums and of the mean's count
+            valid = ~np.isnan(values)
+            self._sums[key] = (
+                np.bincount(combined[valid], weights=values[valid], minlength=shape[0] * shape[1]).reshape(shape),
+                np.bincount(combined[valid], minlength=shape[0] * shape[1]).reshape(shape),
+            )
+        return self._sums[key]
+
+    def table(self, row, col, measure=None, stat="Mean"):
+        """Crosstab of ``row`` by ``col``: site counts, or ``stat`` of ``measure``."""
+        counts = self.counts(row, col)
+        if measure is None:
+            values = counts
+        else:
+            sums, n = self.sums(row, col, measure)
+            if stat == "Sum":
+                values = sums
+            else:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values = np.where(n > 0, sums / np.maximum(n, 1), np.nan)
+        # Only levels that occur in this pair
+        keep_rows = counts.sum(axis=1) > 0
+        keep_cols = counts.sum(axis=0) > 0
+        return pd.DataFrame(
+            values[keep_rows][:, keep_cols],
+            index=pd.Index(self.fields[row][1][keep_rows], name=row),
+            columns=pd.Index(self.fields[col][1][keep_cols], name=col),
+        )
+
+
+def build_cube(bundle):
+    """Encode the bundle's categorical fields and numeric measures."""
+    df = bundle["df"]
+    definitions = [d for d in indicators.DEFINITIONS if d["name"] in df.columns]
+    metric_names = [d["name"] for d in definitions]
+    # Flags and small scores are categories too; parsed numbers and shares are not
+    metric_fields = [
+        d["name"] for d in definitions
+        if d.get("read") != "number" and d.get("dtype", "float") != "float"
+    ]
+    excluded = {bundle["name_col"], "Country"} | set(pipeline.stakeholder_columns(df)) | set(metric_names)
+    survey_cols = [c for c in df.columns if c not in excluded]
+    # Free-form number answers are measures, not categories
+    number_cols = set(indicators.compile_plan(tuple(survey_cols)).sources["number"])
+
+    candidates = ["Country"] + metric_fields + [c for c in survey_cols if c not in number_cols]
+    flags = flag_names(definitions)
+    fields = {}
+    for name in candidates:
+        col = df[name]
+        if col.nunique(dropna=False) > MAX_LEVELS:
+            continue
+        fields[name] = encode(col, name in flags)
+
+    measures = {
+        name: df[name].to_numpy(dtype=float)
+        for name in metric_names
+        if pd.api.types.is_numeric_dtype(df[name]) or df[name].dtype == bool
+    }
+    return Cube(fields, measures)
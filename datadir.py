@@ -0,0 +1,171 @@
+"""Watched server-side data directory.
+
+When ``DASHBOARD_DATA_DIR`` is set, the CSV exports in that folder are
+scanned when the app first runs and then every ``DASHBOARD_DATA_POLL``
+seconds (default 30). New or changed datasets are ingested right away
+through ``jobs`` and kept in the cache, and the upload page lists them so
+a session can open one without uploading anything.
+
+Files are paired into datasets by name: ``survey_2024_en.csv`` and
+``survey_2024_fr.csv`` form the dataset "survey_2024" (``english`` /
+``french`` and ``-``/``.`` separators work too). A file without a
+language tag is taken as French when its header has a "Pays" column and
+as English otherwise. A changed file is only re-ingested once its size
+and modification time are the same on two consecutive scans, so a copy in
+progress is not picked up half-written.
+"""
+import csv
+import logging
+import os
+import re
+import threading
+import time
+
+import jobs
+
+
+DATA_DIR = os.environ.get("DASHBOARD_DATA_DIR", "")
+POLL_SECONDS = float(os.environ.get("DASHBOARD_DATA_POLL", 30))
+
+log = logging.getLogger(__name__)
+
+lang_re = re.compile(r"(?i)(?:^|[_\-. ])(en|eng|english|fr|fra|french|francais)$")
+
+_lock = threading.Lock()
+_datasets = {}
+_pending = {}
+_started = False
+
+
+class Dataset:
+    def __init__(self, name, paths, signature, en_bytes, fr_bytes):
+        self.name = name
+        self.paths = paths
+        self.signature = signature
+        self.en_bytes = en_bytes
+        self.fr_bytes = fr_bytes
+        self.job = jobs.submit(en_bytes, fr_bytes, pin=True)
+
+    @property
+    def key(self):
+        return self.job.key
+
+
+def enabled():
+    return bool(DATA_DIR)
+
+
+def _language(path, stem):
+    m = lang_re.search(stem)
+    if m:
+        return ("fr" if m.group(1).lower().startswith("fr") else "en"), stem[:m.start()] or stem
+    try:
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            header = next(csv.reader(f), [])
+    except OSError:
+        header = []
+    return ("fr" if any(h.strip().lower() == "pays" for h in header) else "en"), stem
+
+
+def find_datasets(directory):
+    """{dataset name: {"en": path, "fr": path}} for the CSVs in ``directory``."""
+    found = {}
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not (entry.is_file() and entry.name.lower().endswith(".csv")):
+            continue
+        lang, name = _language(entry.path, entry.name[:-4])
+        files = found.setdefault(name, {})
+        # Two files for the same slot: the newer one wins
+        if lang not in files or entry.stat().st_mtime_ns > os.stat(files[lang]).st_mtime_ns:
+            files[lang] = entry.path
+    return found
+
+
+def _signature(paths):
+    return tuple(
+        (lang, p, st.st_size, st.st_mtime_ns)
+        for lang, p in sorted(paths.items())
+        for st in [os.stat(p)]
+    )
+
+
+def _read(path):
+    if path is None:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def scan(settle=True):
+    """Ingest new or changed datasets and drop removed ones.
+
+    With ``settle`` a change is only ingested once it has been seen
+    unchanged on the previous scan.
+    """
+    found = find_datasets(DATA_DIR)
+    with _lock:
+        current = dict(_datasets)
+
+    for name, paths in found.items():
+        try:
+            sig = _signature(paths)
+        except OSError:
+            continue  # removed while scanning
+        old = current.get(name)
+        if old is not None and old.signature == sig:
+            _pending.pop(name, None)
+            continue
+        if settle and _pending.get(name) != sig:
+            _pending[name] = sig
+            continue
+        _pending.pop(name, None)
+        try:
+            dataset = Dataset(name, paths, sig, _read(paths.get("en")), _read(paths.get("fr")))
+        except OSError as e:
+            log.warning("Could not read dataset %s: %s", name, e)
+            continue
+        log.info("Ingesting dataset %s from %s", name, DATA_DIR)
+        with _lock:
+            _datasets[name] = dataset
+        if old is not None and old.key != dataset.key:
+            jobs.unpin(old.key)
+
+    for name in set(current) - set(found):
+        with _lock:
+            dataset = _datasets.pop(name, None)
+        _pending.pop(name, None)
+        if dataset is not None:
+            jobs.unpin(dataset.key)
+
+
+def _watch():
+    settle = False  # the first scan ingests everything straight away
+    while True:
+        try:
+            scan(settle=settle)
+        except OSError as e:
+            log.warning("Could not scan %s: %s", DATA_DIR, e)
+        settle = True
+        time.sleep(POLL_SECONDS)
+
+
+def start():
+    """Start watching the data directory (once per process); no-op if unset.
+
+    The app calls this from an ``st.cache_resource`` initializer rather than
+    on import, so a reloaded module does not start a second watcher.
+    """
+    global _started
+    if not enabled():
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_watch, daemon=True, name="datadir-watch").start()
+
+
+def datasets():
+    """The datasets found so far, by name."""
+    with _lock:
+        return [_datasets[name] for name in sorted(_datasets)]
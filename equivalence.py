@@ -0,0 +1,706 @@
+"""Differential check of the optimized engines against the reference logic.
+
+The reference is the original single-pass computation of the Results page
+(ingestion, per-site flags, per-country tables, stakeholders and the map
+frame), kept here verbatim apart from the Streamlit calls. Each engine
+under test (``pandas``: the current pipeline; ``sqlite``: the SQL engine;
+``approx``: sketch-based stakeholder tables) is run on the same fixtures,
+and every intermediate table is compared with the tolerance rules below.
+Reports the divergences per table and the speedup of each engine.
+
+Fixtures are generated survey exports (``--sizes``, EN plus half as many
+FR rows with typical free-form answers) and, with ``--en``/``--fr``, a real
+anonymized export. Record linkage is off for the engines, since the
+reference counts a site answered in both languages twice.
+
+Some columns are defined differently on purpose since the reference was
+written (free-form numbers now go through ``numeric``). Their divergences
+are listed as "by design" and do not fail the run unless ``--strict``, but
+only on sites (or countries) where a source cell parsed below exact
+confidence or is a bare "1"/"0" (which the reference unified to Yes/No
+before parsing, and which the pipeline now keeps as counts); anywhere else
+they are real divergences. The raw free-form number columns of
+``df_full`` differ the same way on those "1"/"0" cells.
+
+Usage:
+    python equivalence.py --sizes 200 5000 --en english.csv --fr french.csv
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import unicodedata
+
+import country_converter as coco
+import numpy as np
+import pandas as pd
+
+import indicators
+import pipeline
+import sketches
+import sql_backend
+
+
+TABLES = ["df_full", "site_metrics", "site_policy", "cap_df", "tr_df", "infra_df", "er_df",
+          "hr_summary", "country_summary", "grouped_full", "map_df"]
+
+# Row keys per table; tables without a key are compared row by row
+keys = {
+    "cap_df": ["Country"], "tr_df": ["Country"], "infra_df": ["Country"], "er_df": ["Country"],
+    "hr_summary": ["Country"], "country_summary": ["Country"], "map_df": ["Country"],
+    "grouped_full": ["Country", "Stakeholder"],
+}
+
+RTOL = 1e-9
+ATOL = 1e-12
+# Count-min sketches only over-count; allowed relative error of CountSites
+APPROX_RTOL = 0.05
+
+# Columns whose definition changed deliberately (free-form number parsing),
+# with the metric whose source cells they are read from. In ``df_full`` the
+# free-form number columns themselves are by design (see ``exempt_sites``).
+by_design = {
+    "site_metrics": {"Budget_pct": "Budget_pct", "Other Staff": "Other Staff", "PhD": "PhD", "MSc": "MSc"},
+    "site_policy": {"Budget": "Budget_pct"},
+    "hr_summary": {"Other Staff": "Other Staff", "PhD": "PhD", "MSc": "MSc", "Total Staff": "Other Staff"},
+    "country_summary": {"avg_budget_alloc": "Budget_pct"},
+}
+
+ENGINES = ("pandas", "sqlite", "approx")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Reference implementation
+# ──────────────────────────────────────────────────────────────────────────────
+
+def reference_load(en_bytes, fr_bytes):
+    """Steps 2-14 of the original Results page: the combined ``df_full``."""
+    df_en = pd.read_csv(io.BytesIO(en_bytes), keep_default_na=False) if en_bytes else pd.DataFrame()
+    df_fr = pd.read_csv(io.BytesIO(fr_bytes), keep_default_na=False) if fr_bytes else pd.DataFrame()
+
+    if not df_fr.empty:
+        df_fr = df_fr.drop(columns=["Région de l'UA"], errors='ignore')
+        french_country_col = next((c for c in df_fr.columns if c.strip().lower() == "pays"), None)
+        if french_country_col:
+            df_fr = df_fr.rename(columns={french_country_col: "Country"})
+        else:
+            fallback_fr = next((c for c in df_fr.columns if "pays" in c.lower()), None)
+            if fallback_fr:
+                df_fr = df_fr.rename(columns={fallback_fr: "Country"})
+
+    if not df_en.empty and "Country" not in df_en.columns:
+        fallback_en_col = next(
+            (c for c in df_en.columns if re.search(r'(?i)pays|country|region|r[ée]gion', c)),
+            None
+        )
+        if fallback_en_col:
+            df_en = df_en.rename(columns={fallback_en_col: "Country"})
+
+    def strip_accents(s: str) -> str:
+        return (
+            unicodedata.normalize("NFKD", s)
+                       .encode("ascii", errors="ignore")
+                       .decode("utf-8", "ignore")
+                       .strip()
+        )
+
+    if not df_en.empty and "Country" in df_en.columns:
+        df_en["Country"] = df_en["Country"].astype(str).apply(strip_accents)
+    if not df_fr.empty and "Country" in df_fr.columns:
+        df_fr["Country"] = df_fr["Country"].astype(str).apply(strip_accents)
+
+    def normalize_african_names(name: str) -> str:
+        n = name.strip()
+        n = re.sub(r'(?i)Cote\s*ditoire|Cote\s*dIvoire', "Cote dIvoire", n)
+        n = re.sub(r'(?i)Cape\s*Verde', "Cabo Verde", n)
+        if re.search(r'(?i)Guinee\s*[-]?\s*Bissau', n):
+            n = "Guinea-Bissau"
+        elif re.fullmatch(r'(?i)Guinee', n):
+            n = "Guinea"
+        return n
+
+    if not df_en.empty and "Country" in df_en.columns:
+        df_en["Country"] = df_en["Country"].apply(normalize_african_names)
+    if not df_fr.empty and "Country" in df_fr.columns:
+        df_fr["Country"] = df_fr["Country"].apply(normalize_african_names)
+
+    cc = coco.CountryConverter()
+    if not df_en.empty and "Country" in df_en.columns:
+        mapped_en = cc.convert(names=df_en["Country"], to="name_short", not_found=None)
+        df_en["Country"] = [
+            mapped_en[i] if mapped_en[i] is not None else df_en.at[i, "Country"]
+            for i in range(len(df_en))
+        ]
+    if not df_fr.empty and "Country" in df_fr.columns:
+        mapped_fr = cc.convert(names=df_fr["Country"], to="name_short", not_found=None)
+        df_fr["Country"] = [
+            mapped_fr[i] if mapped_fr[i] is not None else df_fr.at[i, "Country"]
+            for i in range(len(df_fr))
+        ]
+
+    african_targets = {
+        "Nigeria","Togo","Ghana","Guinea-Bissau","Gambia",
+        "Sierra Leone","Burkina Faso","Mali","Cote dIvoire","Senegal","Guinea","Cabo Verde"
+    }
+    if not df_en.empty and "Country" in df_en.columns:
+        df_en = df_en[df_en["Country"].isin(african_targets)].copy()
+    if not df_fr.empty and "Country" in df_fr.columns:
+        df_fr = df_fr[df_fr["Country"].isin(african_targets)].copy()
+
+    if not df_en.empty and not df_fr.empty:
+        df_fr.rename(columns=dict(zip(df_fr.columns, df_en.columns)), inplace=True)
+
+    yes_no_map = {
+        'oui': 'Yes', 'non': 'No', 'yes': 'Yes', 'no': 'No',
+        'checked': 'Checked', 'coché': 'Checked',
+        'unchecked': 'Unchecked', 'non coché': 'Unchecked'
+    }
+    def harmonize(x):
+        return yes_no_map.get(x.strip().lower(), x) if isinstance(x, str) else x
+
+    if not df_fr.empty:
+        df_fr = df_fr.map(harmonize)
+
+    all_cols = list(dict.fromkeys(df_en.columns.tolist() + df_fr.columns.tolist()))
+    df_en = df_en.reindex(columns=all_cols, fill_value="")
+    df_fr = df_fr.reindex(columns=all_cols, fill_value="")
+    df = pd.concat([df_en, df_fr], ignore_index=True)
+
+    blank_cols = [c for c in df.columns if (df[c] == "").all()]
+    df.drop(columns=blank_cols, inplace=True)
+
+    def unify(v):
+        if not isinstance(v, str):
+            return v
+        t = v.strip().lower()
+        if t in ('oui','yes','checked','true','1'):
+            return 'Yes'
+        if t in ('non','no','unchecked','false','0'):
+            return 'No'
+        return v
+
+    df = df.map(unify)
+
+    name_col = next(
+        (c for c in df.columns if re.search(r'\bname\b', c, re.I)
+             or re.search(r'nom.*institut', c, re.I)),
+        df.columns[0]
+    )
+    df.attrs["name_col"] = name_col
+    return df
+
+
+def reference_metrics(df_full):
+    """Steps 16-17 and the tab tables of the original Results page."""
+    df = df_full.copy()
+    name_col = df.attrs.get("name_col", df.columns[0])
+    cats = {
+        "BasicScience": [r"\bbasic\b", r"fundamental"],
+        "Preclinical":   [r"preclinical"],
+        "ClinicalTrials":[r"clinical"],
+        "Epidemiological":[r"epidemiolog"]
+    }
+    bool_groups = {
+        "Clinical Staff": [r"availability of clinical staff"],
+        "Lab Staff":      [r"availability of laboratory staff"],
+        "Pharmacy Staff": [r"availability of pharmacy staff"],
+        "Bioinformatics": [r"bioinformatics"],
+        "Cell Culture":   [r"cell culture"],
+        "Org. Synthesis": [r"organic synthesis"],
+        "Virology":       [r"virology"],
+    }
+    num_groups = {
+        "Other Staff": [r"number of other staff"],
+        "PhD":         [r"doctorate|phd"],
+        "MSc":         [r"master's|msc"],
+    }
+
+    # Policy flags
+    policy_exists_col       = "Is there a health research policy in your country?"
+    policy_disseminated_col = "Has the policy been disseminated?"
+    policy_implemented_col  = "Is the policy currently under implementation?"
+    budget_col = ("What percentage of the national health budget is allocated "
+                  "to health-related R&D, considering the AU's 2% target?")
+    sop_cols = [c for c in df.columns if c.startswith('Available SOPs')]
+
+    def to_bin(x):
+        return 1 if str(x).strip().lower() in ('yes','oui','checked') else 0
+
+    df['PolicyExists'] = df[policy_exists_col].map(to_bin) if policy_exists_col in df.columns else 0
+    df['PolicyDisseminated'] = df[policy_disseminated_col].map(to_bin) if policy_disseminated_col in df.columns else 0
+    df['PolicyImplemented'] = df[policy_implemented_col].map(to_bin) if policy_implemented_col in df.columns else 0
+    if budget_col in df.columns:
+        df['Budget_pct'] = (
+            pd.to_numeric(df[budget_col].astype(str).str.rstrip('%').replace('', '0'),
+                          errors='coerce')
+              .fillna(0).clip(0,100) / 100.0
+        )
+    else:
+        df['Budget_pct'] = 0
+    df['SOP_Coverage'] = df[sop_cols].map(to_bin).sum(axis=1) / len(sop_cols) if sop_cols else 0
+
+    site_policy = pd.DataFrame({
+        'Country':      df['Country'],
+        'Exists':       df['PolicyExists'],
+        'Disseminated': df['PolicyDisseminated'] & df['PolicyExists'],
+        'Implemented':  df['PolicyImplemented'] & df['PolicyExists'],
+        'Budget':       df['Budget_pct'],
+        'SOP_Coverage': df['SOP_Coverage']
+    })
+
+    # Human resources
+    for name, pats in bool_groups.items():
+        cols = [c for c in df.columns if any(re.search(p, c, re.I) for p in pats)]
+        df[name] = df[cols].eq("Yes").any(axis=1).astype(int) if cols else 0
+    for name, pats in num_groups.items():
+        cols = [c for c in df.columns if any(re.search(p, c, re.I) for p in pats)]
+        if cols:
+            df[name] = df[cols].apply(pd.to_numeric, errors='coerce').max(axis=1).fillna(0).astype(int)
+        else:
+            df[name] = 0
+
+    # Core metrics
+    for cat, pats in cats.items():
+        cols = [c for c in df.columns if any(re.search(p, c, re.I) for p in pats)]
+        df[f"Is{cat}"] = df[cols].eq("Yes").any(axis=1)
+    df["CapabilityScore"] = df[[f"Is{cat}" for cat in cats]].sum(axis=1)
+    cap_df = df.groupby("Country")["CapabilityScore"].mean().reset_index(name="Avg Capability")
+
+    trans_cols = [c for c in df.columns if re.search(r"phase.*i", c, re.I)]
+    df["HasPhaseI"] = df[trans_cols].eq("Yes").any(axis=1)
+    tr_df = df.groupby("Country")["HasPhaseI"].sum().reset_index(name="Phase I Sites")
+
+    infra_terms = ["availability of advanced","level of biosecurity","iso certification"]
+    infra_cols = [c for c in df.columns if any(t in c.lower() for t in infra_terms)]
+    df["InfraIndex"] = df[infra_cols].eq("Yes").sum(axis=1)
+    infra_df = df.groupby("Country")["InfraIndex"].mean().reset_index(name="Avg InfraIndex")
+
+    ethic_terms = ["ethic","irb","regul","guidelines"]
+    ethic_cols = [c for c in df.columns if any(t in c.lower() for t in ethic_terms)]
+    df["HasIRB"] = df[ethic_cols].eq("Yes").any(axis=1)
+    er_df = df.groupby("Country")["HasIRB"].sum().reset_index(name="IRB Sites")
+
+    pol_df = site_policy.groupby("Country")["Exists"].mean().reset_index(name="% With Policy")
+
+    map_df = (
+        cap_df
+        .merge(tr_df, on="Country")
+        .merge(infra_df, on="Country")
+        .merge(er_df, on="Country")
+        .merge(pol_df, on="Country")
+    )
+    map_df["Country"] = map_df["Country"].str.strip()
+    cc = coco.CountryConverter()
+    map_df["ISO_A3"] = cc.convert(names=map_df["Country"], to="ISO3", not_found=None)
+    mask = map_df["ISO_A3"].isnull()
+    if mask.any():
+        map_df.loc[mask, "ISO_A3"] = map_df.loc[mask, "Country"].apply(pipeline.fuzzy_iso)
+
+    # Tab 3
+    bool_sum = df.groupby('Country')[list(bool_groups.keys())].sum()
+    num_sum = df.groupby('Country')[list(num_groups.keys())].sum()
+    total = bool_sum.sum(axis=1) + num_sum["Other Staff"]
+    hr = pd.concat([bool_sum, num_sum], axis=1)
+    hr["Total Staff"] = total.astype(int)
+    hr.index.name = "Country"
+
+    # Tab 7
+    free_cols = []
+    collab_col = next(
+        (c for c in df.columns
+         if c.strip().lower() == "if yes, list the research collaborations in the last 5 years".lower()),
+        None
+    )
+    if collab_col:
+        free_cols.append(collab_col)
+    pw_ind_col = next(
+        (i for i,c in enumerate(df.columns)
+         if c.strip().lower() == "partnerships with industry".lower()),
+        None
+    )
+    if pw_ind_col is not None and pw_ind_col + 1 < len(df.columns):
+        free_cols.append(df.columns[pw_ind_col + 1])
+
+    records = []
+    for col in free_cols:
+        series = df[col].astype(str)
+        nonblank = series[series.str.strip().replace("nan","") != ""].dropna()
+        for idx, raw_text in nonblank.items():
+            raw_text = raw_text.strip()
+            if raw_text.lower() in ("yes","no","oui","non","checked","unchecked"):
+                continue
+            site = str(df.at[idx, name_col]).strip()
+            if not site or site.lower() == "nan":
+                continue
+            records.append({"Country": df.at[idx, "Country"], "Site": site, "RawEntry": raw_text})
+
+    def split_items(r: str) -> list[str]:
+        tmp = re.sub(r"\d+\.", ";", r)
+        tmp = re.sub(r"[•·‣]", ";", tmp)
+        parts = re.split(r"[;,\n]+", tmp)
+        cleaned = []
+        for p in parts:
+            p = p.strip()
+            if not p:
+                continue
+            if p.lower() in ("yes","no","oui","non","checked","unchecked"):
+                continue
+            cleaned.append(p)
+        return cleaned
+
+    site_stake_df = pd.DataFrame(records)
+    if not site_stake_df.empty:
+        site_clean = (
+            site_stake_df
+            .assign(Stakeholder=lambda df0: df0["RawEntry"].apply(split_items))
+            .explode("Stakeholder")
+            .reset_index(drop=True)
+        )
+        grouped_full = (
+            site_clean
+            .groupby(["Country","Stakeholder"])
+            .agg(
+                SitesList=('Site', lambda s: "; ".join(sorted(set(s)))),
+                CountSites=('Site', lambda s: s.nunique())
+            )
+            .reset_index()
+            .sort_values(["Country","CountSites"], ascending=[True,False])
+        )
+    else:
+        grouped_full = pd.DataFrame(columns=["Country","Stakeholder","SitesList","CountSites"])
+
+    # Tab 8
+    country_summary = site_policy.groupby('Country').agg(
+        pct_with_policy   = ('Exists','mean'),
+        pct_disseminated  = ('Disseminated','mean'),
+        pct_implemented   = ('Implemented','mean'),
+        avg_budget_alloc  = ('Budget','mean'),
+        avg_sop_coverage  = ('SOP_Coverage','mean'),
+        num_sites         = ('Exists','count')
+    ).reset_index()
+    country_summary['implementation_gap'] = country_summary['pct_with_policy'] - country_summary['pct_implemented']
+
+    return {
+        "site_metrics": df[[c for c in df.columns if c not in df_full.columns]],
+        "site_policy": site_policy,
+        "cap_df": cap_df,
+        "tr_df": tr_df,
+        "infra_df": infra_df,
+        "er_df": er_df,
+        "hr_summary": hr.reset_index(),
+        "country_summary": country_summary,
+        "grouped_full": grouped_full,
+        "map_df": map_df,
+    }
+
+
+def run_reference(en_bytes, fr_bytes):
+    t0 = time.perf_counter()
+    df = reference_load(en_bytes, fr_bytes)
+    t1 = time.perf_counter()
+    tables = reference_metrics(df)
+    t2 = time.perf_counter()
+    tables["df_full"] = df
+    return tables, {"load": t1 - t0, "metrics": t2 - t1}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Engines under test
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_engine(engine, en_bytes, fr_bytes, workdir):
+    if engine == "pandas":
+        aggregate = pipeline.aggregate_metrics
+    elif engine == "sqlite":
+        path = os.path.join(workdir, f"{time.perf_counter_ns()}.sqlite")
+
+        def aggregate(df, site_policy, site_clean):
+            sql_backend.materialize(path, df, site_clean)
+            return sql_backend.query_tables(path)
+    elif engine == "approx":
+        aggregate = sketches.approximate(pipeline.aggregate_metrics, force=True)
+    else:
+        raise ValueError(f"unknown engine {engine!r}")
+
+    t0 = time.perf_counter()
+    df = pipeline.load_dataset(en_bytes, fr_bytes, dedup="off")
+    t1 = time.perf_counter()
+    bundle = pipeline.compute_metrics(df, aggregate=aggregate)
+    t2 = time.perf_counter()
+
+    metric_cols = [c for c in bundle["df"].columns if c not in df.columns]
+    tables = {
+        "df_full": df,
+        "site_metrics": bundle["df"][metric_cols],
+        "site_policy": bundle["site_policy"],
+        "hr_summary": pipeline.hr_summary(bundle).reset_index(),
+        "map_df": bundle["map_df"],
+    }
+    for name in ["cap_df", "tr_df", "infra_df", "er_df", "country_summary", "grouped_full"]:
+        tables[name] = bundle[name]
+    tables["exempt"] = exempt_sites(df, bundle)
+    return tables, {"load": t1 - t0, "metrics": t2 - t1}
+
+
+def exempt_sites(df, bundle):
+    """Sites where a by-design divergence is expected, per metric and number column.
+
+    A metric is exempt on sites with a source cell parsed below exact or
+    answered with a bare "1"/"0" (Yes/No to the reference); a free-form
+    number column of ``df_full`` on its "1"/"0" cells.
+    """
+    confidence = bundle["numeric_confidence"]
+    unified = pd.DataFrame({
+        c: df[c].astype(str).str.strip().isin(["1", "0"]) for c in confidence.columns
+    }, index=df.index)
+    out = pd.DataFrame({"Country": bundle["df"]["Country"]})
+    for metric in sorted(set().union(*(cols.values() for cols in by_design.values()))):
+        d = next(d for d in indicators.DEFINITIONS if d["name"] == metric)
+        src = [c for c in indicators.select_columns(df.columns, d["columns"]) if c in confidence]
+        out[metric] = (confidence[src].lt(1.0) | unified[src]).any(axis=1)
+    out = pd.concat([out, unified.add_prefix("df_full:")], axis=1)
+    return out.reset_index(drop=True)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Comparison
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _align(ref, cand, key):
+    if key:
+        merged = ref.merge(cand, on=key, how="outer", suffixes=("", " (engine)"), indicator=True)
+        return merged, int((merged["_merge"] == "left_only").sum()), int((merged["_merge"] == "right_only").sum())
+    n = min(len(ref), len(cand))
+    merged = ref.iloc[:n].reset_index(drop=True).join(
+        cand.iloc[:n].reset_index(drop=True), rsuffix=" (engine)")
+    return merged, len(ref) - n, len(cand) - n
+
+
+def _column_diff(a, b, rtol, atol):
+    """Boolean mask of rows where the two columns disagree, and the max abs diff."""
+    num_a = pd.to_numeric(a, errors="coerce") if a.dtype != object else None
+    num_b = pd.to_numeric(b, errors="coerce") if b.dtype != object else None
+    if num_a is not None and num_b is not None:
+        x = num_a.astype(float).to_numpy()
+        y = num_b.astype(float).to_numpy()
+        both_nan = np.isnan(x) & np.isnan(y)
+        close = np.isclose(x, y, rtol=rtol, atol=atol) | both_nan
+        diff = np.abs(x - y)
+        return ~close, float(np.nanmax(diff)) if (~both_nan).any() else 0.0
+    return ~(a.astype(str).eq(b.astype(str))).to_numpy(), None
+
+
+def _exempt(name, column, merged, exempt):
+    """Rows of ``merged`` where a by-design divergence is expected."""
+    metric = f"df_full:{column}" if name == "df_full" else by_design.get(name, {}).get(column)
+    if exempt is None or metric not in exempt.columns:
+        return np.zeros(len(merged), dtype=bool)
+    sites = exempt[metric]
+    if keys.get(name) == ["Country"]:
+        return merged["Country"].isin(exempt.loc[sites, "Country"]).to_numpy()
+    return sites.reindex(merged.index, fill_value=False).to_numpy()
+
+
+def compare_table(name, ref, cand, engine, exempt=None):
+    """Divergences of one table: missing rows/columns and per-column mismatches.
+
+    ``exempt`` (see ``exempt_sites``) bounds the by-design exemption to the
+    sites, or countries, where the parsing deliberately differs; without it
+    no divergence is exempt.
+    """
+    result = {"table": name, "rows": len(ref), "columns": {}, "by_design": {}, "problems": []}
+    key = keys.get(name)
+    ref = ref.reset_index(drop=True)
+    cand = cand.reset_index(drop=True)
+
+    missing = [c for c in ref.columns if c not in cand.columns]
+    if missing:
+        result["problems"].append(f"columns missing in engine: {', '.join(missing)}")
+    cols = [c for c in ref.columns if c in cand.columns and c not in (key or [])]
+
+    approx_stakeholders = engine == "approx" and name == "grouped_full"
+    if approx_stakeholders:
+        # Sketches keep a bounded top list and no site lists
+        cols = [c for c in cols if c != "SitesList"]
+        cand = cand[cand["Stakeholder"].notna()]
+        ref = ref.merge(cand[key], on=key)
+
+    merged, only_ref, only_cand = _align(ref[(key or []) + cols], cand[(key or []) + cols], key)
+    if only_ref:
+        result["problems"].append(f"{only_ref} rows only in reference")
+    if only_cand:
+        result["problems"].append(f"{only_cand} rows only in engine")
+    if key:
+        merged = merged[merged["_merge"] == "both"]
+
+    for c in cols:
+        rtol = APPROX_RTOL if approx_stakeholders and c == "CountSites" else RTOL
+        diverges, _ = _column_diff(merged[c], merged[f"{c} (engine)"], rtol, ATOL)
+        expected = _exempt(name, c, merged, exempt)
+        for target, mask in [(result["columns"], diverges & ~expected), (result["by_design"], diverges & expected)]:
+            if not mask.any():
+                continue
+            _, max_diff = _column_diff(merged.loc[mask, c], merged.loc[mask, f"{c} (engine)"], rtol, ATOL)
+            example = merged.loc[mask].iloc[0]
+            target[c] = {
+                "rows": int(mask.sum()),
+                "max_abs_diff": max_diff,
+                "example": {
+                    "key": {k: example[k] for k in key} if key else int(merged.index[mask][0]),
+                    "reference": str(example[c]),
+                    "engine": str(example[f"{c} (engine)"]),
+                },
+            }
+    return result
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Fixtures
+# ──────────────────────────────────────────────────────────────────────────────
+
+en_header = [
+    "Name of the institution", "Country", "Basic science research", "Preclinical research",
+    "Clinical trials", "Epidemiological studies", "Availability of clinical staff",
+    "Availability of laboratory staff", "Availability of pharmacy staff", "Bioinformatics expertise",
+    "Cell culture expertise", "Organic synthesis expertise", "Virology expertise",
+    "Number of other staff", "Number of staff with doctorate (PhD)", "Number of staff with Master's (MSc)",
+    "Experience with Phase I trials", "Availability of advanced equipment", "Level of biosecurity",
+    "ISO certification", "In-house ethics committee (IRB)", "Partnerships with industry",
+    "Please list industry partners", "If yes, list the research collaborations in the last 5 years",
+    "Is there a health research policy in your country?", "Has the policy been disseminated?",
+    "Is the policy currently under implementation?",
+    "What percentage of the national health budget is allocated to health-related R&D, considering the AU's 2% target?",
+    "Available SOPs - Sample handling", "Available SOPs - Data management",
+]
+fr_header = ["Nom de l'institution", "Pays", "Région de l'UA"] + [f"fr_{c}" for c in en_header[2:]]
+countries_en = ["Nigeria", "Ghana", "Sierra Leone", "Gambia", "Guinea-Bissau", "Togo", "Kenya"]
+countries_fr = ["Togo", "Sénégal", "Mali", "Burkina Faso", "Guinée-Bissau", "Côte d'Ivoire", "Guinée"]
+partners = ["WHO", "Africa CDC", "Institut Pasteur", "Wellcome Trust", "NIH", "Gates Foundation",
+            "MRC Unit", "Université de Lomé", "Pfizer", "GSK"]
+budgets = ["1%", "0.5", "", "2 %", "3", "approx. 3", "1,5 %", "5-10", "abc", "1", "0"]
+staff_counts = ["3", "12", "12 staff", "5-10", "", "1,000", "2.5", "none", "7", "1", "0"]
+
+
+def generate(n, seed=0):
+    """CSV bytes of a synthetic EN export with ``n`` sites and an FR one with n/2."""
+    rng = random.Random(seed)
+
+    def row(lang, i):
+        answers = ["Yes", "No", ""] if lang == "en" else ["Oui", "Non", ""]
+        country = rng.choice(countries_en if lang == "en" else countries_fr)
+        values = [f"Site {i} {'Hôpital' if lang == 'fr' else 'Hospital'} {country}", country]
+        if lang == "fr":
+            values.append("Afrique de l'Ouest")
+        values += [rng.choice(answers) for _ in range(11)]
+        values += [rng.choice(staff_counts) for _ in range(3)]
+        values += [rng.choice(answers) for _ in range(5)]
+        values += [rng.choice(answers),
+                   "; ".join(rng.sample(partners, rng.randint(0, 3))),
+                   ", ".join(rng.sample(partners, rng.randint(0, 3)))]
+        values += [rng.choice(answers) for _ in range(3)]
+        values += [rng.choice(budgets), rng.choice(answers), rng.choice(answers)]
+        return values
+
+    en = pd.DataFrame([row("en", i) for i in range(n)], columns=en_header)
+    fr = pd.DataFrame([row("fr", i) for i in range(n // 2)], columns=fr_header)
+    return en.to_csv(index=False).encode(), fr.to_csv(index=False).encode()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Driver
+# ──────────────────────────────────────────────────────────────────────────────
+
+def best_of(fn, repeat):
+    runs = [fn() for _ in range(repeat)]
+    tables = runs[0][0]
+    timings = {stage: min(r[1][stage] for r in runs) for stage in runs[0][1]}
+    return tables, timings
+
+
+def check_fixture(label, en_bytes, fr_bytes, engines, repeat, workdir):
+    ref, ref_time = best_of(lambda: run_reference(en_bytes, fr_bytes), repeat)
+    report = {"fixture": label, "sites": len(ref["df_full"]), "reference_s": ref_time, "engines": {}}
+    for engine in engines:
+        cand, cand_time = best_of(lambda: run_engine(engine, en_bytes, fr_bytes, workdir), repeat)
+        report["engines"][engine] = {
+            "seconds": cand_time,
+            "speedup": {
+                stage: ref_time[stage] / cand_time[stage] if cand_time[stage] else float("inf")
+                for stage in ref_time
+            },
+            "tables": [compare_table(name, ref[name], cand[name], engine, cand["exempt"])
+                       for name in TABLES],
+        }
+    return report
+
+
+def failures(report, strict=False):
+    """Number of tables with divergences outside the tolerance rules."""
+    n = 0
+    for engine in report["engines"].values():
+        for t in engine["tables"]:
+            n += bool(t["problems"] or t["columns"] or (strict and t["by_design"]))
+    return n
+
+
+def print_report(report):
+    print(f"\n== {report['fixture']} ({report['sites']} sites) ==")
+    ref = report["reference_s"]
+    print(f"reference: load {ref['load']:.3f}s, metrics {ref['metrics']:.3f}s")
+    for engine, r in report["engines"].items():
+        s, up = r["seconds"], r["speedup"]
+        print(f"{engine}: load {s['load']:.3f}s ({up['load']:.2f}x), "
+              f"metrics {s['metrics']:.3f}s ({up['metrics']:.2f}x)")
+        for t in r["tables"]:
+            status = "DIVERGES" if t["problems"] or t["columns"] else "ok"
+            print(f"  {t['table']:<16}{status}")
+            for p in t["problems"]:
+                print(f"      {p}")
+            for kind, cols in [("", t["columns"]), ("by design: ", t["by_design"])]:
+                for c, d in cols.items():
+                    diff = f", max |diff| {d['max_abs_diff']:.6g}" if d["max_abs_diff"] is not None else ""
+                    ex = d["example"]
+                    print(f"      {kind}{c}: {d['rows']} rows{diff}; e.g. {ex['key']}: "
+                          f"{ex['reference']!r} vs {ex['engine']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--en", help="English CSV of a real (anonymized) export")
+    parser.add_argument("--fr", help="French CSV of a real (anonymized) export")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[200, 2000],
+                        help="EN sites per generated fixture")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=1, help="timing runs (best is kept)")
+    parser.add_argument("--strict", action="store_true", help="also fail on by-design divergences")
+    parser.add_argument("--json", help="also write the reports to this file")
+    args = parser.parse_args()
+
+    fixtures = [(f"generated n={n} seed={args.seed}", *generate(n, args.seed)) for n in args.sizes]
+    if args.en or args.fr:
+        en_bytes = open(args.en, "rb").read() if args.en else None
+        fr_bytes = open(args.fr, "rb").read() if args.fr else None
+        fixtures.append((" + ".join(p for p in (args.en, args.fr) if p), en_bytes, fr_bytes))
+
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, en_bytes, fr_bytes in fixtures:
+            report = check_fixture(label, en_bytes, fr_bytes, args.engines, args.repeat, workdir)
+            print_report(report)
+            reports.append(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2, default=str)
+    failed = sum(failures(r, args.strict) for r in reports)
+    print(f"\n{failed} diverging tables" if failed else "\nall engines match the reference")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Tables and figures of the dashboard tabs, shared by the app and the static export.
+
+Nothing in here touches Streamlit: ``app.py`` draws these with
+``st.table`` / ``st.plotly_chart`` and ``static_site.py`` writes them to
+HTML, so both show the same numbers with the same titles and colors.
+"""
+import plotly.express as px
+import plotly.graph_objects as go
+
+import pipeline
+
+
+# Shared palette
+palette = [
+    "#1A5632", "#9F2241", "#B4A269", "#348F41",
+    "#58595B", "#9F2241", "#B4A269", "#1A5632"
+]
+
+policy_labels = {
+    'pct_with_policy': '% With Policy',
+    'pct_disseminated': '% Disseminated',
+    'pct_implemented': '% Implemented',
+}
+
+
+# Tab 1: Identification
+def site_counts(df):
+    return df.groupby("Country").size().reset_index(name="Number of Sites")
+
+
+def identification(df):
+    """Sites per research category and Country, plus "Other" (no category)."""
+    bool_cols = [f"Is{cat}" for cat in pipeline.cats]
+    summary = (
+        df.groupby('Country')[bool_cols]
+          .sum()
+          .rename(columns=lambda x: x.replace("Is", ""))
+    )
+    other_mask = ~df[bool_cols].any(axis=1)
+    summary["Other"] = df[other_mask].groupby("Country").size().reindex(summary.index, fill_value=0)
+    return summary
+
+
+def identification_long(summary):
+    return summary.reset_index().melt('Country', var_name='Category', value_name='Count')
+
+
+def identification_bar(melt):
+    return px.bar(
+        melt, x='Country', y='Count', color='Category',
+        barmode='group', title="Sites by Category & Country",
+        color_discrete_sequence=palette
+    )
+
+
+def identification_sunburst(melt):
+    return px.sunburst(
+        melt, path=['Country','Category'], values='Count',
+        title='Sunburst of Research Sites by Country and Category',
+        color_discrete_sequence=palette
+    )
+
+
+# Tab 2: Capacity
+def capacity_bar(cap_df):
+    return px.bar(
+        cap_df, x='Country', y='Avg Capability', color='Country',
+        title="Avg Capability Score by Country", color_discrete_sequence=palette
+    )
+
+
+def category_heatmap(melt):
+    heat = melt.pivot(index='Country', columns='Category', values='Count').fillna(0)
+    fig = px.imshow(
+        heat, labels=dict(x="Category", y="Country", color="Count"),
+        title="Heatmap of Site Counts per Category & Country",
+        color_continuous_scale=["#D0E8D8","#1A5632"],
+        zmin=0, zmax=heat.values.max()
+    )
+    fig.update_layout(height=500, margin=dict(t=50,b=50))
+    return fig
+
+
+# Tab 3: Human Resources
+def hr_flags_bar(bool_sum):
+    melt_bool = bool_sum.reset_index().melt(
+        'Country', var_name='Indicator', value_name='Count of Yes'
+    )
+    return px.bar(
+        melt_bool, x="Country", y="Count of Yes", color="Indicator", barmode="group",
+        title="Sites Reporting “Yes” by Indicator",
+        color_discrete_sequence=palette
+    )
+
+
+def staff_bar(staff):
+    """Staff counts by country; ``staff`` holds the number groups and Total Staff."""
+    melt_num = staff.reset_index().melt(
+        'Country', var_name='Staff Category', value_name='Count'
+    )
+    return px.bar(
+        melt_num,
+        x="Country",
+        y="Count",
+        color="Staff Category",
+        barmode="group",
+        title="Staff Counts by Country (Other Staff, PhD, MSc, Total Staff)",
+        color_discrete_sequence=palette
+    )
+
+
+# Tab 4: Translational
+def phase1_bar(tr_df):
+    return px.bar(
+        tr_df, x='Country', y='Phase I Sites', color='Country',
+        title="Sites Reporting Phase I Trials", color_discrete_sequence=palette,
+        range_y=[0, tr_df['Phase I Sites'].max()+1]
+    )
+
+
+def phase1_scatter(cap_df, tr_df):
+    cap_tr = cap_df.rename(columns={"Avg Capability":"CapabilityScore"}).merge(tr_df, on='Country')
+    return px.scatter(
+        cap_tr, x='CapabilityScore', y='Phase I Sites', size='Phase I Sites',
+        color='Country', title='Phase I Trials vs. Capability Score',
+        color_discrete_sequence=palette
+    )
+
+
+# Tab 5: Infrastructure
+def infra_bar(infra_df):
+    return px.bar(
+        infra_df, x='Country', y='Avg InfraIndex', color='Country',
+        title="Avg Infrastructure Index by Country", color_discrete_sequence=palette,
+        range_y=[0, infra_df['Avg InfraIndex'].max()+1]
+    )
+
+
+def infra_distribution(sites, sketches=None):
+    """Violin of InfraIndex per country, or box plots from quantile sketches.
+
+    In approximate mode (see ``sketches``) pass the per-country sketches;
+    the boxes show quartiles and 5th/95th percentiles.
+    """
+    if sketches is None:
+        return px.violin(
+            sites[['Country','InfraIndex']], x='Country', y='InfraIndex',
+            title="Infrastructure Index Distribution by Country",
+            color_discrete_sequence=palette
+        )
+    fig = go.Figure([
+        go.Box(
+            name=country, x=[country],
+            lowerfence=[sk.quantile(0.05)], q1=[sk.quantile(0.25)],
+            median=[sk.quantile(0.5)], q3=[sk.quantile(0.75)],
+            upperfence=[sk.quantile(0.95)],
+            marker_color=palette[i % len(palette)]
+        )
+        for i, (country, sk) in enumerate(sorted(sketches.items()))
+    ])
+    fig.update_layout(
+        title="Infrastructure Index Distribution by Country (approximate)",
+        yaxis_title="InfraIndex", showlegend=False
+    )
+    return fig
+
+
+# Tab 6: Ethics & Regulatory
+def irb_bar(er_df):
+    return px.bar(
+        er_df, x='Country', y='IRB Sites', color='Country',
+        title="Sites with In‐house IRBs by Country", color_discrete_sequence=palette
+    )
+
+
+def irb_pie(sites):
+    pie_df = sites.groupby(['Country','HasIRB']).size().reset_index(name='Count')
+    return px.pie(
+        pie_df, names='HasIRB', values='Count', facet_col='Country',
+        title='IRB Coverage by Country', color_discrete_sequence=palette
+    )
+
+
+# Tab 7: Stakeholders
+def top_stakeholders_bar(top5):
+    fig = px.bar(
+        top5, x="Stakeholder", y="CountSites",
+        title="Top 5 Most Common Stakeholders",
+        color="Stakeholder",
+        color_discrete_sequence=palette
+    )
+    fig.update_layout(xaxis_title=None, yaxis_title="Number of Sites")
+    return fig
+
+
+# Tab 8: Policy & Legislation
+def policy_table(country_summary):
+    """The policy summary with shares as percentages, for display."""
+    disp = country_summary.copy()
+    for p in ['pct_with_policy', 'pct_disseminated', 'pct_implemented', 'implementation_gap']:
+        disp[p] = (disp[p]*100).round(1).astype(str) + '%'
+    disp[['avg_budget_alloc', 'avg_sop_coverage']] = disp[['avg_budget_alloc', 'avg_sop_coverage']].round(2)
+    return disp
+
+
+def policy_long(country_summary):
+    melt = country_summary.melt(
+        id_vars='Country', value_vars=list(policy_labels),
+        var_name='Metric', value_name='Value'
+    )
+    melt['Metric'] = melt['Metric'].map(policy_labels)
+    return melt
+
+
+def policy_bar(melt):
+    return px.bar(
+        melt, x='Country', y='Value', color='Metric', barmode='group',
+        color_discrete_sequence=palette, title="Policy Metrics by Country"
+    )
+
+
+def policy_pie(melt):
+    return px.pie(
+        melt, names='Metric', values='Value', facet_col='Country',
+        title="Policy Breakdown by Country", color_discrete_sequence=palette,
+        labels={'Value':'Proportion (0–1)'}
+    )
+
+
+def policy_radar(country_summary):
+    melt_radar = country_summary.melt(
+        id_vars='Country',
+        value_vars=['pct_with_policy','pct_disseminated','pct_implemented','implementation_gap'],
+        var_name='Metric', value_name='Value'
+    )
+    return px.line_polar(
+        melt_radar, r='Value', theta='Metric', color='Country',
+        line_close=True, title='Policy Radar Chart by Country',
+        color_discrete_sequence=palette
+    )
@@ -0,0 +1,177 @@
+"""On-disk history of survey rounds.
+
+A dataset becomes a round only when a user saves it from the Trends tab:
+its metadata and the per-country aggregates from the metrics bundle are
+stored in a small SQLite file, so ad-hoc uploads, re-uploads and load
+tests never enter the trends. A dataset already saved is not written
+twice, and trend queries read only the aggregates, never the raw survey
+data. Rounds are keyed by ``round_id``; labels are unique, defaulting to
+the ingestion date with " (2)", " (3)", ... for later rounds of the same
+day, and can be renamed. Rounds can be deleted.
+
+The file is ``DASHBOARD_HISTORY_DB`` (default ``history.sqlite``); a
+relative path is taken from the app's folder, not the working directory.
+"""
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(APP_DIR, os.environ.get("DASHBOARD_HISTORY_DB", "history.sqlite"))
+
+# Per-country aggregates kept for each round
+trend_metrics = [
+    "Number of Sites", "Avg Capability", "Phase I Sites",
+    "Avg InfraIndex", "IRB Sites", "% With Policy", "Total Staff",
+]
+
+schema = """
+CREATE TABLE IF NOT EXISTS rounds (
+    round_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    label        TEXT NOT NULL,
+    dataset_key  TEXT NOT NULL UNIQUE,
+    ingested_at  TEXT NOT NULL,
+    num_sites    INTEGER NOT NULL,
+    num_countries INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS country_metrics (
+    round_id INTEGER NOT NULL REFERENCES rounds(round_id),
+    country  TEXT NOT NULL,
+    metric   TEXT NOT NULL,
+    value    REAL,
+    PRIMARY KEY (round_id, country, metric)
+);
+CREATE INDEX IF NOT EXISTS idx_cm_country_metric ON country_metrics(country, metric);
+CREATE INDEX IF NOT EXISTS idx_cm_metric ON country_metrics(metric);
+"""
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or DB_PATH)
+    conn.executescript(schema)
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_rounds_label'").fetchone():
+        with conn:
+            # Histories from before labels were unique: version the repeats
+            repeats = conn.execute(
+                "SELECT round_id, label FROM rounds WHERE round_id NOT IN "
+                "(SELECT MIN(round_id) FROM rounds GROUP BY label) ORDER BY round_id"
+            ).fetchall()
+            for round_id, label in repeats:
+                conn.execute("UPDATE rounds SET label = ? WHERE round_id = ?",
+                             (_free_label(conn, label), round_id))
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rounds_label ON rounds(label)")
+    return conn
+
+
+def _free_label(conn, label):
+    """``label``, or ``label (n)`` with the first n not taken yet."""
+    taken = {row[0] for row in conn.execute(
+        "SELECT label FROM rounds WHERE label = ? OR label LIKE ?", (label, f"{label} (%)"))}
+    n, candidate = 1, label
+    while candidate in taken:
+        n += 1
+        candidate = f"{label} ({n})"
+    return candidate
+
+
+def round_aggregates(bundle):
+    """Long (Country, Metric, Value) frame of the round's aggregates."""
+    wide = bundle["map_df"].drop(columns=["ISO_A3"]).set_index("Country")
+    wide["Number of Sites"] = bundle["df"].groupby("Country").size()
+    wide["Total Staff"] = bundle["total_staff"]
+    return (
+        wide[trend_metrics]
+        .reset_index()
+        .melt(id_vars="Country", var_name="Metric", value_name="Value")
+    )
+
+
+def saved_round(dataset_key, path=None):
+    """(round_id, label) of the round stored for this dataset, or None."""
+    with closing(connect(path)) as conn:
+        row = conn.execute(
+            "SELECT round_id, label FROM rounds WHERE dataset_key = ?", (dataset_key,)
+        ).fetchone()
+    return tuple(row) if row else None
+
+
+def record_round(bundle, dataset_key, label=None, path=None):
+    """Append this dataset's aggregates as a new round.
+
+    ``label`` defaults to the ingestion date and is versioned if another
+    round has it. Returns False (and writes nothing) if the dataset was
+    already saved.
+    """
+    agg = round_aggregates(bundle)
+    df = bundle["df"]
+    now = datetime.now(timezone.utc)
+    with closing(connect(path)) as conn, conn:
+        if conn.execute("SELECT 1 FROM rounds WHERE dataset_key = ?", (dataset_key,)).fetchone():
+            return False
+        cur = conn.execute(
+            "INSERT INTO rounds "
+            "(label, dataset_key, ingested_at, num_sites, num_countries) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (_free_label(conn, label or now.strftime("%Y-%m-%d")), dataset_key,
+             now.isoformat(timespec="seconds"), len(df), int(df["Country"].nunique()))
+        )
+        conn.executemany(
+            "INSERT INTO country_metrics (round_id, country, metric, value) VALUES (?, ?, ?, ?)",
+            [(cur.lastrowid, c, m, float(v)) for c, m, v in agg.itertuples(index=False)]
+        )
+    return True
+
+
+def rename_round(round_id, label, path=None):
+    """Relabel a round; returns False if another round already has ``label``."""
+    with closing(connect(path)) as conn, conn:
+        try:
+            conn.execute("UPDATE rounds SET label = ? WHERE round_id = ?", (label, round_id))
+        except sqlite3.IntegrityError:
+            return False
+    return True
+
+
+def delete_round(round_id, path=None):
+    """Remove a round and its aggregates; returns False if there was none."""
+    with closing(connect(path)) as conn, conn:
+        conn.execute("DELETE FROM country_metrics WHERE round_id = ?", (round_id,))
+        return conn.execute("DELETE FROM rounds WHERE round_id = ?", (round_id,)).rowcount > 0
+
+
+def round_name(round_id, ingested_at):
+    """Unique x-axis value of a round: its id and ingestion time."""
+    return f"#{round_id} · {ingested_at[:16].replace('T', ' ')}"
+
+
+def load_rounds(path=None):
+    with closing(connect(path)) as conn:
+        return pd.read_sql_query(
+            "SELECT round_id, label, ingested_at, num_sites, num_countries "
+            "FROM rounds ORDER BY round_id", conn
+        )
+
+
+def load_trends(countries=None, metrics=None, path=None):
+    """Per-round values, optionally restricted to some countries/metrics."""
+    sql = ("SELECT r.round_id, r.label AS Label, r.ingested_at, "
+           "m.country AS Country, m.metric AS Metric, m.value AS Value "
+           "FROM country_metrics m JOIN rounds r USING (round_id)")
+    where, params = [], []
+    if countries:
+        where.append(f"m.country IN ({','.join('?' * len(countries))})")
+        params += list(countries)
+    if metrics:
+        where.append(f"m.metric IN ({','.join('?' * len(metrics))})")
+        params += list(metrics)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY r.round_id, m.country"
+    with closing(connect(path)) as conn:
+        trends = pd.read_sql_query(sql, conn, params=params)
+    trends.insert(1, "Round", [round_name(r, t) for r, t in zip(trends["round_id"], trends["ingested_at"])])
+    return trends
@@ -0,0 +1,222 @@
+"""Declarative per-site metrics.
+
+Metric definitions live in ``metrics.toml`` (override the path with
+``DASHBOARD_METRICS``); the file documents the available keys. For a given
+set of survey columns the definitions are compiled once into a ``Plan``:
+column selectors are resolved, and every source column is read only once
+per read kind, even when several metrics use it. ``Plan.evaluate`` then
+computes all metrics from those shared column blocks with numpy
+reductions, in definition order, so a metric can build on earlier ones
+through ``inputs``.
+"""
+import functools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import tomllib
+except ImportError:
+    import toml as tomllib
+
+import numeric
+
+
+DEFINITIONS_PATH = os.environ.get(
+    "DASHBOARD_METRICS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics.toml"),
+)
+
+READS = ("yes", "binary", "number")
+AGGS = ("any", "sum", "max", "min", "mean")
+COUNTRY_AGGS = ("mean", "sum", "max")
+DTYPES = {"int": np.int64, "bool": bool, "float": float}
+binary_words = ("yes", "oui", "checked")
+
+
+def load_definitions(path=DEFINITIONS_PATH):
+    """Read and check the metric definitions; returns a list of dicts."""
+    if tomllib.__name__ == "tomllib":
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    else:
+        config = tomllib.load(path)
+
+    definitions, seen = [], set()
+    for d in config.get("metric", []):
+        name = d.get("name")
+        where = f"{path}: metric {name!r}"
+        if not name or name in seen:
+            raise ValueError(f"{where}: missing or duplicate name")
+        if ("inputs" in d) == ("columns" in d):
+            raise ValueError(f"{where}: give either columns or inputs")
+        for i in d.get("inputs", []):
+            if i not in seen:
+                raise ValueError(f"{where}: input {i!r} is not defined above it")
+        if "columns" in d:
+            unknown = set(d["columns"]) - {"exact", "regex", "contains", "prefix"}
+            if unknown:
+                raise ValueError(f"{where}: unknown column selector {', '.join(sorted(unknown))}")
+            if d.get("read") not in READS:
+                raise ValueError(f"{where}: read must be one of {', '.join(READS)}")
+        if d.get("agg") not in AGGS:
+            raise ValueError(f"{where}: agg must be one of {', '.join(AGGS)}")
+        if "weights" in d:
+            weights = d["weights"]
+            if d["agg"] not in ("sum", "mean"):
+                raise ValueError(f"{where}: weights only apply to sum and mean")
+            if (not isinstance(weights, list) or not weights
+                    or not all(isinstance(w, (int, float)) and not isinstance(w, bool) for w in weights)):
+                raise ValueError(f"{where}: weights must be a non-empty list of numbers")
+            if "columns" in d and set(d["columns"]) == {"exact"} and len(weights) != len(d["columns"]["exact"]):
+                raise ValueError(f"{where}: {len(weights)} weights for {len(d['columns']['exact'])} exact columns")
+        if d.get("dtype", "float") not in DTYPES:
+            raise ValueError(f"{where}: dtype must be one of {', '.join(DTYPES)}")
+        if d.get("read") == "number" and d.get("dtype", "float") != "float" and "fill" not in d:
+            # Blank and unreadable answers are NaN, which an int or bool column cannot hold
+            raise ValueError(f"{where}: number reads with dtype {d['dtype']!r} need a fill value")
+        if "clip" in d and (not isinstance(d["clip"], list) or len(d["clip"]) != 2):
+            raise ValueError(f"{where}: clip must be [lo, hi]")
+        if "country" in d and d["country"] not in COUNTRY_AGGS:
+            raise ValueError(f"{where}: country must be one of {', '.join(COUNTRY_AGGS)}")
+        seen.add(name)
+        definitions.append(d)
+    return definitions
+
+
+DEFINITIONS = load_definitions()
+
+
+def group(name):
+    """Definitions of one dashboard group, in order."""
+    return [d for d in DEFINITIONS if d.get("group") == name]
+
+
+def extra_indicators():
+    """Definitions without a group that have a per-country aggregation."""
+    return [d for d in DEFINITIONS if "group" not in d and "country" in d]
+
+
+def select_columns(columns, selectors):
+    """Survey columns matched by a ``columns`` selector, in frame order."""
+    exact = set(selectors.get("exact", []))
+    regex = [re.compile(p, re.I) for p in selectors.get("regex", [])]
+    contains = selectors.get("contains", [])
+    prefix = tuple(selectors.get("prefix", []))
+    return [
+        c for c in columns
+        if c in exact
+        or any(r.search(c) for r in regex)
+        or any(t in c.lower() for t in contains)
+        or (prefix and c.startswith(prefix))
+    ]
+
+
+def _reduce(block, agg, weights):
+    if weights is not None:
+        block = block * np.asarray(weights, dtype=float)
+    if agg == "any":
+        return block.any(axis=1)
+    if agg == "sum":
+        return block.sum(axis=1)
+    if agg == "max":
+        return np.fmax.reduce(block, axis=1)
+    if agg == "min":
+        return np.fmin.reduce(block, axis=1)
+    total = block.sum(axis=1)
+    return total / (np.sum(weights) if weights is not None else block.shape[1])
+
+
+class Plan:
+    """Metric definitions bound to one set of survey columns."""
+
+    def __init__(self, definitions, columns):
+        self.definitions = definitions
+        # Source columns per read kind, each listed once
+        self.sources = {read: [] for read in READS}
+        self.steps = []
+        for d in definitions:
+            if "inputs" in d:
+                self.steps.append((d, None, None))
+                continue
+            cols = select_columns(columns, d["columns"])
+            if "weights" in d and len(d["weights"]) != len(cols):
+                raise ValueError(
+                    f"metric {d['name']!r} in {DEFINITIONS_PATH} has {len(d['weights'])} weights, but "
+                    f"{len(cols)} columns of this export match it ({', '.join(map(repr, cols)) or 'none'}); "
+                    "update its weights or column selector to match the export's headers"
+                )
+            src = self.sources[d["read"]]
+            for c in cols:
+                if c not in src:
+                    src.append(c)
+            self.steps.append((d, d["read"], [src.index(c) for c in cols]))
+
+    def read_blocks(self, df):
+        """One array per read kind over its source columns, plus parse confidence."""
+        blocks = {}
+        yes_cols = self.sources["yes"]
+        blocks["yes"] = df[yes_cols].eq("Yes").to_numpy() if yes_cols else None
+
+        bin_cols = self.sources["binary"]
+        blocks["binary"] = np.column_stack([
+            df[c].astype(str).str.strip().str.lower().isin(binary_words).to_numpy().astype(np.int64)
+            for c in bin_cols
+        ]) if bin_cols else None
+
+        confidence = pd.DataFrame(index=df.index)
+        values = []
+        for c in self.sources["number"]:
+            parsed = numeric.extract_numbers(df[c])
+            values.append(parsed["value"].to_numpy(dtype=float))
+            confidence[c] = parsed["confidence"]
+        blocks["number"] = np.column_stack(values) if values else None
+        return blocks, confidence
+
+    def evaluate(self, df):
+        """Every metric for the rows of ``df``; returns (metrics frame, confidence)."""
+        blocks, confidence = self.read_blocks(df)
+        out = {}
+        for d, read, idx in self.steps:
+            if read is None:
+                block = np.column_stack([out[i] for i in d["inputs"]])
+            elif idx:
+                block = blocks[read][:, idx]
+            else:
+                block = None
+
+            if block is None:
+                values = np.full(len(df), d.get("default", 0))
+            else:
+                values = _reduce(block, d["agg"], d.get("weights"))
+            values = values.astype(float) if d.get("dtype", "float") == "float" else values
+
+            if "fill" in d and values.dtype.kind == "f":
+                values = np.where(np.isnan(values), d["fill"], values)
+            if "clip" in d:
+                values = np.clip(values, *d["clip"])
+            if "divide" in d:
+                values = values / d["divide"]
+            if "round" in d:
+                values = np.round(values, d["round"])
+            out[d["name"]] = values.astype(DTYPES[d.get("dtype", "float")])
+        return pd.DataFrame(out, index=df.index), confidence
+
+
+@functools.lru_cache(maxsize=32)
+def compile_plan(columns):
+    """The ``Plan`` for a tuple of survey column names (cached)."""
+    return Plan(DEFINITIONS, columns)
+
+
+def country_table(df):
+    """Per-country values of the extra indicators, keyed by their labels."""
+    extra = extra_indicators()
+    if not extra:
+        return pd.DataFrame({"Country": sorted(df["Country"].dropna().unique())})
+    table = df.groupby("Country").agg(**{
+        d.get("label", d["name"]): (d["name"], d["country"]) for d in extra
+    })
+    return table.reset_index()
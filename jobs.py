@@ -0,0 +1,152 @@
+"""Background precomputation of uploaded datasets.
+
+A job is started as soon as the upload page sees file bytes; the results
+page attaches to the in-flight job (or its finished bundle) by dataset key.
+Jobs are shared by every session of the server process, so two users
+uploading the same files only compute once; the stages themselves run in
+the shared process pool of ``workers``. Finished datasets are not added
+to the survey-round ``history``; users save rounds explicitly.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import crosstab
+import pipeline
+import ranking
+import search
+import sketches
+import sql_backend
+import workers
+
+
+# Finished bundles kept around for sessions that come back to them
+MAX_JOBS = 8
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="precompute")
+_lock = threading.Lock()
+_jobs = OrderedDict()
+# Keys of datasets kept regardless of MAX_JOBS (the watched data directory)
+_pinned = set()
+
+
+def dataset_key(en_bytes, fr_bytes):
+    """Stable hash of the uploaded EN/FR bytes."""
+    h = hashlib.sha1()
+    for b in (en_bytes, fr_bytes):
+        if b is None:
+            h.update(b"\0")
+        else:
+            h.update(b"\1" + len(b).to_bytes(8, "little"))
+            h.update(b)
+    return h.hexdigest()
+
+
+class Superseded(Exception):
+    """Raised in a job that was discarded before its last stage."""
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.pct = 0
+        self.stage = "Queued"
+        self.future = None
+        self.discarded = False
+
+    def report(self, pct, stage):
+        self.pct = pct
+        self.stage = stage
+
+    def done(self):
+        return self.future.done()
+
+    def failed(self):
+        return self.future.done() and self.future.exception() is not None
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+def _load(en_bytes, fr_bytes, progress):
+    return pipeline.load_dataset(en_bytes, fr_bytes, progress=progress)
+
+
+def _metrics(key, df, progress):
+    if sql_backend.enabled():
+        aggregate = sql_backend.aggregator(key)
+    else:
+        aggregate = pipeline.aggregate_metrics
+    bundle = pipeline.compute_metrics(df, progress=progress,
+                                      aggregate=sketches.approximate(aggregate))
+    progress(98, "Building search index and site ranking")
+    bundle["search_index"] = search.build_index(bundle)
+    bundle["ranking"] = ranking.build_ranking(bundle)
+    progress(99, "Building crosstab cube")
+    bundle["crosstab"] = crosstab.build_cube(bundle)
+    return bundle
+
+
+def _run(job, en_bytes, fr_bytes):
+    # Both stages run in the shared worker pool (see workers)
+    df = workers.run(job.key, "load", _load, en_bytes, fr_bytes, progress=job.report).result()
+    if job.discarded:
+        raise Superseded(job.key)
+    return workers.run(job.key, "metrics", _metrics, job.key, df, progress=job.report).result()
+
+
+def submit(en_bytes, fr_bytes, pin=False):
+    """Return the job for these bytes, starting it if it is not known yet.
+
+    A failed job is retried on the next submit. A pinned job is never
+    evicted until ``unpin`` is called.
+    """
+    key = dataset_key(en_bytes, fr_bytes)
+    with _lock:
+        if pin:
+            _pinned.add(key)
+        job = _jobs.get(key)
+        if job is not None and not job.failed():
+            _jobs.move_to_end(key)
+            return job
+        job = Job(key)
+        job.future = _executor.submit(_run, job, en_bytes, fr_bytes)
+        _jobs[key] = job
+        _evict()
+    return job
+
+
+def discard(key):
+    """Drop the job for ``key`` if nobody pinned it, e.g. when an upload is superseded.
+
+    A queued job never starts and a running one stops after its current
+    stage. A session that still wants the dataset simply submits it again.
+    """
+    with _lock:
+        job = _jobs.get(key)
+        if job is None or key in _pinned:
+            return
+        del _jobs[key]
+        job.discarded = True
+        job.future.cancel()
+
+
+def unpin(key):
+    with _lock:
+        _pinned.discard(key)
+        _evict()
+
+
+def get(key):
+    with _lock:
+        return _jobs.get(key)
+
+
+def _evict():
+    # Drop the oldest finished jobs; never drop one still running or pinned
+    for key in list(_jobs):
+        if len(_jobs) - len(_pinned & _jobs.keys()) <= MAX_JOBS:
+            break
+        if _jobs[key].done() and key not in _pinned:
+            del _jobs[key]
@@ -0,0 +1,146 @@
+"""Cross-language record linkage of site submissions.
+
+A site that answered both the English and the French survey appears twice
+after the two files are concatenated. ``link_records`` finds EN/FR pairs
+describing the same site and resolves each pair according to a policy:
+
+    merge      one row: the English answers, blanks filled from the French row
+    prefer_en  keep the English row, drop the French one
+    prefer_fr  keep the French row, drop the English one
+    off        no linkage
+
+Names are accent-stripped, lower-cased and tokenized, with common French
+institution words mapped to their English form ("hôpital" -> "hospital").
+Candidate pairs are only formed inside a Country between rows sharing a
+rare name token (blocking), so the work grows with the number of rows
+rather than with EN x FR. A candidate is a match when the token sets have a
+Jaccard similarity of at least ``THRESHOLD`` and the same numbers; each row
+is linked at most once, best score first.
+
+The policy is set with ``DASHBOARD_DEDUP`` (default ``merge``).
+"""
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+POLICIES = ("merge", "prefer_en", "prefer_fr", "off")
+POLICY = os.environ.get("DASHBOARD_DEDUP", "merge")
+THRESHOLD = float(os.environ.get("DASHBOARD_DEDUP_THRESHOLD", 0.8))
+
+# Tokens shared by more rows than this (within a country) are not used as
+# blocking keys; every row still blocks on at least its rarest token
+MAX_BLOCK = 50
+
+stopwords = {
+    "the", "of", "and", "for", "in", "at",
+    "de", "du", "des", "la", "le", "les", "l", "d", "et", "pour", "en", "a", "au", "aux",
+}
+french_words = {
+    "hopital": "hospital", "hospitalier": "hospital", "hospitaliere": "hospital",
+    "universite": "university", "universitaire": "university",
+    "centre": "center", "institut": "institute", "laboratoire": "laboratory",
+    "recherche": "research", "recherches": "research", "sante": "health",
+    "nationale": "national", "regional": "regional", "regionale": "regional",
+    "clinique": "clinic", "faculte": "faculty", "medecine": "medicine",
+    "ecole": "school", "programme": "program", "ministere": "ministry",
+}
+_token_re = re.compile(r"[a-z0-9]+")
+
+
+def name_tokens(name):
+    """Language-neutral token set of a site name."""
+    if not isinstance(name, str):
+        return frozenset()
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    return frozenset(
+        french_words.get(t, t) for t in _token_re.findall(text) if t not in stopwords
+    )
+
+
+def _numbers(tokens):
+    return {t for t in tokens if t.isdigit()}
+
+
+def candidate_pairs(countries, tokens, source):
+    """(EN row, FR row) position pairs sharing a blocking token in one country."""
+    long = pd.DataFrame({
+        "row": np.repeat(np.arange(len(tokens)), [len(t) for t in tokens]),
+        "token": [t for ts in tokens for t in ts],
+    })
+    long["Country"] = countries[long["row"].to_numpy()]
+    long["fr"] = source[long["row"].to_numpy()]
+    long["df"] = long.groupby(["Country", "token"])["row"].transform("size")
+    rarest = long.groupby("row")["df"].transform("min")
+    blocks = long[(long["df"] <= MAX_BLOCK) | (long["df"] == rarest)]
+
+    pairs = blocks[~blocks["fr"]].merge(
+        blocks[blocks["fr"]], on=["Country", "token"], suffixes=("_en", "_fr")
+    )[["row_en", "row_fr"]].drop_duplicates()
+    return pairs["row_en"].to_numpy(), pairs["row_fr"].to_numpy()
+
+
+def match(df, name_col, source, threshold=THRESHOLD):
+    """One-to-one EN/FR matches as a frame of row positions and scores."""
+    tokens = [name_tokens(n) for n in df[name_col]]
+    en, fr = candidate_pairs(df["Country"].astype(str).to_numpy(), tokens, np.asarray(source, dtype=bool))
+
+    scores = np.array([
+        len(tokens[a] & tokens[b]) / len(tokens[a] | tokens[b])
+        if _numbers(tokens[a]) == _numbers(tokens[b]) else 0.0
+        for a, b in zip(en, fr)
+    ])
+    ok = scores >= threshold if len(scores) else np.zeros(0, dtype=bool)
+    cands = pd.DataFrame({"en": en[ok], "fr": fr[ok], "score": scores[ok]})
+    cands = cands.sort_values(["score", "en", "fr"], ascending=[False, True, True], kind="stable")
+
+    # Greedy one-to-one assignment, best score first
+    used_en, used_fr, keep = set(), set(), []
+    for i, a, b in zip(cands.index, cands["en"], cands["fr"]):
+        if a in used_en or b in used_fr:
+            continue
+        used_en.add(a)
+        used_fr.add(b)
+        keep.append(i)
+    return cands.loc[keep].sort_values("en").reset_index(drop=True)
+
+
+def link_records(df, name_col, source, policy=POLICY):
+    """Resolve EN/FR duplicates in ``df``; returns (frame, duplicates report).
+
+    ``source`` flags the rows that came from the French file. The frame
+    keeps its column order and gets a fresh RangeIndex.
+    """
+    report_cols = ["Country", "Name (EN)", "Name (FR)", "Score", "Action"]
+    if policy not in POLICIES:
+        raise ValueError(f"unknown duplicate policy {policy!r}; expected one of {', '.join(POLICIES)}")
+    if policy == "off" or df.empty or name_col not in df.columns or "Country" not in df.columns:
+        return df, pd.DataFrame(columns=report_cols)
+
+    pairs = match(df, name_col, source)
+    en_pos, fr_pos = pairs["en"].to_numpy(), pairs["fr"].to_numpy()
+    report = pd.DataFrame({
+        "Country": df["Country"].to_numpy()[en_pos],
+        "Name (EN)": df[name_col].to_numpy()[en_pos],
+        "Name (FR)": df[name_col].to_numpy()[fr_pos],
+        "Score": pairs["score"].round(2).to_numpy(),
+        "Action": {"merge": "merged", "prefer_en": "kept EN", "prefer_fr": "kept FR"}[policy],
+    })
+    if pairs.empty:
+        return df, report
+
+    out = df.copy()
+    if policy == "merge":
+        for col in out.columns[out.dtypes == object]:
+            values = out[col].to_numpy(copy=True)
+            blank = values[en_pos] == ""
+            values[en_pos[blank]] = values[fr_pos[blank]]
+            out[col] = values
+        drop = fr_pos
+    else:
+        drop = fr_pos if policy == "prefer_en" else en_pos
+    out = out.drop(index=out.index[drop]).reset_index(drop=True)
+    return out, report
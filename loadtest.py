@@ -0,0 +1,405 @@
+"""Concurrent-session load test for the dashboard's rerun latency.
+
+Starts the app once as a headless ``streamlit run`` server and connects N
+simulated browser sessions to it over Streamlit's websocket protocol, all
+driven from one asyncio loop in this process. Each session uploads the
+CSVs through the server's upload endpoint (which starts the background
+job), presses "Analyze Data" and follows the progress polling until the
+dashboard is ready, then does a random walk of Deep-Dive multiselect
+changes, site searches and download preparations. Every script rerun is
+timed from the request until the server reports the run finished, so the
+latencies include the contention between sessions inside one server
+process: script threads, the GIL, the shared job cache and worker pool.
+
+Tab switches are client-side only (every tab is rendered on each rerun)
+and cost nothing on the server, so they are not simulated. Memory is the
+resident set of the server and its worker processes, read from ``/proc``
+before the sessions start and at the end.
+
+Usage:
+    python loadtest.py --en english.csv --fr french.csv --sessions 8 --steps 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import FileUploaderState, UploadedFileInfo
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.httpclient import AsyncHTTPClient
+from tornado.websocket import websocket_connect
+
+
+# Widgets the sessions read from the page, and the WidgetState field of their value
+value_fields = {
+    "button": "trigger_value",
+    "file_uploader": "file_uploader_state_value",
+    "multiselect": "string_array_value",
+    "text_input": "string_value",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port, timeout, log, state_dir):
+    """Run ``app`` in a headless Streamlit server and wait until it is healthy.
+
+    The survey-round history goes to ``state_dir``, so a test run never
+    touches the app's own ``history.sqlite``.
+    """
+    env = dict(os.environ, DASHBOARD_HISTORY_DB=os.path.join(state_dir, "history.sqlite"))
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", app,
+        "--server.headless", "true",
+        "--server.address", "127.0.0.1",
+        "--server.port", str(port),
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+        # The upload PUTs below carry no XSRF cookie
+        "--server.enableXsrfProtection", "false",
+    ]
+    proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    stop_server(proc)
+    log.seek(0)
+    raise RuntimeError("server did not start:\n" + log.read().decode(errors="replace")[-2000:])
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def tree_rss_mb(pid):
+    """Resident memory of ``pid`` and all its descendants (Linux /proc)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces; fields resume after ')'
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        children = [p for p, parent in parents.items() if parent in frontier and p not in tree]
+        tree.update(children)
+        frontier = children
+    kb = 0
+    for p in tree:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                kb += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        except OSError:
+            continue
+    return kb / 1024
+
+
+def multipart(name, data):
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            "Content-Type: text/csv\r\n\r\n").encode()
+    return head + data + f"\r\n--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+class Session:
+    """One simulated browser tab connected to the server."""
+
+    def __init__(self, base, timeout):
+        self.base = base
+        self.timeout = timeout
+        self.ws = None
+        self.session_id = ""
+        self.page_hash = ""
+        # Widgets of the last full run, by id, and the values sent with every rerun
+        self.widgets = {}
+        self.values = {}
+        # Fragments the page asked to rerun on a timer: {fragment id: seconds}
+        self.auto_reruns = {}
+
+    async def connect(self):
+        self.ws = await websocket_connect(
+            self.base.replace("http", "ws", 1) + "/_stcore/stream",
+            subprotocols=["streamlit"], max_message_size=1 << 30,
+        )
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    async def send(self, msg):
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+    async def receive(self):
+        raw = await asyncio.wait_for(self.ws.read_message(), self.timeout)
+        if raw is None:
+            raise RuntimeError("server closed the connection")
+        msg = ForwardMsg()
+        msg.ParseFromString(raw)
+        return msg
+
+    def find(self, kind, label=None):
+        return [w for w, k in self.widgets.values() if k == kind and (label is None or w.label == label)]
+
+    async def rerun(self, trigger=None, fragment_id=""):
+        """Rerun the page (or one fragment) and wait for it; returns seconds."""
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.page_script_hash = self.page_hash
+        state.fragment_id = fragment_id
+        state.is_auto_rerun = bool(fragment_id)
+        for wid, (field, value) in self.values.items():
+            w = state.widget_states.widgets.add()
+            w.id = wid
+            if field == "string_array_value":
+                w.string_array_value.data.extend(value)
+            elif field == "file_uploader_state_value":
+                w.file_uploader_state_value.CopyFrom(value)
+            else:
+                setattr(w, field, value)
+        if trigger is not None:
+            w = state.widget_states.widgets.add()
+            w.id = trigger.id
+            w.trigger_value = True
+
+        t0 = time.perf_counter()
+        await self.send(msg)
+        while True:
+            fm = await self.receive()
+            kind = fm.WhichOneof("type")
+            if kind == "new_session":
+                if fm.new_session.initialize.session_id:
+                    self.session_id = fm.new_session.initialize.session_id
+                self.page_hash = fm.new_session.page_script_hash
+                if not fm.new_session.fragment_ids_this_run:
+                    self.widgets, self.auto_reruns = {}, {}
+            elif kind == "auto_rerun":
+                self.auto_reruns[fm.auto_rerun.fragment_id] = fm.auto_rerun.interval
+            elif kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                element = fm.delta.new_element
+                etype = element.WhichOneof("type")
+                if etype == "exception":
+                    raise RuntimeError(element.exception.message)
+                if etype in value_fields:
+                    widget = getattr(element, etype)
+                    self.widgets[widget.id] = (widget, etype)
+            elif kind == "script_finished" and fm.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - t0
+
+    async def until(self, ready):
+        """Follow the page's timed fragment reruns (progress polling) until ``ready()``."""
+        deadline = time.monotonic() + self.timeout
+        while not ready():
+            if not self.auto_reruns:
+                raise RuntimeError("page stopped refreshing before it was ready")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"page not ready after {self.timeout}s")
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            await asyncio.sleep(interval)
+            await self.rerun(fragment_id=fragment_id)
+
+    async def upload(self, uploader, name, data):
+        """Upload ``data`` the way the browser does and set it on ``uploader``."""
+        msg = BackMsg()
+        request = msg.file_urls_request
+        request.request_id = uuid.uuid4().hex
+        request.session_id = self.session_id
+        request.file_names.append(name)
+        await self.send(msg)
+        while True:
+            fm = await self.receive()
+            if fm.WhichOneof("type") == "file_urls_response" and fm.file_urls_response.response_id == request.request_id:
+                break
+        if fm.file_urls_response.error_msg:
+            raise RuntimeError(fm.file_urls_response.error_msg)
+        urls = fm.file_urls_response.file_urls[0]
+
+        body, content_type = multipart(name, data)
+        await AsyncHTTPClient().fetch(
+            self.base + urls.upload_url, method="PUT", body=body,
+            headers={"Content-Type": content_type}, request_timeout=self.timeout,
+        )
+        info = UploadedFileInfo(id=1, name=name, size=len(data), file_id=urls.file_id)
+        info.file_urls.CopyFrom(urls)
+        self.values[uploader.id] = ("file_uploader_state_value",
+                                    FileUploaderState(max_file_id=1, uploaded_file_info=[info]))
+
+
+async def run_session(session, files, steps, seed):
+    """One simulated user on an open session; returns its timings."""
+    rng = random.Random(seed)
+    samples = []
+    t_start = time.perf_counter()
+
+    # Both uploaders are on the page; the rerun after the uploads starts the job
+    for uploader, (name, data) in zip(session.find("file_uploader"), files):
+        if data is not None:
+            await session.upload(uploader, name, data)
+    samples.append(("upload", await session.rerun()))
+
+    # From the click until the dashboard is rendered, progress polling included
+    t0 = time.perf_counter()
+    await session.rerun(trigger=session.find("button", "Analyze Data")[0])
+    await session.until(lambda: session.find("multiselect"))
+    samples.append(("analyze", time.perf_counter() - t0))
+
+    countries = list(session.find("multiselect")[0].options)
+    queries = ["hop", "univ", "inst", "who", "site 1", "pasteur", "lab"]
+    for _ in range(steps):
+        action = rng.choice(["select", "select", "search", "download"])
+        if action == "select":
+            select = session.find("multiselect")[0]
+            session.values[select.id] = ("string_array_value",
+                                         rng.sample(countries, rng.randint(0, min(3, len(countries)))))
+            elapsed = await session.rerun()
+        elif action == "search":
+            search = session.find("text_input", "Search sites or stakeholders:")[0]
+            session.values[search.id] = ("string_value", rng.choice(queries))
+            elapsed = await session.rerun()
+        else:
+            prepare = [b for b in session.find("button") if b.label.startswith("Prepare:")]
+            if not prepare:
+                continue
+            elapsed = await session.rerun(trigger=rng.choice(prepare))
+        samples.append((action, elapsed))
+
+    return {"samples": samples, "wall": time.perf_counter() - t_start}
+
+
+async def drive(base, files, args):
+    sessions = [Session(base, args.timeout) for _ in range(args.sessions)]
+    try:
+        # Every session loads the upload page before any of them starts
+        for s in sessions:
+            await s.connect()
+        await asyncio.gather(*(s.rerun() for s in sessions))
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(
+            run_session(s, files, args.steps, args.seed + i) for i, s in enumerate(sessions)
+        ))
+        return results, time.perf_counter() - t0
+    finally:
+        for s in sessions:
+            s.close()
+
+
+def percentiles(values):
+    v = np.asarray(values)
+    return {
+        "n": int(len(v)),
+        "p50": float(np.percentile(v, 50)),
+        "p95": float(np.percentile(v, 95)),
+        "p99": float(np.percentile(v, 99)),
+        "max": float(v.max()),
+    }
+
+
+def summarize(results, wall, rss_before=None, rss_after=None):
+    samples = [s for r in results for s in r["samples"]]
+    by_action = {}
+    for action, secs in samples:
+        by_action.setdefault(action, []).append(secs)
+    summary = {
+        "sessions": len(results),
+        "reruns": len(samples),
+        "wall_s": wall,
+        "throughput_reruns_per_s": len(samples) / wall if wall else 0.0,
+        "latency_s": percentiles([s for _, s in samples]),
+        "latency_by_action_s": {a: percentiles(v) for a, v in sorted(by_action.items())},
+    }
+    if rss_before is not None:
+        summary["server_rss_mb"] = {
+            "before": rss_before,
+            "after": rss_after,
+            "growth_per_session": (rss_after - rss_before) / max(len(results), 1),
+        }
+    return summary
+
+
+def print_report(summary):
+    print(f"{summary['sessions']} sessions, {summary['reruns']} reruns in {summary['wall_s']:.1f}s "
+          f"({summary['throughput_reruns_per_s']:.2f} reruns/s)")
+    print(f"{'':<12}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    rows = [("all", summary["latency_s"])] + list(summary["latency_by_action_s"].items())
+    for name, p in rows:
+        print(f"{name:<12}{p['n']:>6}{p['p50']:>9.3f}{p['p95']:>9.3f}{p['p99']:>9.3f}{p['max']:>9.3f}")
+    mem = summary.get("server_rss_mb")
+    if mem:
+        print(f"server memory (MB): {mem['before']:.1f} before, {mem['after']:.1f} after, "
+              f"{mem['growth_per_session']:.1f} per session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--url", help="use this running server instead of starting one "
+                                      "(it must run with --server.enableXsrfProtection false)")
+    parser.add_argument("--en", help="English CSV")
+    parser.add_argument("--fr", help="French CSV")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=10, help="interactions per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args()
+    if not (args.en or args.fr):
+        parser.error("give at least one of --en / --fr")
+
+    files = [
+        (os.path.basename(path), open(path, "rb").read()) if path else (None, None)
+        for path in (args.en, args.fr)
+    ]
+
+    proc = None
+    with tempfile.TemporaryFile() as log, tempfile.TemporaryDirectory() as state_dir:
+        if args.url:
+            base = args.url.rstrip("/")
+        else:
+            port = free_port()
+            base = f"http://127.0.0.1:{port}"
+            proc = start_server(args.app, port, args.timeout, log, state_dir)
+        try:
+            rss_before = tree_rss_mb(proc.pid) if proc else None
+            results, wall = asyncio.run(drive(base, files, args))
+            rss_after = tree_rss_mb(proc.pid) if proc else None
+        finally:
+            if proc is not None:
+                stop_server(proc)
+
+    summary = summarize(results, wall, rss_before, rss_after)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Choropleth maps of the core metrics (Tab 10 and the report bundle).
+
+Maps are drawn from a pre-simplified geometry of the target countries
+(``assets/africa_targets.geojson``, built by ``build_geometry.py``; it is
+not shipped with the app), loaded once per version of the file: a geometry
+built or replaced while the server runs is picked up on the next render. With the base map
+switched off plotly.js fetches no world topology, so the tab also works
+without network access. If the geometry file is missing the maps fall
+back to plotly's built-in ISO-3 country shapes, which the browser fetches
+from the plotly CDN; ``fallback_warning`` says so and the event is logged.
+"""
+import functools
+import json
+import logging
+import math
+import os
+
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+
+GEOMETRY_PATH = os.environ.get(
+    "DASHBOARD_GEOMETRY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "africa_targets.geojson"),
+)
+
+colorscale = ["#D0E8D8","#1A5632"]
+
+log = logging.getLogger(__name__)
+
+
+# Geometry paths already reported missing, so the warning is logged once
+_missing = set()
+
+
+def geometry():
+    """The bundled GeoJSON FeatureCollection, or None if it is not installed."""
+    try:
+        mtime = os.stat(GEOMETRY_PATH).st_mtime_ns
+    except FileNotFoundError:
+        if GEOMETRY_PATH not in _missing:
+            _missing.add(GEOMETRY_PATH)
+            log.warning("Map geometry %s not found; maps fall back to plotly's built-in "
+                        "country shapes, fetched from the plotly CDN", GEOMETRY_PATH)
+        return None
+    _missing.discard(GEOMETRY_PATH)
+    return _load_geometry(GEOMETRY_PATH, mtime)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_geometry(path, mtime):
+    # Keyed on the modification time, so a rebuilt file is read again
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fallback_warning():
+    """A note for the page when maps need network access, else None."""
+    if geometry() is not None:
+        return None
+    return (f"Map geometry not found ({GEOMETRY_PATH}), so the maps use plotly's built-in "
+            "country shapes, which your browser downloads from the plotly CDN; they stay blank "
+            "offline. Build the geometry with build_geometry.py or set DASHBOARD_GEOMETRY.")
+
+
+def map_file_name(metric):
+    return f"{metric.replace(' ', '_').lower()}_map.html"
+
+
+def _geo_kwargs():
+    geo = geometry()
+    if geo is None:
+        return dict(locationmode="ISO-3")
+    return dict(geojson=geo, featureidkey="properties.ISO_A3")
+
+
+def _style_geos(fig):
+    if geometry() is None:
+        fig.update_geos(
+            visible=False,
+            showland=True,
+            landcolor="lightgray",
+            showcountries=True,
+            countrycolor="white",
+            scope="africa"
+        )
+    else:
+        fig.update_geos(visible=False, fitbounds="locations", projection_type="mercator")
+
+
+def choropleth(map_long, metric):
+    """Africa choropleth of one metric from the long ``map_long`` frame."""
+    df_m = map_long[map_long["Metric"] == metric]
+    fig = px.choropleth(
+        df_m,
+        locations="ISO_A3",
+        hover_name="Country",
+        color="Value",
+        color_continuous_scale=colorscale,
+        title=metric,
+        **_geo_kwargs()
+    )
+    fig.update_traces(marker_line_color="white", marker_line_width=0.5)
+    _style_geos(fig)
+    fig.update_layout(
+        margin=dict(t=50, b=0, l=0, r=0),
+        height=500 if geometry() is not None else 800
+    )
+    return fig
+
+
+def small_multiples(map_long, cols=3):
+    """Every metric in one figure, one small map each with its own color range."""
+    metrics = list(map_long["Metric"].unique())
+    rows = max(1, math.ceil(len(metrics) / cols))
+    fig = make_subplots(
+        rows=rows, cols=cols,
+        specs=[[{"type": "choropleth"}] * cols for _ in range(rows)],
+        subplot_titles=metrics,
+        horizontal_spacing=0.01, vertical_spacing=0.06
+    )
+    for i, metric in enumerate(metrics):
+        df_m = map_long[map_long["Metric"] == metric]
+        fig.add_trace(
+            go.Choropleth(
+                locations=df_m["ISO_A3"],
+                z=df_m["Value"],
+                text=df_m["Country"],
+                colorscale=colorscale,
+                showscale=False,
+                marker_line_color="white",
+                marker_line_width=0.5,
+                name=metric,
+                hovertemplate="%{text}<br>" + metric + ": %{z:.2f}<extra></extra>",
+                **_geo_kwargs()
+            ),
+            row=i // cols + 1, col=i % cols + 1
+        )
+    _style_geos(fig)
+    fig.update_layout(
+        margin=dict(t=40, b=0, l=0, r=0),
+        height=300 * rows
+    )
+    return fig
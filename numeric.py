@@ -0,0 +1,89 @@
+"""Numeric extraction from free-form survey answers.
+
+Staff counts and budget shares are typed by respondents, so besides plain
+numbers we see "12 staff", "5-10", "approx. 3", "1,5 %", "1 000" or
+"0.5% of budget". ``extract_numbers`` parses each distinct answer once
+with compiled regexes and returns a value and a confidence per cell:
+
+    1.0  a plain number with at most a decimal point (optionally with a % sign)
+    0.9  a number with thousands or decimal-comma separators to resolve
+         ("1,000", "1,5"), with surrounding text or units, or a word meaning zero
+    0.7  an approximate answer ("approx.", "about", "environ", "~", ">")
+    0.6  a range ("5-10", "5 à 10"); the midpoint is used
+    0.0  text with no number in it, or a negative number (counts and
+         shares cannot be negative)
+    NaN  blank answer
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+_num = r"\d{1,3}(?:[ \xa0\u202f,.]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?"
+number_re = re.compile(
+    rf"(?P<sign>[-−])?(?P<lo>{_num})(?:\s*(?:-|–|—|to|à|a)\s*(?P<hi>{_num}))?", re.I
+)
+plain_re = re.compile(r"\s*\d+(?:\.\d+)?\s*%?\s*")
+approx_re = re.compile(
+    r"approx|about|around|roughly|estimated|environ|presque|~|≈|±|\+/-|>|<|"
+    r"at least|more than|less than|over|under|plus de|moins de|au moins", re.I
+)
+zero_re = re.compile(r"\s*(?:none|nil|non?|zero|aucune?|z[ée]ro|n[ée]ant)\s*", re.I)
+thousands_re = re.compile(r"\d{1,3}(?:,\d{3})+")
+
+
+def to_float(token):
+    """Parse one extracted number, resolving thousands vs decimal separators."""
+    if not isinstance(token, str):
+        return np.nan
+    t = re.sub(r"[ \xa0\u202f]", "", token) if re.search(r"\d[ \xa0\u202f]\d", token) else token
+    if "," in t and "." in t:
+        # The last separator is the decimal one: 1.234,5 or 1,234.5
+        dec = "," if t.rfind(",") > t.rfind(".") else "."
+        t = t.replace("." if dec == "," else ",", "").replace(dec, ".")
+    elif "," in t:
+        # 1,000 / 12,000,000 are thousands; 1,5 / 12,50 is a French decimal
+        t = t.replace(",", "") if thousands_re.fullmatch(t) else t.replace(",", ".")
+    elif t.count(".") > 1:
+        t = t.replace(".", "")
+    return float(t)
+
+
+def extract_numbers(s: pd.Series) -> pd.DataFrame:
+    """Value and parse confidence for every cell of ``s`` (see module doc)."""
+    codes, uniques = pd.factorize(s.astype(str).str.strip())
+    u = pd.Series(uniques, dtype=object)
+
+    parts = u.str.extract(number_re)
+    lo = parts["lo"].map(to_float)
+    hi = parts["hi"].map(to_float)
+    value = lo.where(hi.isna(), (lo + hi) / 2).mask(parts["sign"].notna())
+
+    blank = u.eq("")
+    zero = u.str.fullmatch(zero_re) & value.isna()
+    value = value.mask(zero, 0.0)
+
+    confidence = pd.Series(0.9, index=u.index)
+    confidence = confidence.mask(u.str.fullmatch(plain_re), 1.0)
+    confidence = confidence.mask(u.str.contains(approx_re) & value.notna(), 0.7)
+    confidence = confidence.mask(hi.notna(), 0.6)
+    confidence = confidence.mask(value.isna(), 0.0)
+    confidence = confidence.mask(blank, np.nan)
+
+    return pd.DataFrame({
+        "value": value.to_numpy()[codes],
+        "confidence": confidence.to_numpy()[codes],
+    }, index=s.index)
+
+
+def confidence_summary(confidence: pd.DataFrame) -> dict:
+    """Counts of answered cells by parse outcome."""
+    c = confidence.to_numpy().ravel()
+    c = c[~np.isnan(c)]
+    return {
+        "answered": int(len(c)),
+        "exact": int((c == 1.0).sum()),
+        "estimated": int(((c > 0) & (c < 1.0)).sum()),
+        "unparsed": int((c == 0).sum()),
+    }
@@ -0,0 +1,430 @@
+"""Data pipeline behind the dashboard: ingestion and the metrics bundle.
+
+Nothing in here touches Streamlit, so the same functions can run in a
+background worker while the user is still on the upload page.
+"""
+import io
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import country_converter as coco
+import pycountry
+
+import indicators
+import linkage
+
+
+# Countries retained after standardization
+african_targets = {
+    "Nigeria","Togo","Ghana","Guinea-Bissau","Gambia",
+    "Sierra Leone","Burkina Faso","Mali","Cote dIvoire","Senegal","Guinea","Cabo Verde"
+}
+
+# Metric groups from the definitions in metrics.toml (see indicators, which
+# also holds the column selectors behind each metric)
+# Identification categories
+cats = [d["name"].removeprefix("Is") for d in indicators.group("identification")]
+# Human resource boolean & numeric groups
+bool_groups = [d["name"] for d in indicators.group("hr_flag")]
+num_groups = [d["name"] for d in indicators.group("hr_count")]
+
+# Free-text budget question behind Budget_pct
+budget_col = next(
+    (d["columns"]["exact"][0] for d in indicators.group("policy")
+     if d["name"] == "Budget_pct" and d["columns"].get("exact")),
+    None
+)
+
+yes_no_words = ("yes","no","oui","non","checked","unchecked")
+
+
+def noop_progress(pct, stage):
+    pass
+
+
+def strip_accents(s: str) -> str:
+    return (
+        unicodedata.normalize("NFKD", s)
+                   .encode("ascii", errors="ignore")
+                   .decode("utf-8", "ignore")
+                   .strip()
+    )
+
+
+def normalize_african_names(name: str) -> str:
+    """Normalize common African spellings without hard-coding entire list."""
+    n = name.strip()
+    # Côte d’Ivoire variations
+    n = re.sub(r'(?i)Cote\s*ditoire|Cote\s*dIvoire', "Cote dIvoire", n)
+    # Cabo Verde variations
+    n = re.sub(r'(?i)Cape\s*Verde', "Cabo Verde", n)
+    # Guinea-Bissau and Guinea variations
+    if re.search(r'(?i)Guinee\s*[-]?\s*Bissau', n):
+        n = "Guinea-Bissau"
+    elif re.fullmatch(r'(?i)Guinee', n):
+        n = "Guinea"
+    return n
+
+
+def load_dataset(en_bytes, fr_bytes, progress=noop_progress, dedup=linkage.POLICY):
+    """Read, harmonize and concatenate the uploaded EN/FR CSV bytes.
+
+    ``progress(pct, stage)`` is called between steps so callers can show
+    real stage progress. Sites submitted in both languages are resolved
+    with the ``dedup`` policy (see ``linkage``). The site-name column and
+    the duplicates report (as records) are stored in ``df.attrs``.
+    """
+    # 2) Read whichever files were provided, from bytes
+    progress(5, "Reading CSV files")
+    df_en = pd.read_csv(io.BytesIO(en_bytes), keep_default_na=False) if en_bytes else pd.DataFrame()
+    df_fr = pd.read_csv(io.BytesIO(fr_bytes), keep_default_na=False) if fr_bytes else pd.DataFrame()
+
+    # 3) In French dataset, drop "Région de l'UA" then rename the “Pays” column to “Country”
+    progress(15, "Detecting country columns")
+    if not df_fr.empty:
+        df_fr = df_fr.drop(columns=["Région de l'UA"], errors='ignore')
+        french_country_col = next((c for c in df_fr.columns if c.strip().lower() == "pays"), None)
+        if french_country_col:
+            df_fr = df_fr.rename(columns={french_country_col: "Country"})
+        else:
+            fallback_fr = next((c for c in df_fr.columns if "pays" in c.lower()), None)
+            if fallback_fr:
+                df_fr = df_fr.rename(columns={fallback_fr: "Country"})
+
+    # 4) In English dataset, if no “Country” column, try to detect any Country-like column
+    if not df_en.empty and "Country" not in df_en.columns:
+        fallback_en_col = next(
+            (c for c in df_en.columns if re.search(r'(?i)pays|country|region|r[ée]gion', c)),
+            None
+        )
+        if fallback_en_col:
+            df_en = df_en.rename(columns={fallback_en_col: "Country"})
+
+    # 5) Remove accents/diacritics from all “Country” entries
+    # 6) Normalize common African spellings
+    progress(20, "Standardizing country names")
+    if not df_en.empty and "Country" in df_en.columns:
+        df_en["Country"] = df_en["Country"].astype(str).apply(strip_accents).apply(normalize_african_names)
+    if not df_fr.empty and "Country" in df_fr.columns:
+        df_fr["Country"] = df_fr["Country"].astype(str).apply(strip_accents).apply(normalize_african_names)
+
+    # 7) Use country_converter to standardize to short names
+    cc = coco.CountryConverter()
+    if not df_en.empty and "Country" in df_en.columns:
+        mapped_en = cc.convert(names=df_en["Country"], to="name_short", not_found=None)
+        df_en["Country"] = [
+            mapped_en[i] if mapped_en[i] is not None else df_en.at[i, "Country"]
+            for i in range(len(df_en))
+        ]
+    if not df_fr.empty and "Country" in df_fr.columns:
+        mapped_fr = cc.convert(names=df_fr["Country"], to="name_short", not_found=None)
+        df_fr["Country"] = [
+            mapped_fr[i] if mapped_fr[i] is not None else df_fr.at[i, "Country"]
+            for i in range(len(df_fr))
+        ]
+
+    # 8) Filter to only African countries (post‐standardization)
+    if not df_en.empty and "Country" in df_en.columns:
+        df_en = df_en[df_en["Country"].isin(african_targets)].copy()
+    if not df_fr.empty and "Country" in df_fr.columns:
+        df_fr = df_fr[df_fr["Country"].isin(african_targets)].copy()
+
+    # 9) Header map if both exist
+    if not df_en.empty and not df_fr.empty:
+        df_fr.rename(columns=dict(zip(df_fr.columns, df_en.columns)), inplace=True)
+
+    # 10) Harmonize French Yes/No → English
+    progress(40, "Harmonizing French answers")
+    yes_no_map = {
+        'oui': 'Yes', 'non': 'No', 'yes': 'Yes', 'no': 'No',
+        'checked': 'Checked', 'coché': 'Checked',
+        'unchecked': 'Unchecked', 'non coché': 'Unchecked'
+    }
+    def harmonize(x):
+        return yes_no_map.get(x.strip().lower(), x) if isinstance(x, str) else x
+
+    if not df_fr.empty:
+        df_fr = df_fr.map(harmonize)
+
+    # 11) Align & concatenate
+    progress(50, "Merging datasets")
+    all_cols = list(dict.fromkeys(df_en.columns.tolist() + df_fr.columns.tolist()))
+    df_en = df_en.reindex(columns=all_cols, fill_value="")
+    df_fr = df_fr.reindex(columns=all_cols, fill_value="")
+    df = pd.concat([df_en, df_fr], ignore_index=True)
+    from_fr = np.r_[np.zeros(len(df_en), dtype=bool), np.ones(len(df_fr), dtype=bool)]
+
+    # 12) Drop fully blank columns
+    blank_cols = [c for c in df.columns if (df[c] == "").all()]
+    df.drop(columns=blank_cols, inplace=True)
+
+    # 13) Unify any lingering Yes/No/True/False → exactly "Yes" or "No"
+    progress(60, "Normalizing Yes/No answers")
+    def unify(v):
+        if not isinstance(v, str):
+            return v
+        t = v.strip().lower()
+        if t in ('oui','yes','checked','true','1'):
+            return 'Yes'
+        if t in ('non','no','unchecked','false','0'):
+            return 'No'
+        return v
+
+    # Free-form number columns keep "1"/"0": they are counts, not answers
+    number_cols = set(indicators.compile_plan(tuple(df.columns)).sources["number"])
+    answer_cols = [c for c in df.columns if c not in number_cols]
+    df[answer_cols] = df[answer_cols].map(unify)
+
+    # 14) Detect the "site name" column
+    name_col = next(
+        (c for c in df.columns if re.search(r'\bname\b', c, re.I)
+             or re.search(r'nom.*institut', c, re.I)),
+        df.columns[0]
+    )
+
+    # 15) Link sites submitted in both languages
+    progress(65, "Linking EN/FR duplicates")
+    df, duplicates = linkage.link_records(df, name_col, from_fr, dedup)
+    df.attrs["name_col"] = name_col
+    df.attrs["duplicates"] = duplicates.to_dict("records")
+    progress(70, "Dataset loaded")
+    return df
+
+
+def split_items(r: str) -> list[str]:
+    """Split a free-text stakeholder answer into individual names."""
+    tmp = re.sub(r"\d+\.", ";", r)
+    tmp = re.sub(r"[•·‣]", ";", tmp)
+    parts = re.split(r"[;,\n]+", tmp)
+    cleaned = []
+    for p in parts:
+        p = p.strip()
+        if not p:
+            continue
+        # skip if p is just Yes/No
+        if p.lower() in yes_no_words:
+            continue
+        cleaned.append(p)
+    return cleaned
+
+
+def stakeholder_columns(df):
+    """Free-text columns holding stakeholder names.
+
+    a) exactly "If yes, list the research collaborations in the last 5 years"
+    b) the column immediately after "Partnerships with industry"
+    """
+    free_cols = []
+    collab_col = next(
+        (c for c in df.columns
+         if c.strip().lower() == "if yes, list the research collaborations in the last 5 years".lower()),
+        None
+    )
+    if collab_col:
+        free_cols.append(collab_col)
+
+    pw_ind_col = next(
+        (i for i,c in enumerate(df.columns)
+         if c.strip().lower() == "partnerships with industry".lower()),
+        None
+    )
+    if pw_ind_col is not None and pw_ind_col + 1 < len(df.columns):
+        free_cols.append(df.columns[pw_ind_col + 1])
+    return free_cols
+
+
+def extract_stakeholders(df, name_col):
+    """One row per (Country, Site, Stakeholder) mention."""
+    # Build a list of (Country, Site, RawStakeholderText) from both columns
+    records = []
+    for col in stakeholder_columns(df):
+        series = df[col].astype(str)
+        # drop truly blank or "nan"
+        nonblank = series[series.str.strip().replace("nan","") != ""].dropna()
+        for idx, raw_text in nonblank.items():
+            raw_text = raw_text.strip()
+            # skip if the entire cell is just Yes/No (in any language or casing)
+            if raw_text.lower() in yes_no_words:
+                continue
+            site = str(df.at[idx, name_col]).strip()
+            if not site or site.lower() == "nan":
+                continue
+            records.append({
+                "Country": df.at[idx, "Country"],
+                "Site":     site,
+                "RawEntry": raw_text
+            })
+
+    # Normalize and split each RawEntry into individual stakeholders
+    site_stake_df = pd.DataFrame(records)
+    if site_stake_df.empty:
+        return pd.DataFrame(columns=["Country","Site","RawEntry","Stakeholder"])
+    return (
+        site_stake_df
+        .assign(Stakeholder=lambda df0: df0["RawEntry"].apply(split_items))
+        .explode("Stakeholder")
+        .reset_index(drop=True)
+    )
+
+
+def group_stakeholders(site_clean, by):
+    """SitesList/CountSites per ``by`` group, largest first within each Country."""
+    if site_clean.empty:
+        return pd.DataFrame(columns=by + ["SitesList","CountSites"])
+    sort_cols = [c for c in by if c == "Country"] + ["CountSites"]
+    return (
+        site_clean
+        .groupby(by)
+        .agg(
+            SitesList=('Site', lambda s: "; ".join(sorted(set(s)))),
+            CountSites=('Site', lambda s: s.nunique())
+        )
+        .reset_index()
+        # Stable, so ties keep the groupby's Stakeholder order (as the SQL engine does)
+        .sort_values(sort_cols, ascending=[True]*(len(sort_cols)-1) + [False], kind="stable")
+    )
+
+
+def fuzzy_iso(name):
+    try:
+        return pycountry.countries.get(name=name).alpha_3
+    except:
+        try:
+            return pycountry.countries.search_fuzzy(name)[0].alpha_3
+        except:
+            return None
+
+
+def derive_site_metrics(df, progress=noop_progress):
+    """Add the per-site flags and scores every tab builds on.
+
+    Returns the enriched copy of ``df``, the ``site_policy`` frame and the
+    parse confidence of every free-form numeric cell (see ``numeric``).
+    """
+    # 16) Policy flags, human resources, identification, Phase I,
+    #     infrastructure and ethics: every metric defined in metrics.toml
+    progress(75, "Computing site metrics")
+    plan = indicators.compile_plan(tuple(df.columns))
+    values, confidence = plan.evaluate(df)
+    df = pd.concat([df.drop(columns=values.columns, errors="ignore"), values], axis=1)
+
+    site_policy = pd.DataFrame({
+        'Country':      df['Country'],
+        'Exists':       df['PolicyExists'],
+        'Disseminated': df['PolicyDisseminated'] & df['PolicyExists'],
+        'Implemented':  df['PolicyImplemented'] & df['PolicyExists'],
+        'Budget':       df['Budget_pct'],
+        'SOP_Coverage': df['SOP_Coverage']
+    })
+    progress(85, "Site metrics done")
+
+    return df, site_policy, confidence
+
+
+def aggregate_metrics(df, site_policy, site_clean):
+    """Per-country tables from the enriched site frame (pandas engine)."""
+    bool_sum = df.groupby('Country')[bool_groups].sum()
+    num_sum = df.groupby('Country')[num_groups].sum()
+    # Total Staff = sum of all boolean‐flags plus ONLY “Other Staff”
+    total_staff = bool_sum.sum(axis=1) + num_sum["Other Staff"]
+
+    cap_df = df.groupby("Country")["CapabilityScore"].mean().reset_index(name="Avg Capability")
+    tr_df = df.groupby("Country")["HasPhaseI"].sum().reset_index(name="Phase I Sites")
+    infra_df = df.groupby("Country")["InfraIndex"].mean().reset_index(name="Avg InfraIndex")
+    er_df = df.groupby("Country")["HasIRB"].sum().reset_index(name="IRB Sites")
+    pol_df = site_policy.groupby("Country")["Exists"].mean().reset_index(name="% With Policy")
+
+    country_summary = site_policy.groupby('Country').agg(
+        pct_with_policy   = ('Exists','mean'),
+        pct_disseminated  = ('Disseminated','mean'),
+        pct_implemented   = ('Implemented','mean'),
+        avg_budget_alloc  = ('Budget','mean'),
+        avg_sop_coverage  = ('SOP_Coverage','mean'),
+        num_sites         = ('Exists','count')
+    ).reset_index()
+    country_summary['implementation_gap'] = country_summary['pct_with_policy'] - country_summary['pct_implemented']
+
+    grouped_full = group_stakeholders(site_clean, ["Country","Stakeholder"])
+    if not site_clean.empty:
+        stake_counts = (
+            site_clean
+            .groupby("Stakeholder")["Site"]
+            .nunique()
+            .reset_index(name="CountSites")
+            .sort_values("CountSites", ascending=False, kind="stable")
+        )
+    else:
+        stake_counts = pd.DataFrame(columns=["Stakeholder","CountSites"])
+
+    return {
+        "bool_sum": bool_sum,
+        "num_sum": num_sum,
+        "total_staff": total_staff,
+        "cap_df": cap_df,
+        "tr_df": tr_df,
+        "infra_df": infra_df,
+        "er_df": er_df,
+        "pol_df": pol_df,
+        "country_summary": country_summary,
+        "grouped_full": grouped_full,
+        "stake_counts": stake_counts,
+    }
+
+
+def hr_summary(bundle):
+    """Tab 3 table: "Yes" counts, staff counts and Total Staff by country."""
+    combined = pd.concat([bundle["bool_sum"], bundle["num_sum"]], axis=1)
+    combined["Total Staff"] = bundle["total_staff"].astype(int)
+    combined.index.name = "Country"
+    return combined
+
+
+def compute_metrics(df, progress=noop_progress, aggregate=aggregate_metrics):
+    """Derive every selection-independent table the tabs render.
+
+    Returns a dict ("metrics bundle") holding the enriched site frame and
+    the per-country tables. The input frame is not modified. ``aggregate``
+    picks the engine for the per-country tables (see ``sql_backend``).
+    """
+    name_col = df.attrs.get("name_col", df.columns[0])
+    duplicates = pd.DataFrame(df.attrs.get("duplicates", []),
+                              columns=["Country", "Name (EN)", "Name (FR)", "Score", "Action"])
+    df, site_policy, confidence = derive_site_metrics(df, progress)
+
+    # 18) Stakeholders
+    progress(88, "Extracting stakeholders")
+    site_clean = extract_stakeholders(df, name_col)
+
+    progress(90, "Aggregating by country")
+    bundle = aggregate(df, site_policy, site_clean)
+    bundle.update(df=df, name_col=name_col, site_policy=site_policy,
+                  numeric_confidence=confidence, duplicates=duplicates)
+    # Approximate engines replace the exploded rows with their sketches
+    bundle.setdefault("site_clean", site_clean)
+
+    # 19) Maps DataFrame
+    progress(95, "Preparing maps")
+    map_df = (
+        bundle["cap_df"]
+        .merge(bundle["tr_df"], on="Country")
+        .merge(bundle["infra_df"], on="Country")
+        .merge(bundle["er_df"], on="Country")
+        .merge(bundle["pol_df"], on="Country")
+        .merge(indicators.country_table(df), on="Country", how="left")
+    )
+    map_df["Country"] = map_df["Country"].str.strip()
+    cc = coco.CountryConverter()
+    map_df["ISO_A3"] = cc.convert(names=map_df["Country"], to="ISO3", not_found=None)
+
+    mask = map_df["ISO_A3"].isnull()
+    if mask.any():
+        map_df.loc[mask, "ISO_A3"] = map_df.loc[mask, "Country"].apply(fuzzy_iso)
+    missing_iso = list(map_df.loc[map_df["ISO_A3"].isnull(), "Country"].unique())
+
+    map_long = map_df.melt(id_vars=["Country","ISO_A3"], var_name="Metric", value_name="Value")
+    progress(100, "Done")
+
+    bundle.update(map_df=map_df, map_long=map_long, missing_iso=missing_iso)
+    return bundle
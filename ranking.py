@@ -0,0 +1,92 @@
+"""Composite site ranking with a top-k per country.
+
+``build_ranking`` lays out the ranking features of every site once per
+dataset (alongside the metrics bundle): one float matrix with each feature
+scaled to [0, 1] and the rows grouped by country. A score for any set of
+weights is then a single matrix-vector product, and the best sites of a
+country come from ``np.argpartition`` over that country's contiguous slice
+of scores, so only the k winners are ever sorted.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Ranking features and their slider labels
+features = {
+    "CapabilityScore": "Capability score",
+    "InfraIndex": "Infrastructure index",
+    "HasIRB": "In-house IRB",
+    "HasPhaseI": "Phase I experience",
+    "SOP_Coverage": "SOP coverage",
+    "Staff": "Staff (Other + PhD + MSc)",
+}
+staff_cols = ["Other Staff", "PhD", "MSc"]
+default_weights = dict.fromkeys(features, 1.0)
+
+
+def build_ranking(bundle):
+    """Scaled feature matrix of the bundle's sites, grouped by country."""
+    df = bundle["df"]
+    raw = pd.DataFrame(index=df.index)
+    for f in features:
+        if f == "Staff":
+            raw[f] = df.reindex(columns=staff_cols, fill_value=0).sum(axis=1)
+        else:
+            raw[f] = df[f] if f in df.columns else 0
+
+    # Staff counts are log-scaled so a few very large sites do not flatten the rest
+    scaled = raw.astype(float)
+    scaled["Staff"] = np.log1p(scaled["Staff"].clip(lower=0))
+    peak = scaled.max().replace(0, 1)
+    scaled = scaled / peak
+
+    codes, countries = pd.factorize(df["Country"], sort=True)
+    order = np.argsort(codes, kind="stable")
+    offsets = np.searchsorted(codes[order], np.arange(len(countries) + 1))
+
+    sites = pd.concat([df[[bundle["name_col"], "Country"]], raw], axis=1)
+    sites = sites.rename(columns={bundle["name_col"]: "SiteName"}).iloc[order].reset_index(drop=True)
+    return {
+        "matrix": np.ascontiguousarray(scaled.to_numpy()[order]),
+        "countries": list(countries),
+        "offsets": offsets,
+        "sites": sites,
+    }
+
+
+def scores(ranking, weights):
+    """0-100 score of every site: the weighted mean of its scaled features."""
+    w = np.array([float(weights.get(f, 0)) for f in features])
+    total = w.sum()
+    if total <= 0:
+        return np.zeros(len(ranking["matrix"]))
+    return ranking["matrix"] @ (w * (100 / total))
+
+
+def top_k(ranking, weights, k=10, countries=None):
+    """The ``k`` best-scoring sites of each country, ranked within country."""
+    s = scores(ranking, weights)
+    offsets = ranking["offsets"]
+    rows, ranks = [], []
+    for i, country in enumerate(ranking["countries"]):
+        if countries is not None and country not in countries:
+            continue
+        lo, hi = offsets[i], offsets[i + 1]
+        seg = s[lo:hi]
+        if k < len(seg):
+            # Everything above the k-th best score, then the earliest sites tied with it
+            kth = seg[np.argpartition(-seg, k - 1)[k - 1]]
+            above = np.flatnonzero(seg > kth)
+            idx = np.concatenate([above, np.flatnonzero(seg == kth)[:k - len(above)]])
+        else:
+            idx = np.arange(len(seg))
+        # Highest score first; ties keep the survey order
+        idx = idx[np.lexsort((idx, -seg[idx]))]
+        rows.append(lo + idx)
+        ranks.append(np.arange(1, len(idx) + 1))
+
+    rows = np.concatenate(rows) if rows else np.array([], dtype=int)
+    out = ranking["sites"].iloc[rows].reset_index(drop=True)
+    out.insert(0, "Rank", np.concatenate(ranks) if ranks else np.array([], dtype=int))
+    out.insert(3, "Score", np.round(s[rows], 1))
+    return out
@@ -0,0 +1,123 @@
+"""Download payloads, built on demand and cached per dataset.
+
+Nothing is serialized until someone asks for it; once built, a payload is
+kept (keyed by dataset and selection) and shared by every session. The
+full report zip is assembled in a worker thread.
+"""
+import io
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import plotly.offline
+
+import maps
+import pipeline
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+# Built payloads kept in memory (CSV/HTML bytes and report zips)
+MAX_PAYLOADS = 64
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report")
+_lock = threading.Lock()
+_payloads = OrderedDict()
+_reports = {}
+
+
+def peek(key):
+    """The cached payload for ``key``, or None if it has not been built."""
+    with _lock:
+        payload = _payloads.get(key)
+        if payload is not None:
+            _payloads.move_to_end(key)
+        return payload
+
+
+def payload(key, build):
+    """Return the cached payload for ``key``, building it with ``build()`` once."""
+    cached = peek(key)
+    if cached is not None:
+        return cached
+    data = build()
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with _lock:
+        _payloads[key] = data
+        while len(_payloads) > MAX_PAYLOADS:
+            _payloads.popitem(last=False)
+    return data
+
+
+def site_list(df, name_col):
+    return (
+        df[[name_col, "Country"]]
+        .drop_duplicates()
+        .rename(columns={name_col: "SiteName"})
+    )
+
+
+def report_tables(bundle):
+    """Every table of the dashboard, by file stem."""
+    return {
+        "site_list": site_list(bundle["df"], bundle["name_col"]),
+        "capability": bundle["cap_df"],
+        "human_resources": pipeline.hr_summary(bundle).reset_index(),
+        "phase_i": bundle["tr_df"],
+        "infrastructure": bundle["infra_df"],
+        "ethics_regulatory": bundle["er_df"],
+        "stakeholders": bundle["grouped_full"],
+        "top_stakeholders": bundle["stake_counts"],
+        "policy_summary": bundle["country_summary"],
+        "core_metrics": bundle["map_df"],
+        "duplicate_submissions": bundle["duplicates"],
+    }
+
+
+def build_report(bundle):
+    """Zip of every table (CSV, plus Parquet when pyarrow is installed) and map (HTML)."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for stem, table in report_tables(bundle).items():
+            zf.writestr(f"tables/{stem}.csv", table.to_csv(index=False))
+            if HAS_PARQUET:
+                pq = io.BytesIO()
+                table.astype({c: str for c in table.columns if table[c].dtype == object}).to_parquet(pq, index=False)
+                zf.writestr(f"parquet/{stem}.parquet", pq.getvalue())
+
+        # Maps reference one shared copy of plotly.js
+        zf.writestr("maps/plotly.min.js", plotly.offline.get_plotlyjs())
+        for metric in bundle["map_long"]["Metric"].unique():
+            fig = maps.choropleth(bundle["map_long"], metric)
+            zf.writestr(f"maps/{maps.map_file_name(metric)}",
+                        fig.to_html(include_plotlyjs="directory"))
+        zf.writestr(f"maps/{maps.map_file_name('All Metrics')}",
+                    maps.small_multiples(bundle["map_long"]).to_html(include_plotlyjs="directory"))
+    return buf.getvalue()
+
+
+def _build_report(key, bundle):
+    # The zip lives in the payload cache, not in the future's result
+    payload(key, lambda: build_report(bundle))
+
+
+def submit_report(dataset_key, bundle):
+    """Start (or join) the report build for this dataset in the worker thread."""
+    key = (dataset_key, "report")
+    with _lock:
+        future = _reports.get(dataset_key)
+        if future is None or (future.done() and key not in _payloads):
+            future = _executor.submit(_build_report, key, bundle)
+            _reports[dataset_key] = future
+    return future
+
+
+def report_future(dataset_key):
+    with _lock:
+        return _reports.get(dataset_key)
@@ -0,0 +1,87 @@
+"""Inverted token index over site names and stakeholder text.
+
+The index is built once per dataset (alongside the metrics bundle) and
+answers accent-insensitive prefix queries without scanning the frame.
+Tokens are kept sorted with their postings laid out contiguously, so all
+tokens sharing a prefix map to one slice of the postings array.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+
+# Columns shown for each matching site
+result_cols = ["Country", "CapabilityScore", "InfraIndex", "HasPhaseI", "HasIRB", "PolicyExists"]
+
+token_re = re.compile(r"\w+")
+
+
+def normalize_text(s: str) -> str:
+    return pipeline.strip_accents(s).lower()
+
+
+def tokenize(s: str) -> list[str]:
+    return token_re.findall(normalize_text(s))
+
+
+def build_index(bundle):
+    """Index ``name_col`` and the stakeholder columns of the bundle frame.
+
+    Extracted stakeholders are split out of those same columns, so their
+    tokens are covered without indexing ``site_clean`` separately.
+    """
+    df = bundle["df"]
+    name_col = bundle["name_col"]
+    text_cols = [name_col] + [c for c in pipeline.stakeholder_columns(df) if c != name_col]
+
+    text = df[text_cols[0]].astype(str)
+    for col in text_cols[1:]:
+        text = text + " " + df[col].astype(str)
+
+    # Normalize each distinct text once, then map back to rows
+    codes, uniques = pd.factorize(text.to_numpy())
+    tokens_by_text = [sorted(set(tokenize(u))) for u in uniques]
+    pairs = pd.DataFrame({
+        "token": [t for toks in tokens_by_text for t in toks],
+        "text": np.repeat(np.arange(len(uniques)), [len(toks) for toks in tokens_by_text]),
+    })
+    rows = pd.DataFrame({"row": np.arange(len(df)), "text": codes})
+    postings = pairs.merge(rows, on="text").sort_values(["token", "row"], kind="stable")
+
+    vocab, starts = np.unique(postings["token"].to_numpy(), return_index=True)
+    offsets = np.append(starts, len(postings))
+
+    sites = df[[name_col] + [c for c in result_cols if c in df.columns]].rename(columns={name_col: "SiteName"})
+    return {
+        "vocab": vocab,
+        "offsets": offsets,
+        "rows": postings["row"].to_numpy(),
+        "sites": sites.reset_index(drop=True),
+    }
+
+
+def prefix_rows(index, prefix):
+    """Row ids of every site with a token starting with ``prefix``."""
+    vocab = index["vocab"]
+    lo = np.searchsorted(vocab, prefix, side="left")
+    hi = np.searchsorted(vocab, prefix + "\uffff", side="left")
+    return np.unique(index["rows"][index["offsets"][lo]:index["offsets"][hi]])
+
+
+def search(index, query, limit=None):
+    """Sites matching every query term as a prefix (accent/case-insensitive)."""
+    terms = tokenize(query)
+    if not terms:
+        return index["sites"].iloc[0:0]
+    hits = None
+    for term in terms:
+        rows = prefix_rows(index, term)
+        hits = rows if hits is None else np.intersect1d(hits, rows, assume_unique=True)
+        if not len(hits):
+            break
+    if limit is not None:
+        hits = hits[:limit]
+    return index["sites"].iloc[hits]
@@ -0,0 +1,292 @@
+"""Approximate aggregation with mergeable sketches.
+
+For very large stakeholder sets (many merged rounds), the exact
+``nunique`` / ``"; ".join(sorted(set(s)))`` per (Country, Stakeholder)
+group dominates time and memory. In approximate mode:
+
+* distinct sites (naming any stakeholder) per country come from a
+  HyperLogLog,
+* sites per stakeholder come from a count-min sketch that every distinct
+  (stakeholder, site) pair adds one to, with a bounded heavy-hitter
+  candidate set for the top stakeholders; pairs are deduplicated by hash,
+  with no per-stakeholder group-by,
+* the InfraIndex distribution per country comes from a relative-error
+  quantile sketch (DDSketch-style log buckets).
+
+Every sketch has ``merge``, so per-country sketches combine into overall
+figures and sketches from different rounds combine the same way. Site
+lists are not kept in this mode, nor are the exploded stakeholder rows
+(``site_clean`` is left empty in the bundle once the sketches are built).
+
+The mode is used when the exploded stakeholder rows exceed
+``DASHBOARD_APPROX_ROWS`` (default 1,000,000), or always with
+``DASHBOARD_APPROX=1``.
+"""
+import copy
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+
+FORCE = os.environ.get("DASHBOARD_APPROX", "") == "1"
+APPROX_ROWS = int(os.environ.get("DASHBOARD_APPROX_ROWS", 1_000_000))
+
+# Heavy-hitter candidates kept per sketch (per country, and when merged)
+TOP_CAPACITY = 200
+
+_mix = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_values(*cols):
+    """64-bit hash per row of one or more aligned columns."""
+    frame = pd.DataFrame({i: pd.Series(c).astype(str).to_numpy() for i, c in enumerate(cols)})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """Distinct-count sketch; relative error about 1.04 / sqrt(2**p)."""
+
+    def __init__(self, p=12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes):
+        h = np.asarray(hashes, dtype=np.uint64)
+        if not len(h):
+            return self
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        w = h << np.uint64(self.p)
+        # Rank = leading zeros of the remaining bits + 1, by binary search
+        rank = np.ones(len(h), dtype=np.uint8)
+        for bits in (32, 16, 8, 4, 2, 1):
+            empty = (w >> np.uint64(64 - bits)) == 0
+            rank[empty] += bits
+            w[empty] <<= np.uint64(bits)
+        np.minimum(rank, 64 - self.p + 1, out=rank)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+
+class CountMin:
+    """Count-min sketch over 64-bit hashes; never underestimates."""
+
+    def __init__(self, width=2048, depth=4):
+        self.log_width = int(math.log2(width))
+        self.table = np.zeros((depth, 1 << self.log_width), dtype=np.int64)
+        self.seeds = np.array([0x51ED27, 0xA5A5A5, 0x3C3C3C, 0x777777, 0x1B873593, 0xCC9E2D51][:depth],
+                              dtype=np.uint64)
+
+    def _cells(self, h, row):
+        return (((h ^ self.seeds[row]) * _mix) >> np.uint64(64 - self.log_width)).astype(np.int64)
+
+    def add(self, hashes, counts):
+        h = np.asarray(hashes, dtype=np.uint64)
+        for row in range(len(self.table)):
+            np.add.at(self.table[row], self._cells(h, row), counts)
+        return self
+
+    def estimate(self, hashes):
+        h = np.asarray(hashes, dtype=np.uint64)
+        return np.min([self.table[row][self._cells(h, row)] for row in range(len(self.table))], axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+        return self
+
+
+class TopK:
+    """Heavy hitters: a count-min sketch plus a bounded set of labelled candidates."""
+
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self.cms = CountMin()
+        self.labels = {}
+
+    def add(self, hashes, labels):
+        """Count one for each item of ``hashes``; ``labels`` are aligned with it."""
+        h = np.asarray(hashes, dtype=np.uint64)
+        if not len(h):
+            return self
+        self.cms.add(h, 1)
+        # Candidates: the distinct keys with the largest estimates, labelled
+        # from their first occurrence
+        codes, keys = pd.factorize(h)
+        first = np.empty(len(keys), dtype=np.int64)
+        first[codes[::-1]] = np.arange(len(h))[::-1]
+        order = np.argsort(-self.cms.estimate(keys), kind="stable")[:self.capacity]
+        for i in order:
+            self.labels.setdefault(int(keys[i]), labels[first[i]])
+        self._prune()
+        return self
+
+    def merge(self, other):
+        self.cms.merge(other.cms)
+        for h, label in other.labels.items():
+            self.labels.setdefault(h, label)
+        self._prune()
+        return self
+
+    def _prune(self):
+        if len(self.labels) <= self.capacity:
+            return
+        keys = np.fromiter(self.labels, dtype=np.uint64, count=len(self.labels))
+        keep = keys[np.argsort(-self.cms.estimate(keys), kind="stable")[:self.capacity]]
+        self.labels = {int(h): self.labels[int(h)] for h in keep}
+
+    def top(self, k=None):
+        """(Stakeholder, CountSites) of the candidates, largest first."""
+        if not self.labels:
+            return pd.DataFrame(columns=["Stakeholder", "CountSites"])
+        keys = np.fromiter(self.labels, dtype=np.uint64, count=len(self.labels))
+        out = pd.DataFrame({
+            "Stakeholder": [self.labels[int(h)] for h in keys],
+            "CountSites": self.cms.estimate(keys),
+        }).sort_values(["CountSites", "Stakeholder"], ascending=[False, True])
+        return out.head(k) if k else out
+
+
+class QuantileSketch:
+    """Relative-error quantiles (log-spaced buckets); values must be >= 0."""
+
+    def __init__(self, alpha=0.01):
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.zero_count = 0
+        self.buckets = pd.Series(dtype=np.int64)
+
+    def add(self, values):
+        v = np.asarray(values, dtype=float)
+        v = v[~np.isnan(v)]
+        self.zero_count += int((v <= 0).sum())
+        keys, counts = np.unique(np.ceil(np.log(v[v > 0]) / math.log(self.gamma)).astype(np.int64),
+                                 return_counts=True)
+        self.buckets = self.buckets.add(pd.Series(counts, index=keys), fill_value=0).astype(np.int64)
+        return self
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        self.buckets = self.buckets.add(other.buckets, fill_value=0).astype(np.int64)
+        return self
+
+    def count(self):
+        return self.zero_count + int(self.buckets.sum())
+
+    def quantile(self, q):
+        n = self.count()
+        if not n:
+            return np.nan
+        rank = q * (n - 1)
+        if rank < self.zero_count:
+            return 0.0
+        b = self.buckets.sort_index()
+        key = b.index[np.searchsorted(b.cumsum().to_numpy() + self.zero_count, rank, side="right")]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+
+def build_stakeholder_sketches(site_clean):
+    """Per-country TopK over distinct (stakeholder, site) pairs and site HLLs."""
+    rows = site_clean.dropna(subset=["Stakeholder"])
+    country_codes, countries = pd.factorize(rows["Country"])
+    stake = rows["Stakeholder"].to_numpy()
+    stake_h = hash_values(stake)
+    site_h = hash_values(rows["Site"])
+    # First mention of each (country, stakeholder, site): a hash-table pass
+    # over the pair hashes, so a site naming a stakeholder twice counts once
+    pair_h = stake_h ^ (site_h * _mix)
+    first = ~pd.DataFrame({"country": country_codes, "pair": pair_h}).duplicated().to_numpy()
+
+    tops, sites = {}, {}
+    for code, country in enumerate(countries):
+        mask = country_codes == code
+        pairs = mask & first
+        tops[country] = TopK().add(stake_h[pairs], stake[pairs])
+        sites[country] = HyperLogLog().add(site_h[mask])
+    return tops, sites
+
+
+def build_infra_sketches(df):
+    return {
+        country: QuantileSketch().add(group.to_numpy())
+        for country, group in df.groupby("Country")["InfraIndex"]
+    }
+
+
+def merged(sketches, empty=TopK):
+    """Merge sketches of one kind into a new sketch (inputs are untouched)."""
+    it = iter(sketches)
+    first = next(it, None)
+    if first is None:
+        return empty()
+    out = copy.deepcopy(first)
+    for s in it:
+        out.merge(s)
+    return out
+
+
+def site_counts(sites):
+    """Estimated sites naming stakeholders, per country and in total."""
+    countries = sorted(sites)
+    per_country = pd.DataFrame({
+        "Country": countries,
+        "Sites": [int(round(sites[c].count())) for c in countries],
+    })
+    return per_country, int(round(merged(sites.values(), HyperLogLog).count()))
+
+
+def stakeholder_table(tops, countries, by):
+    """Approximate counterpart of ``pipeline.group_stakeholders``.
+
+    ``by`` is ``["Country","Stakeholder"]`` for per-country rows or
+    ``["Stakeholder"]`` to merge the given countries.
+    """
+    countries = [c for c in countries if c in tops]
+    if by == ["Stakeholder"]:
+        out = merged(tops[c] for c in countries).top()
+    else:
+        parts = [tops[c].top().assign(Country=c) for c in sorted(countries)]
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["Country", "Stakeholder", "CountSites"])
+    out["SitesList"] = ""
+    return out[by + ["SitesList", "CountSites"]].reset_index(drop=True)
+
+
+def approximate(aggregate, force=FORCE):
+    """Wrap an ``aggregate`` engine so stakeholder tables come from sketches.
+
+    Below the row threshold (and without ``force``) the wrapped engine runs
+    unchanged.
+    """
+    def approx_aggregate(df, site_policy, site_clean):
+        if not (force or len(site_clean) > APPROX_ROWS):
+            return aggregate(df, site_policy, site_clean)
+        tables = aggregate(df, site_policy, site_clean.iloc[0:0])
+        tops, sites = build_stakeholder_sketches(site_clean)
+        stake_sites, stake_sites_total = site_counts(sites)
+        tables.update(
+            approx=True,
+            stake_sketches=tops,
+            site_sketches=sites,
+            stake_sites=stake_sites,
+            stake_sites_total=stake_sites_total,
+            stake_mentions=len(site_clean),
+            # The sketches stand in for the exploded rows from here on
+            site_clean=site_clean.iloc[0:0],
+            infra_sketches=build_infra_sketches(df),
+            grouped_full=stakeholder_table(tops, list(tops), ["Country", "Stakeholder"]),
+            stake_counts=merged(tops.values()).top()[["Stakeholder", "CountSites"]],
+        )
+        return tables
+    return approx_aggregate
@@ -0,0 +1,180 @@
+"""Optional SQLite engine for the per-country tables.
+
+With ``DASHBOARD_BACKEND=sqlite`` the enriched site frame and the exploded
+stakeholder rows are written once per dataset to a file-backed SQLite
+database (indexed on Country and the derived flags), and every tab table
+is computed as a SQL query against it. The file is keyed by dataset hash,
+so all sessions and worker processes on the host share one copy on disk.
+It also records a fingerprint of the rows it was built from; when the
+derived frame changes for the same upload (edited ``metrics.toml``, another
+``DASHBOARD_DEDUP`` policy, a parser or schema change) it is rebuilt.
+Approximate mode (see ``sketches``) stores no stakeholder rows, so its
+database is kept in a separate file and never served to an exact run.
+"""
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+import pipeline
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas")
+SQL_DIR = os.path.join(APP_DIR, os.environ.get("DASHBOARD_SQL_DIR", "sqlcache"))
+# Bump when the tables or their indexes change shape
+SCHEMA_VERSION = 2
+
+# Site-level columns stored in the ``sites`` table
+site_cols = (
+    ["Country", "CapabilityScore", "HasPhaseI", "InfraIndex", "HasIRB",
+     "PolicyExists", "PolicyDisseminated", "PolicyImplemented", "Budget_pct", "SOP_Coverage"]
+    + list(pipeline.bool_groups) + list(pipeline.num_groups)
+)
+indexed_cols = ["Country", "HasPhaseI", "HasIRB", "PolicyExists"]
+
+
+def enabled():
+    return BACKEND == "sqlite"
+
+
+def q(name):
+    """Quote an identifier (column names contain spaces and dots)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def db_path(key, stakeholders=True):
+    """Database file of a dataset, with or without its stakeholder rows."""
+    return os.path.join(SQL_DIR, f"{key}.sqlite" if stakeholders else f"{key}-sites.sqlite")
+
+
+def fingerprint(sites, stakes):
+    """Hash of the schema version and every row the database is built from."""
+    h = hashlib.sha256(str(SCHEMA_VERSION).encode())
+    for frame in (sites, stakes):
+        h.update("\x1f".join(frame.columns).encode())
+        h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def stored_fingerprint(path):
+    """Fingerprint recorded in an existing database, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def materialize(path, df, site_clean):
+    """Write the site and stakeholder tables unless ``path`` already holds them.
+
+    An existing file built from other rows (or an older schema) is rebuilt.
+    The database is built under a temporary name and renamed into place,
+    so a concurrent reader never sees a half-written file.
+    """
+    sites = df[site_cols].copy()
+    for col in ["HasPhaseI", "HasIRB"]:
+        sites[col] = sites[col].astype(int)
+    stakes = site_clean[["Country", "Site", "Stakeholder"]].dropna()
+    fp = fingerprint(sites, stakes)
+    if stored_fingerprint(path) == fp:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    with closing(sqlite3.connect(tmp)) as conn, conn:
+        sites.to_sql("sites", conn, index=False)
+        stakes.to_sql("stakeholders", conn, index=False)
+        for col in indexed_cols:
+            conn.execute(f"CREATE INDEX {q('idx_sites_' + col)} ON sites({q(col)})")
+        conn.execute("CREATE INDEX idx_stake ON stakeholders(Country, Stakeholder, Site)")
+        conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO meta VALUES ('fingerprint', ?)", (fp,))
+    os.replace(tmp, path)
+
+
+def query_tables(path):
+    """The tab tables as SQL queries, shaped like ``pipeline.aggregate_metrics``."""
+    bool_names, num_names = list(pipeline.bool_groups), list(pipeline.num_groups)
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        def read(sql):
+            return pd.read_sql_query(sql, conn)
+
+        hr = read(
+            "SELECT Country, "
+            + ", ".join(f"SUM({q(c)}) AS {q(c)}" for c in bool_names + num_names)
+            + " FROM sites GROUP BY Country ORDER BY Country"
+        ).set_index("Country")
+        bool_sum, num_sum = hr[bool_names], hr[num_names]
+
+        core = read(
+            "SELECT Country, "
+            "AVG(CapabilityScore) AS \"Avg Capability\", "
+            "SUM(HasPhaseI) AS \"Phase I Sites\", "
+            "AVG(InfraIndex) AS \"Avg InfraIndex\", "
+            "SUM(HasIRB) AS \"IRB Sites\", "
+            "AVG(PolicyExists) AS \"% With Policy\" "
+            "FROM sites GROUP BY Country ORDER BY Country"
+        )
+        country_summary = read(
+            "SELECT Country, "
+            "AVG(PolicyExists) AS pct_with_policy, "
+            "AVG(PolicyDisseminated & PolicyExists) AS pct_disseminated, "
+            "AVG(PolicyImplemented & PolicyExists) AS pct_implemented, "
+            "AVG(Budget_pct) AS avg_budget_alloc, "
+            "AVG(SOP_Coverage) AS avg_sop_coverage, "
+            "COUNT(*) AS num_sites "
+            "FROM sites GROUP BY Country ORDER BY Country"
+        )
+        # group_concat order is unspecified (ORDER BY inside it needs SQLite
+        # 3.44), so the sites are joined with a unit separator and each list
+        # is sorted below
+        grouped_full = read(
+            "SELECT Country, Stakeholder, group_concat(Site, char(31)) AS SitesList, "
+            "COUNT(*) AS CountSites FROM ("
+            "  SELECT DISTINCT Country, Stakeholder, Site FROM stakeholders"
+            ") GROUP BY Country, Stakeholder "
+            "ORDER BY Country, CountSites DESC, Stakeholder"
+        )
+        stake_counts = read(
+            "SELECT Stakeholder, COUNT(DISTINCT Site) AS CountSites "
+            "FROM stakeholders GROUP BY Stakeholder "
+            "ORDER BY CountSites DESC, Stakeholder"
+        )
+
+    grouped_full["SitesList"] = [
+        "; ".join(sorted(sites.split(chr(31)))) for sites in grouped_full["SitesList"]
+    ]
+    country_summary["implementation_gap"] = (
+        country_summary["pct_with_policy"] - country_summary["pct_implemented"]
+    )
+    return {
+        "bool_sum": bool_sum,
+        "num_sum": num_sum,
+        "total_staff": bool_sum.sum(axis=1) + num_sum["Other Staff"],
+        "cap_df": core[["Country", "Avg Capability"]],
+        "tr_df": core[["Country", "Phase I Sites"]],
+        "infra_df": core[["Country", "Avg InfraIndex"]],
+        "er_df": core[["Country", "IRB Sites"]],
+        "pol_df": core[["Country", "% With Policy"]],
+        "country_summary": country_summary,
+        "grouped_full": grouped_full,
+        "stake_counts": stake_counts,
+    }
+
+
+def aggregator(key):
+    """An ``aggregate`` callable for ``pipeline.compute_metrics``."""
+    def aggregate(df, site_policy, site_clean):
+        # Approximate mode passes no stakeholder rows (see sketches.approximate)
+        path = db_path(key, stakeholders=not site_clean.empty)
+        materialize(path, df, site_clean)
+        return query_tables(path)
+    return aggregate
@@ -0,0 +1,307 @@
+"""Static export of the dashboard for offline use.
+
+Renders a self-contained HTML site from a dataset: ``index.html`` covers
+all countries and ``countries/<name>.html`` one country each, with
+sections 1-10 of the dashboard (tables and figures). Every page loads the
+single shared ``plotly.min.js`` next to it, so the folder can be zipped or
+copied to a machine without network access.
+
+Pages are rendered in parallel in a process pool. ``manifest.json``
+records a hash of each page's input tables and of the renderer; a page
+whose hash is unchanged since the last build into the same folder is
+skipped, and pages of countries no longer in the data are removed.
+
+Usage:
+    python static_site.py --en english.csv --fr french.csv --out site
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+import plotly.offline
+
+import figures
+import maps
+import pipeline
+import sketches
+
+css = """
+body { font-family: sans-serif; margin: 0 auto; max-width: 1200px; padding: 0 20px; color: #222; }
+nav { position: sticky; top: 0; background: #fff; padding: 10px 0; border-bottom: 2px solid #1A5632; }
+nav a { margin-right: 12px; color: #1A5632; text-decoration: none; }
+h1 { color: #1A5632; }
+h2 { color: #1A5632; border-bottom: 1px solid #ddd; padding-top: 20px; }
+table { border-collapse: collapse; margin: 10px 0; font-size: 14px; }
+th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: left; }
+th { background: #D0E8D8; }
+.metric { display: inline-block; margin-right: 30px; }
+.metric b { display: block; font-size: 24px; color: #1A5632; }
+"""
+
+sections = [
+    ("identification", "1. Identification of Research Sites"),
+    ("capacity", "2. Capacity Evaluation"),
+    ("hr", "3. Human Resource Assessment"),
+    ("translational", "4. Translational Research (Phase I)"),
+    ("infrastructure", "5. Infrastructure Analysis"),
+    ("ethics", "6. Ethics & Regulatory"),
+    ("stakeholders", "7. Stakeholder Mapping"),
+    ("policy", "8. Policy & Legislation"),
+    ("deep_dive", "9. Deep-Dive"),
+    ("maps", "10. Spatial Overview of Core Metrics"),
+]
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", pipeline.strip_accents(name).lower()).strip("-")
+
+
+def page_inputs(bundle, countries):
+    """The tables one page is rendered from, restricted to ``countries``."""
+    df = bundle["df"]
+    df = df[df["Country"].isin(countries)]
+
+    def rows(table):
+        return table[table["Country"].isin(countries)].reset_index(drop=True)
+
+    hr = pipeline.hr_summary(bundle)
+    stakeholders = rows(bundle["grouped_full"])
+    if len(countries) == 1:
+        top = stakeholders.sort_values("CountSites", ascending=False, kind="stable")[["Stakeholder", "CountSites"]]
+    else:
+        top = bundle["stake_counts"]
+
+    return {
+        "site_counts": figures.site_counts(df),
+        "identification": figures.identification(df).reset_index(),
+        "capacity": rows(bundle["cap_df"]),
+        "hr": hr[hr.index.isin(countries)].reset_index(),
+        "hr_flags": bundle["bool_sum"][bundle["bool_sum"].index.isin(countries)].reset_index(),
+        "translational": rows(bundle["tr_df"]),
+        "infrastructure": rows(bundle["infra_df"]),
+        "site_values": df[["Country", "InfraIndex", "HasIRB"]].reset_index(drop=True),
+        "ethics": rows(bundle["er_df"]),
+        "stakeholders": stakeholders,
+        "top_stakeholders": top.head(5).reset_index(drop=True),
+        "policy": rows(bundle["country_summary"]),
+        "sites": df[[bundle["name_col"], "Country", "CapabilityScore", "HasPhaseI", "InfraIndex", "HasIRB"]]
+                 .rename(columns={bundle["name_col"]: "SiteName"}).reset_index(drop=True),
+        "map_long": rows(bundle["map_long"]),
+    }
+
+
+def renderer_version():
+    h = hashlib.sha1(plotly.__version__.encode())
+    # The page layout here, the tab figures shared with the app and the maps
+    for module in (__file__, figures.__file__, maps.__file__):
+        with open(os.path.abspath(module), "rb") as f:
+            h.update(f.read())
+    # The geometry decides between offline maps and the CDN fallback
+    try:
+        with open(maps.GEOMETRY_PATH, "rb") as f:
+            h.update(f.read())
+    except FileNotFoundError:
+        h.update(b"no geometry")
+    return h.hexdigest()
+
+
+def inputs_hash(inputs, extra=""):
+    h = hashlib.sha1(extra.encode())
+    for name in sorted(inputs):
+        h.update(name.encode())
+        h.update(inputs[name].to_csv(index=False).encode())
+    return h.hexdigest()
+
+
+def _table(df):
+    return df.to_html(index=False, border=0, na_rep="")
+
+
+def _figure(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def _metrics(pairs):
+    return "".join(f'<div class="metric">{html.escape(k)}<b>{html.escape(str(v))}</b></div>' for k, v in pairs)
+
+
+def render_section(key, t, page):
+    if key == "identification":
+        summary = t["identification"].set_index("Country")
+        melt = figures.identification_long(summary)
+        return [
+            "<h3>Number of Sites by Country</h3>", _table(t["site_counts"]),
+            "<h3>Category Counts by Country</h3>", _table(t["identification"]),
+            _figure(figures.identification_bar(melt)), _figure(figures.identification_sunburst(melt)),
+        ]
+    if key == "capacity":
+        melt = figures.identification_long(t["identification"].set_index("Country"))
+        return [_table(t["capacity"]), _figure(figures.capacity_bar(t["capacity"])),
+                _figure(figures.category_heatmap(melt))]
+    if key == "hr":
+        staff = t["hr"].set_index("Country")[list(pipeline.num_groups) + ["Total Staff"]]
+        return [_table(t["hr"]), _figure(figures.hr_flags_bar(t["hr_flags"].set_index("Country"))),
+                _figure(figures.staff_bar(staff))]
+    if key == "translational":
+        return [_table(t["translational"]), _figure(figures.phase1_bar(t["translational"])),
+                _figure(figures.phase1_scatter(t["capacity"], t["translational"]))]
+    if key == "infrastructure":
+        return [_table(t["infrastructure"]), _figure(figures.infra_bar(t["infrastructure"])),
+                _figure(figures.infra_distribution(t["site_values"], page["infra_sketches"]))]
+    if key == "ethics":
+        return [_table(t["ethics"]), _figure(figures.irb_bar(t["ethics"])),
+                _figure(figures.irb_pie(t["site_values"]))]
+    if key == "stakeholders":
+        return [
+            "<h3>Stakeholders by Country</h3>", _table(t["stakeholders"]),
+            "<h3>Top 5 Stakeholders</h3>", _table(t["top_stakeholders"]),
+            _figure(figures.top_stakeholders_bar(t["top_stakeholders"])),
+        ]
+    if key == "policy":
+        melt = figures.policy_long(t["policy"])
+        return [_table(figures.policy_table(t["policy"])), _figure(figures.policy_bar(melt)),
+                _figure(figures.policy_pie(melt)), _figure(figures.policy_radar(t["policy"]))]
+    if key == "deep_dive":
+        sites = t["sites"]
+        if page["countries_links"]:
+            links = "".join(f'<li><a href="{href}">{html.escape(name)}</a></li>' for name, href in page["countries_links"])
+            return [f"<p>One page per country:</p><ul>{links}</ul>"]
+        return [
+            _metrics([
+                ("Sites", len(sites)),
+                ("Avg Capability", round(sites["CapabilityScore"].mean(), 2) if len(sites) else 0),
+                ("Phase I Sites", int(sites["HasPhaseI"].sum())),
+                ("In-house IRB Sites", int(sites["HasIRB"].sum())),
+            ]),
+            "<h3>Sites</h3>", _table(sites),
+        ]
+    if key == "maps":
+        if t["map_long"].empty:
+            return ["<p>No mappable countries.</p>"]
+        note = maps.fallback_warning()
+        return ([f"<p><em>{html.escape(note)}</em></p>"] if note else []) + [_figure(maps.small_multiples(t["map_long"]))]
+    raise ValueError(key)
+
+
+def render_page(page):
+    """Full HTML of one page (runs in a worker process)."""
+    t = page["inputs"]
+    nav = "".join(f'<a href="#{key}">{html.escape(title)}</a>' for key, title in sections)
+    home = "" if page["depth"] == 0 else '<a href="../index.html">All countries</a>'
+    body = []
+    for key, title in sections:
+        body.append(f'<h2 id="{key}">{html.escape(title)}</h2>')
+        body.extend(render_section(key, t, page))
+    prefix = "../" * page["depth"]
+    return (
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(page['title'])}</title>"
+        f'<script src="{prefix}plotly.min.js"></script><style>{css}</style></head><body>'
+        f"<nav>{home} {nav}</nav><h1>{html.escape(page['title'])}</h1>"
+        + "\n".join(body)
+        + f"<p><small>Generated {html.escape(page['generated'])}</small></p></body></html>"
+    )
+
+
+def infra_sketches(bundle, countries):
+    """Approximate mode's InfraIndex sketches of ``countries``, else None."""
+    if not bundle.get("approx"):
+        return None
+    return {c: sk for c, sk in bundle["infra_sketches"].items() if c in countries}
+
+
+def build_pages(bundle):
+    """Page specs (path, title, inputs) for the overview and every country.
+
+    The quantile sketches of approximate mode are derived from the pages'
+    site values, so they are passed alongside the hashed inputs.
+    """
+    countries = sorted(bundle["df"]["Country"].dropna().unique())
+    generated = time.strftime("%Y-%m-%d %H:%M")
+    links = [(c, f"countries/{slug(c)}.html") for c in countries]
+    pages = [{
+        "path": "index.html", "depth": 0, "title": "Africa Research Sites Mapping Dashboard",
+        "inputs": page_inputs(bundle, countries), "countries_links": links, "generated": generated,
+        "infra_sketches": infra_sketches(bundle, countries),
+    }]
+    for country, path in links:
+        pages.append({
+            "path": path, "depth": 1, "title": f"Research Sites: {country}",
+            "inputs": page_inputs(bundle, [country]), "countries_links": [], "generated": generated,
+            "infra_sketches": infra_sketches(bundle, [country]),
+        })
+    return pages
+
+
+def build_site(bundle, out, workers=None, force=False):
+    """Render the site into ``out``; returns (rendered paths, skipped paths)."""
+    manifest_path = os.path.join(out, "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    version = renderer_version()
+    old_pages = manifest.get("pages", {}) if manifest.get("renderer") == version and not force else {}
+
+    os.makedirs(os.path.join(out, "countries"), exist_ok=True)
+    js_path = os.path.join(out, "plotly.min.js")
+    if manifest.get("plotly") != plotly.__version__ or not os.path.exists(js_path):
+        with open(js_path, "w", encoding="utf-8") as f:
+            f.write(plotly.offline.get_plotlyjs())
+
+    pages = build_pages(bundle)
+    hashes = {p["path"]: inputs_hash(p["inputs"], p["title"] + repr(p["countries_links"])
+                                     + repr(p["infra_sketches"] is not None)) for p in pages}
+    todo = [p for p in pages
+            if old_pages.get(p["path"]) != hashes[p["path"]] or not os.path.exists(os.path.join(out, p["path"]))]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for page, text in zip(todo, pool.map(render_page, todo)):
+            with open(os.path.join(out, page["path"]), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    # Pages of countries that are no longer in the data
+    for path in set(manifest.get("pages", {})) - set(hashes):
+        try:
+            os.remove(os.path.join(out, path))
+        except OSError:
+            pass
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"renderer": version, "plotly": plotly.__version__, "pages": hashes}, f, indent=2)
+    rendered = [p["path"] for p in todo]
+    return rendered, [p for p in hashes if p not in rendered]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--en", help="English CSV")
+    parser.add_argument("--fr", help="French CSV")
+    parser.add_argument("--out", default="site", help="output folder")
+    parser.add_argument("--workers", type=int, help="render processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="re-render every page")
+    args = parser.parse_args()
+    if not (args.en or args.fr):
+        parser.error("give at least one of --en / --fr")
+
+    t0 = time.perf_counter()
+    en_bytes = open(args.en, "rb").read() if args.en else None
+    fr_bytes = open(args.fr, "rb").read() if args.fr else None
+    df = pipeline.load_dataset(en_bytes, fr_bytes)
+    bundle = pipeline.compute_metrics(df, aggregate=sketches.approximate(pipeline.aggregate_metrics))
+    t1 = time.perf_counter()
+
+    rendered, skipped = build_site(bundle, args.out, args.workers, args.force)
+    print(f"{len(rendered)} pages rendered, {len(skipped)} unchanged, in {time.perf_counter() - t1:.1f}s "
+          f"(data {t1 - t0:.1f}s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
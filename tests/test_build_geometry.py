@@ -0,0 +1,60 @@
+import numpy as np
+
+import build_geometry
+
+
+def square(x0, y0, size=1.0, n=40):
+    """Closed square ring with ``n`` points per side."""
+    t = np.linspace(0, size, n, endpoint=False)
+    sides = [
+        np.c_[x0 + t, np.full(n, y0)],
+        np.c_[np.full(n, x0 + size), y0 + t],
+        np.c_[x0 + size - t, np.full(n, y0 + size)],
+        np.c_[np.full(n, x0), y0 + size - t],
+    ]
+    ring = np.vstack(sides)
+    return np.vstack([ring, ring[:1]])
+
+
+def feature(props, geometry):
+    return {"type": "Feature", "properties": props, "geometry": geometry}
+
+
+def test_simplify_keeps_corners_and_endpoints():
+    ring = square(0, 0)
+    out = build_geometry.simplify(ring, tolerance=0.01)
+    assert len(out) == 5
+    assert (out[0] == ring[0]).all() and (out[-1] == ring[-1]).all()
+    assert {tuple(p) for p in out} == {(0, 0), (1, 0), (1, 1), (0, 1)}
+
+
+def test_simplify_keeps_detail_above_tolerance():
+    ring = square(0, 0)
+    ring[20] = [0.5, -0.3]  # a spike on the bottom edge
+    assert [0.5, -0.3] in build_geometry.simplify(ring, 0.1).tolist()
+    assert [0.5, -0.3] not in build_geometry.simplify(ring, 0.5).tolist()
+
+
+def test_simplify_polygon_rounds_and_drops_degenerate_rings():
+    tiny = square(5, 5, size=0.0001)
+    out = build_geometry.simplify_polygon([square(0, 0), tiny], tolerance=0.01, digits=2)
+    assert len(out) == 1
+    assert all(round(x, 2) == x for p in out[0] for x in p)
+
+
+def test_build_keeps_target_countries_as_multipolygons():
+    source = {"type": "FeatureCollection", "features": [
+        feature({"ISO_A3": "GHA"}, {"type": "Polygon", "coordinates": [square(0, 0).tolist()]}),
+        # Natural Earth marks some codes -99; ADM0_A3 is used instead
+        feature({"ISO_A3": "-99", "ADM0_A3": "TGO"},
+                {"type": "MultiPolygon", "coordinates": [[square(2, 0).tolist()], [square(4, 0).tolist()]]}),
+        feature({"ISO_A3": "FRA"}, {"type": "Polygon", "coordinates": [square(9, 9).tolist()]}),
+    ]}
+    out, missing = build_geometry.build(source, tolerance=0.01, digits=3)
+    by_code = {f["properties"]["ISO_A3"]: f for f in out["features"]}
+    assert set(by_code) == {"GHA", "TGO"}
+    assert by_code["GHA"]["properties"]["Country"] == "Ghana"
+    assert all(f["geometry"]["type"] == "MultiPolygon" for f in out["features"])
+    assert len(by_code["TGO"]["geometry"]["coordinates"]) == 2
+    assert len(by_code["GHA"]["geometry"]["coordinates"][0][0]) == 5
+    assert "GHA" not in missing and "TGO" not in missing and "NGA" in missing
@@ -0,0 +1,81 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from streamlit.runtime.scriptrunner_utils.exceptions import RerunException
+
+import cancellation
+
+
+class SessionState(dict):
+    """Session state whose reads raise like Streamlit's once a newer run is pending."""
+
+    def __init__(self):
+        super().__init__()
+        self.pending_after = None  # reads left before the newer run shows up
+
+    def get(self, key, default=None):
+        if self.pending_after is not None:
+            if self.pending_after == 0:
+                self.pending_after = None
+                raise RerunException(None)
+            self.pending_after -= 1
+        return super().get(key, default)
+
+
+@pytest.fixture
+def state(monkeypatch):
+    state = SessionState()
+    monkeypatch.setattr(cancellation, "st", SimpleNamespace(session_state=state))
+    monkeypatch.setattr(cancellation, "_counts", Counter())
+    monkeypatch.setattr(cancellation, "_cancelled_at", Counter())
+    return state
+
+
+def run(state, selection, computed, pending_after=None):
+    """One script run: debounce the selection, then 'compute' it behind a checkpoint."""
+    state.pending_after = pending_after
+    cancellation.count("runs")
+    try:
+        cancellation.debounce("countries", selection, seconds=0.05)
+        cancellation.checkpoint("Tab 1")
+        computed.append(selection)
+        cancellation.count("completed")
+    except RerunException:
+        pass
+
+
+def test_checkpoint_passes_without_a_pending_run(state):
+    cancellation.checkpoint("Tab 1")
+    assert cancellation.snapshot() == ({}, {})
+
+
+def test_checkpoint_cancels_and_counts_per_stage(state):
+    for stage in ["Tab 1", "Tab 1", "Tab 2"]:
+        state.pending_after = 0
+        with pytest.raises(RerunException):
+            cancellation.checkpoint(stage)
+    counts, at = cancellation.snapshot()
+    assert counts == {"cancelled": 3}
+    assert at == {"Tab 1": 2, "Tab 2": 1}
+
+
+def test_only_the_final_selection_of_a_burst_is_computed(state):
+    computed = []
+    run(state, ("Ghana",), computed)
+    # Two quick clicks: each run is superseded while it waits in debounce
+    run(state, ("Ghana", "Togo"), computed, pending_after=0)
+    run(state, ("Togo",), computed, pending_after=0)
+    run(state, ("Togo", "Benin"), computed)
+    assert computed == [("Ghana",), ("Togo", "Benin")]
+    counts, at = cancellation.snapshot()
+    assert counts == {"runs": 4, "completed": 2, "cancelled": 2}
+    assert at == {"countries (debounced)": 2}
+
+
+def test_unchanged_selection_is_not_delayed(state):
+    computed = []
+    run(state, ("Ghana",), computed)
+    run(state, ("Ghana",), computed, pending_after=0)  # no wait: cancelled at the Tab 1 checkpoint
+    assert computed == [("Ghana",)]
+    assert cancellation.snapshot()[1] == {"Tab 1": 1}
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import crosstab
+import equivalence
+import indicators
+import pipeline
+
+
+def levels(values):
+    return list(crosstab.encode(pd.Series(values))[1])
+
+
+def test_numeric_levels_sort_by_value():
+    assert levels([10, 2, 1, 3, 2]) == ["1", "2", "3", "10"]
+    assert levels([1.5, 1.25, 10.0, np.nan]) == ["1.25", "1.5", "10.0", "nan"]
+
+
+def test_text_levels_sort_naturally_with_blank_last():
+    assert levels(["Site 10", "site 2", "", "Site 1"]) == ["Site 1", "site 2", "Site 10", crosstab.BLANK]
+    assert levels(["Yes", "No", "Yes"]) == ["No", "Yes"]
+    # Flags read as Yes/No, other integers keep their values
+    assert list(crosstab.encode(pd.Series([1, 0, 1]), flag=True)[1]) == ["No", "Yes"]
+    assert levels([True, False]) == ["No", "Yes"]
+    assert levels([1, 0, 1]) == ["0", "1"]
+
+
+def test_codes_point_at_their_levels():
+    values = pd.Series(["b10", "b2", "a", "b2"])
+    codes, lv = crosstab.encode(values)
+    assert list(lv[codes]) == list(values)
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    en, fr = equivalence.generate(200, seed=5)
+    return pipeline.compute_metrics(pipeline.load_dataset(en, fr, dedup="off"))
+
+
+def test_counts_match_pandas_crosstab(bundle):
+    cube = crosstab.build_cube(bundle)
+    table = cube.table("Country", "HasIRB")
+    df = bundle["df"]
+    expected = pd.crosstab(df["Country"], df["HasIRB"].map({True: "Yes", False: "No"}))
+    pd.testing.assert_frame_equal(table, expected, check_dtype=False, check_names=False)
+
+
+def test_mean_measure_matches_groupby(bundle):
+    cube = crosstab.build_cube(bundle)
+    table = cube.table("Country", "HasPhaseI", measure="InfraIndex")
+    df = bundle["df"]
+    expected = df.groupby(["Country", df["HasPhaseI"].map({True: "Yes", False: "No"})])["InfraIndex"].mean()
+    got = table.stack()
+    assert np.allclose(got.to_numpy(), expected.reindex(got.index).to_numpy())
+
+
+def test_flag_metrics_are_told_apart_from_scores():
+    flags = crosstab.flag_names(indicators.DEFINITIONS)
+    assert {"PolicyExists", "HasPhaseI", "HasIRB", "Lab Staff", "IsBasicScience"} <= flags
+    assert not {"CapabilityScore", "InfraIndex", "SOP_Coverage", "PhD"} & flags
+
+
+def test_int_score_limited_to_0_and_1_is_not_relabelled():
+    bundle = pipeline.compute_metrics(pipeline.load_dataset(*equivalence.generate(30, seed=5), dedup="off"))
+    df = bundle["df"]
+    df["InfraIndex"] = (df["InfraIndex"] > 0).astype(np.int64)
+    df["CapabilityScore"] = (df["CapabilityScore"] > 1).astype(np.int64)
+    cube = crosstab.build_cube(bundle)
+    assert list(cube.fields["InfraIndex"][1]) == ["0", "1"]
+    assert list(cube.fields["CapabilityScore"][1]) == ["0", "1"]
+    assert list(cube.fields["HasPhaseI"][1]) == ["No", "Yes"]
+    assert list(cube.fields["PolicyExists"][1]) == ["No", "Yes"]
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+import datadir
+
+
+class FakeJob:
+    def __init__(self, en_bytes, fr_bytes):
+        self.key = (en_bytes, fr_bytes)
+
+
+@pytest.fixture
+def log():
+    return {"submitted": [], "unpinned": []}
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch, log):
+    """An empty data folder, with jobs replaced by a log of submits/unpins."""
+
+    def submit(en_bytes, fr_bytes, pin=False):
+        assert pin
+        log["submitted"].append((en_bytes, fr_bytes))
+        return FakeJob(en_bytes, fr_bytes)
+
+    monkeypatch.setattr(datadir.jobs, "submit", submit)
+    monkeypatch.setattr(datadir.jobs, "unpin", lambda key: log["unpinned"].append(key))
+    monkeypatch.setattr(datadir, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(datadir, "_datasets", {})
+    monkeypatch.setattr(datadir, "_pending", {})
+    return tmp_path
+
+
+def write(path, text, mtime=None):
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_files_are_paired_by_language_tag(folder):
+    for name in ["survey_2024_en.csv", "survey_2024_fr.csv", "round-2.english.csv", "round-2 french.csv",
+                 "notes.txt"]:
+        write(folder / name, "Name,Country\n")
+    found = datadir.find_datasets(str(folder))
+    assert set(found) == {"survey_2024", "round-2"}
+    assert os.path.basename(found["survey_2024"]["fr"]) == "survey_2024_fr.csv"
+    assert os.path.basename(found["round-2"]["en"]) == "round-2.english.csv"
+
+
+def test_untagged_files_use_the_pays_header(folder):
+    write(folder / "export.csv", "﻿Nom de l'institution, Pays \nA,Togo\n")
+    write(folder / "other.csv", "Name,Country\nA,Ghana\n")
+    found = datadir.find_datasets(str(folder))
+    assert list(found["export"]) == ["fr"] and list(found["other"]) == ["en"]
+
+
+def test_newer_file_wins_a_slot(folder):
+    write(folder / "s_en.csv", "old", mtime=1_000_000_000)
+    write(folder / "s_english.csv", "new", mtime=2_000_000_000)
+    assert os.path.basename(datadir.find_datasets(str(folder))["s"]["en"]) == "s_english.csv"
+
+
+def test_a_change_is_ingested_once_it_settles(folder, log):
+    write(folder / "s_en.csv", "v1", mtime=1_000_000_000)
+    datadir.scan(settle=False)
+    assert log["submitted"] == [(b"v1", None)]
+
+    # Copy in progress: seen once, not ingested yet
+    write(folder / "s_en.csv", "v2 partial", mtime=2_000_000_000)
+    datadir.scan()
+    assert len(log["submitted"]) == 1
+    write(folder / "s_en.csv", "v2 complete", mtime=3_000_000_000)
+    datadir.scan()
+    assert len(log["submitted"]) == 1
+
+    # Unchanged on two consecutive scans: re-ingested, the old job unpinned
+    datadir.scan()
+    assert log["submitted"][-1] == (b"v2 complete", None)
+    assert log["unpinned"] == [(b"v1", None)]
+    assert [d.en_bytes for d in datadir.datasets()] == [b"v2 complete"]
+
+
+def test_unchanged_files_are_not_ingested_again(folder, log):
+    write(folder / "s_en.csv", "v1")
+    write(folder / "s_fr.csv", "v1 fr")
+    datadir.scan(settle=False)
+    for _ in range(3):
+        datadir.scan()
+    assert log["submitted"] == [(b"v1", b"v1 fr")]
+
+
+def test_removed_datasets_are_dropped_and_unpinned(folder, log):
+    write(folder / "a_en.csv", "a")
+    write(folder / "b_en.csv", "b")
+    datadir.scan(settle=False)
+    os.remove(folder / "a_en.csv")
+    datadir.scan()
+    assert [d.name for d in datadir.datasets()] == ["b"]
+    assert log["unpinned"] == [(b"a", None)]
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+import equivalence
+
+
+@pytest.fixture(scope="module")
+def fixture():
+    return equivalence.generate(150, seed=0)
+
+
+@pytest.mark.parametrize("engine", equivalence.ENGINES)
+def test_engine_matches_reference(fixture, engine, tmp_path):
+    report = equivalence.check_fixture("test", *fixture, [engine], 1, str(tmp_path))
+    assert equivalence.failures(report) == 0, [
+        t for t in report["engines"][engine]["tables"] if t["problems"] or t["columns"]
+    ]
+
+
+def site_tables():
+    ref = pd.DataFrame({"PhD": [1, 2, 3], "Lab Staff": [1, 1, 1]})
+    cand = pd.DataFrame({"PhD": [1, 5, 6], "Lab Staff": [1, 1, 0]})
+    return ref, cand
+
+
+def test_by_design_only_on_inexact_sites():
+    ref, cand = site_tables()
+    exempt = pd.DataFrame({"Country": ["Ghana", "Ghana", "Togo"], "PhD": [False, True, False]})
+    result = equivalence.compare_table("site_metrics", ref, cand, "pandas", exempt)
+    assert result["by_design"]["PhD"]["rows"] == 1
+    assert result["columns"]["PhD"]["rows"] == 1
+    assert result["columns"]["PhD"]["example"]["key"] == 2
+    # Columns outside the by-design list are never exempt
+    assert "Lab Staff" in result["columns"]
+
+
+def test_by_design_needs_an_inexact_site_in_the_country():
+    ref = pd.DataFrame({"Country": ["Ghana", "Togo"], "PhD": [3, 4]})
+    cand = pd.DataFrame({"Country": ["Ghana", "Togo"], "PhD": [5, 6]})
+    exempt = pd.DataFrame({"Country": ["Ghana", "Togo"], "PhD": [True, False]})
+    result = equivalence.compare_table("hr_summary", ref, cand, "pandas", exempt)
+    assert result["by_design"]["PhD"]["example"]["key"] == {"Country": "Ghana"}
+    assert result["columns"]["PhD"]["example"]["key"] == {"Country": "Togo"}
+
+
+def test_without_confidence_nothing_is_exempt():
+    ref, cand = site_tables()
+    result = equivalence.compare_table("site_metrics", ref, cand, "pandas")
+    assert result["columns"]["PhD"]["rows"] == 2 and not result["by_design"]
+
+
+def test_bare_one_and_zero_counts_are_by_design(tmp_path):
+    en, fr = equivalence.generate(60, seed=4)
+    report = equivalence.check_fixture("test", en, fr, ["pandas"], 1, str(tmp_path))
+    tables = {t["table"]: t for t in report["engines"]["pandas"]["tables"]}
+    assert equivalence.failures(report) == 0
+    # The fixture answers "1"/"0": the number columns and staff metrics differ on purpose
+    assert "Number of other staff" in tables["df_full"]["by_design"]
+    assert "Other Staff" in tables["site_metrics"]["by_design"]
@@ -0,0 +1,95 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import history
+import jobs
+
+
+def bundle(n_sites=2):
+    countries = ["Ghana", "Togo"]
+    map_df = pd.DataFrame({
+        "Country": countries, "ISO_A3": ["GHA", "TGO"],
+        "Avg Capability": [1.0, 2.0], "Phase I Sites": [1, 0], "Avg InfraIndex": [0.5, 1.5],
+        "IRB Sites": [1, 1], "% With Policy": [0.5, 1.0],
+    })
+    df = pd.DataFrame({"Country": (countries * n_sites)[:n_sites * 2]})
+    return {"map_df": map_df, "df": df, "total_staff": pd.Series([10, 20], index=countries)}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "history.sqlite")
+
+
+def test_rounds_are_recorded_once_per_dataset(db):
+    assert history.record_round(bundle(), "k1", path=db)
+    assert not history.record_round(bundle(), "k1", path=db)
+    round_id, label = history.saved_round("k1", path=db)
+    assert round_id == 1 and label
+    assert len(history.load_rounds(path=db)) == 1
+
+
+def test_default_labels_are_versioned(db):
+    for key in ["k1", "k2", "k3"]:
+        history.record_round(bundle(), key, label="2024 round", path=db)
+    assert list(history.load_rounds(path=db)["label"]) == ["2024 round", "2024 round (2)", "2024 round (3)"]
+
+
+def test_rename_rejects_labels_in_use(db):
+    history.record_round(bundle(), "k1", label="a", path=db)
+    history.record_round(bundle(), "k2", label="b", path=db)
+    assert not history.rename_round(2, "a", path=db)
+    assert history.rename_round(2, "c", path=db)
+    assert history.saved_round("k2", path=db) == (2, "c")
+
+
+def test_trend_rounds_are_unique_even_with_equal_labels(db):
+    history.record_round(bundle(), "k1", label="x", path=db)
+    history.record_round(bundle(3), "k2", label="x", path=db)
+    trends = history.load_trends(countries=["Ghana"], metrics=["Number of Sites"], path=db)
+    assert trends["Round"].nunique() == 2
+    assert trends["Round"].str.startswith(("#1 ", "#2 ")).all()
+    assert list(trends["Value"]) == [2, 3]
+
+
+def test_legacy_duplicate_labels_are_versioned_on_open(db):
+    with sqlite3.connect(db) as conn:
+        conn.executescript(history.schema)
+        conn.executemany(
+            "INSERT INTO rounds (label, dataset_key, ingested_at, num_sites, num_countries) "
+            "VALUES (?, ?, '2024-01-01T00:00:00+00:00', 1, 1)",
+            [("r", "k1"), ("r", "k2")],
+        )
+    assert list(history.load_rounds(path=db)["label"]) == ["r", "r (2)"]
+
+
+def test_default_path_is_next_to_the_app():
+    assert history.DB_PATH.startswith(history.APP_DIR)
+
+
+def test_delete_round_removes_its_aggregates(db):
+    history.record_round(bundle(), "k1", label="dev", path=db)
+    history.record_round(bundle(), "k2", label="real", path=db)
+    assert history.delete_round(1, path=db)
+    assert not history.delete_round(1, path=db)
+    assert list(history.load_rounds(path=db)["label"]) == ["real"]
+    assert set(history.load_trends(path=db)["round_id"]) == {2}
+    # The dataset and its label can be saved again
+    assert history.saved_round("k1", path=db) is None
+    assert history.record_round(bundle(), "k1", label="dev", path=db)
+
+
+def test_finished_jobs_are_not_recorded(monkeypatch):
+    monkeypatch.setattr(history, "record_round", lambda *a, **k: pytest.fail("recorded a round"))
+    monkeypatch.setattr(jobs.workers, "run", lambda key, stage, fn, *args, progress: FakeFuture(stage))
+    assert jobs._run(jobs.Job("k"), b"", None) == "metrics"
+
+
+class FakeFuture:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+def definitions(tmp_path, body):
+    path = tmp_path / "metrics.toml"
+    path.write_text(body)
+    return indicators.load_definitions(str(path))
+
+
+def survey():
+    return pd.DataFrame({
+        "Country": ["Ghana", "Ghana", "Togo"],
+        "Q lab": ["Yes", "No", "Yes"],
+        "Q bio": ["Yes", "Yes", "No"],
+        "Q iso": ["oui", "No", "CHECKED"],
+        "Staff a": ["3", "", "12 staff"],
+        "Staff b": ["5", "1", "abc"],
+    })
+
+
+@pytest.mark.parametrize("body, message", [
+    ('[[metric]]\nname = "A"\nread = "yes"\nagg = "sum"', "either columns or inputs"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "sum"\n'
+     '[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "sum"', "duplicate name"),
+    ('[[metric]]\nname = "A"\ninputs = ["B"]\nagg = "sum"', "not defined above"),
+    ('[[metric]]\nname = "A"\ncolumns = { startswith = ["x"] }\nread = "yes"\nagg = "sum"', "unknown column selector"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "text"\nagg = "sum"', "read must be"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "median"', "agg must be"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "max"\nweights = [1]', "only apply"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x", "y"] }\nread = "yes"\nagg = "sum"\nweights = [1]',
+     "1 weights for 2 exact columns"),
+    ('[[metric]]\nname = "A"\ncolumns = { regex = ["x"] }\nread = "yes"\nagg = "sum"\nweights = ["1"]',
+     "list of numbers"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "sum"\ndtype = "str"', "dtype must be"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "number"\nagg = "max"\ndtype = "int"',
+     "need a fill value"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "sum"\nclip = [0]', "clip must be"),
+    ('[[metric]]\nname = "A"\ncolumns = { exact = ["x"] }\nread = "yes"\nagg = "sum"\ncountry = "median"',
+     "country must be"),
+])
+def test_invalid_definitions_are_rejected(tmp_path, body, message):
+    with pytest.raises(ValueError, match=message):
+        definitions(tmp_path, body)
+
+
+def test_shipped_definitions_load():
+    names = [d["name"] for d in indicators.load_definitions()]
+    assert len(names) == len(set(names)) and "CapabilityScore" in names
+
+
+@pytest.mark.parametrize("agg, expected", [
+    ("any", [True, True, True]),
+    ("sum", [2, 1, 1]),
+    ("max", [1, 1, 1]),
+    ("min", [1, 0, 0]),
+    ("mean", [1.0, 0.5, 0.5]),
+])
+def test_aggregations(tmp_path, agg, expected):
+    defs = definitions(tmp_path, f'[[metric]]\nname = "M"\ncolumns = {{ prefix = ["Q l", "Q b"] }}\n'
+                                 f'read = "yes"\nagg = "{agg}"')
+    values, _ = indicators.Plan(defs, tuple(survey().columns)).evaluate(survey())
+    assert values["M"].tolist() == expected
+
+
+def test_reads_weights_inputs_and_post_processing(tmp_path):
+    defs = definitions(tmp_path, """
+[[metric]]
+name = "Binary"
+columns = { exact = ["Q iso"] }
+read = "binary"
+agg = "max"
+dtype = "int"
+
+[[metric]]
+name = "Weighted"
+columns = { exact = ["Q lab", "Q bio"] }
+read = "yes"
+agg = "mean"
+weights = [3, 1]
+
+[[metric]]
+name = "Staff"
+columns = { prefix = ["Staff"] }
+read = "number"
+agg = "max"
+fill = 0
+clip = [0, 10]
+dtype = "int"
+
+[[metric]]
+name = "Both"
+inputs = ["Binary", "Staff"]
+agg = "sum"
+divide = 2
+round = 1
+
+[[metric]]
+name = "Missing"
+columns = { exact = ["not in the export"] }
+read = "yes"
+agg = "any"
+default = true
+dtype = "bool"
+""")
+    values, confidence = indicators.Plan(defs, tuple(survey().columns)).evaluate(survey())
+    assert values["Binary"].tolist() == [1, 0, 1]
+    assert values["Weighted"].tolist() == [1.0, 0.25, 0.75]
+    # "12 staff" is clipped to 10; blank and unreadable answers are filled
+    assert values["Staff"].tolist() == [5, 1, 10] and values["Staff"].dtype == np.int64
+    assert values["Both"].tolist() == [3.0, 0.5, 5.5]
+    assert values["Missing"].tolist() == [True, True, True]
+    assert list(confidence.columns) == ["Staff a", "Staff b"]
+    assert confidence["Staff b"].tolist() == [1.0, 1.0, 0.0]
+
+
+def test_weights_not_matching_the_export_name_the_metric(tmp_path):
+    defs = definitions(tmp_path, '[[metric]]\nname = "Lab"\ncolumns = { prefix = ["Q"] }\n'
+                                 'read = "yes"\nagg = "sum"\nweights = [1, 2]')
+    with pytest.raises(ValueError, match=r"'Lab'.*2 weights.*3 columns.*'Q lab', 'Q bio', 'Q iso'"):
+        indicators.Plan(defs, tuple(survey().columns))
+
+
+def test_new_country_metric_appears_in_country_table(tmp_path, monkeypatch):
+    defs = definitions(tmp_path, """
+[[metric]]
+name = "HasLab"
+group = "core"
+columns = { exact = ["Q lab"] }
+read = "yes"
+agg = "any"
+dtype = "int"
+
+[[metric]]
+name = "LabAndBio"
+columns = { exact = ["Q lab", "Q bio"] }
+read = "yes"
+agg = "min"
+dtype = "int"
+country = "mean"
+label = "Share with lab and bio"
+
+[[metric]]
+name = "NoCountry"
+inputs = ["HasLab"]
+agg = "max"
+""")
+    monkeypatch.setattr(indicators, "DEFINITIONS", defs)
+    assert [d["name"] for d in indicators.extra_indicators()] == ["LabAndBio"]
+    values, _ = indicators.Plan(defs, tuple(survey().columns)).evaluate(survey())
+    df = pd.concat([survey(), values], axis=1)
+    table = indicators.country_table(df).set_index("Country")
+    assert list(table.columns) == ["Share with lab and bio"]
+    assert table["Share with lab and bio"].to_dict() == {"Ghana": 0.5, "Togo": 0.0}
+
+
+def test_country_table_without_extra_indicators(monkeypatch):
+    monkeypatch.setattr(indicators, "DEFINITIONS", [])
+    assert indicators.country_table(survey())["Country"].tolist() == ["Ghana", "Togo"]
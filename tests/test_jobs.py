@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+class Done:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Fake worker stages: "load" blocks until released, calls are logged."""
+    release = threading.Event()
+    calls = []
+
+    def run(key, stage, fn, *args, progress):
+        calls.append((key, stage))
+        if stage == "load":
+            release.wait(5)
+        return Done(f"{stage}:{key}")
+
+    monkeypatch.setattr(jobs.workers, "run", run)
+    monkeypatch.setattr(jobs, "_jobs", jobs.OrderedDict())
+    monkeypatch.setattr(jobs, "_pinned", set())
+    yield release, calls
+    release.set()
+
+
+def test_submit_reuses_the_job_for_the_same_bytes(stages):
+    release, _ = stages
+    job = jobs.submit(b"en", None)
+    assert jobs.submit(b"en", None) is job
+    assert jobs.submit(b"en", b"fr") is not job
+    release.set()
+    assert job.result(5) == f"metrics:{job.key}"
+
+
+def test_discarded_running_job_stops_after_its_stage(stages):
+    release, calls = stages
+    first = jobs.submit(b"en", None)
+    while not calls:
+        time.sleep(0.01)
+    jobs.discard(first.key)
+    assert jobs.get(first.key) is None
+    release.set()
+    with pytest.raises(jobs.Superseded):
+        first.result(5)
+    assert (first.key, "metrics") not in calls
+
+
+def test_discarded_queued_job_never_starts(stages):
+    release, calls = stages
+    running = [jobs.submit(bytes([i]), None) for i in range(2)]  # fill both threads
+    queued = jobs.submit(b"queued", None)
+    jobs.discard(queued.key)
+    assert queued.future.cancelled()
+    release.set()
+    for job in running:
+        job.result(5)
+    assert all(key != queued.key for key, _ in calls)
+
+
+def test_pinned_jobs_are_not_discarded(stages):
+    release, _ = stages
+    job = jobs.submit(b"shared", None, pin=True)
+    jobs.discard(job.key)
+    assert jobs.get(job.key) is job
+    release.set()
+    assert job.result(5)
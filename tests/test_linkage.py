@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import linkage
+
+
+def sites():
+    df = pd.DataFrame({
+        "Name": ["Korle Bu Teaching Hospital", "Centre 2 Research", "Noguchi Institute",
+                 "Hôpital Korle Bu Teaching", "Centre de Recherche 3", "Institut Noguchi"],
+        "Country": ["Ghana", "Togo", "Ghana", "Ghana", "Togo", "Togo"],
+        "Phone": ["123", "", "", "", "456", "789"],
+    })
+    source = np.array([False, False, False, True, True, True])
+    return df, source
+
+
+def test_name_tokens_are_language_neutral():
+    assert linkage.name_tokens("Hôpital de l'Université") == {"hospital", "university"}
+    assert linkage.name_tokens("University Hospital") == {"hospital", "university"}
+    assert linkage.name_tokens(None) == frozenset()
+
+
+def test_matches_need_same_country_and_numbers():
+    df, source = sites()
+    pairs = linkage.match(df, "Name", source)
+    # Noguchi is in different countries; the research centres differ in number
+    assert list(zip(pairs["en"], pairs["fr"])) == [(0, 3)]
+    assert pairs["score"].iloc[0] == 1.0
+
+
+def test_each_row_is_linked_once_best_score_first():
+    df = pd.DataFrame({
+        "Name": ["National Health Laboratory", "Laboratoire National de Santé", "Laboratoire National Santé Centre"],
+        "Country": ["Mali"] * 3,
+    })
+    pairs = linkage.match(df, "Name", [False, True, True], threshold=0.5)
+    assert list(zip(pairs["en"], pairs["fr"])) == [(0, 1)]
+
+
+@pytest.mark.parametrize("policy, kept, phone", [
+    ("merge", ["Korle Bu Teaching Hospital"], "123"),
+    ("prefer_en", ["Korle Bu Teaching Hospital"], "123"),
+    ("prefer_fr", ["Hôpital Korle Bu Teaching"], ""),
+])
+def test_policies(policy, kept, phone):
+    df, source = sites()
+    out, report = linkage.link_records(df, "Name", source, policy)
+    assert len(out) == len(df) - 1 and list(out.index) == list(range(len(out)))
+    ghana = out[out["Name"].str.contains("Korle")]
+    assert list(ghana["Name"]) == kept and ghana["Phone"].iloc[0] == phone
+    assert list(report["Name (FR)"]) == ["Hôpital Korle Bu Teaching"]
+
+
+def test_merge_fills_blanks_from_the_french_row():
+    df, source = sites()
+    df.loc[0, "Phone"] = ""
+    df.loc[3, "Phone"] = "999"
+    out, _ = linkage.link_records(df, "Name", source, "merge")
+    assert out.loc[out["Name"] == "Korle Bu Teaching Hospital", "Phone"].item() == "999"
+
+
+def test_off_and_unknown_policies():
+    df, source = sites()
+    out, report = linkage.link_records(df, "Name", source, "off")
+    assert out is df and report.empty
+    with pytest.raises(ValueError):
+        linkage.link_records(df, "Name", source, "newest")
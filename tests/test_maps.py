@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+import maps
+
+
+def collection(code):
+    return {"type": "FeatureCollection", "features": [{
+        "type": "Feature", "properties": {"ISO_A3": code},
+        "geometry": {"type": "MultiPolygon", "coordinates": [[[[0, 0], [1, 0], [1, 1], [0, 0]]]]},
+    }]}
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    p = tmp_path / "geo.geojson"
+    monkeypatch.setattr(maps, "GEOMETRY_PATH", str(p))
+    maps._load_geometry.cache_clear()
+    return p
+
+
+def test_missing_geometry_is_not_cached(path):
+    assert maps.geometry() is None
+    assert "plotly CDN" in maps.fallback_warning()
+    # Built after startup: used from the next call on
+    path.write_text(json.dumps(collection("GHA")))
+    assert maps.geometry()["features"][0]["properties"]["ISO_A3"] == "GHA"
+    assert maps.fallback_warning() is None
+
+
+def test_rebuilt_geometry_is_reloaded(path):
+    path.write_text(json.dumps(collection("GHA")))
+    first = maps.geometry()
+    assert maps.geometry() is first
+    path.write_text(json.dumps(collection("TGO")))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert maps.geometry()["features"][0]["properties"]["ISO_A3"] == "TGO"
+
+
+def test_missing_geometry_is_logged_once(path, caplog):
+    maps._missing.discard(str(path))
+    with caplog.at_level("WARNING", logger="maps"):
+        maps.geometry()
+        maps.geometry()
+    assert len(caplog.records) == 1
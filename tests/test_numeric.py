@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import numeric
+import pipeline
+
+
+def parse(*answers):
+    return numeric.extract_numbers(pd.Series(answers))
+
+
+@pytest.mark.parametrize("answer, value, confidence", [
+    ("12", 12.0, 1.0),
+    ("2.5 %", 2.5, 1.0),
+    ("1,000", 1000.0, 0.9),
+    ("1,5", 1.5, 0.9),
+    ("1 000", 1000.0, 0.9),
+    ("12 staff", 12.0, 0.9),
+    ("aucun", 0.0, 0.9),
+    ("approx. 3", 3.0, 0.7),
+    ("5-10", 7.5, 0.6),
+    ("5 à 10", 7.5, 0.6),
+    ("abc", np.nan, 0.0),
+])
+def test_values_and_confidence(answer, value, confidence):
+    out = parse(answer).iloc[0]
+    assert out["value"] == pytest.approx(value, nan_ok=True)
+    assert out["confidence"] == confidence
+
+
+@pytest.mark.parametrize("answer", ["-3", "−3", "-3 staff", "about -2"])
+def test_negative_numbers_are_rejected(answer):
+    out = parse(answer).iloc[0]
+    assert np.isnan(out["value"]) and out["confidence"] == 0.0
+
+
+def test_blank_answers_have_no_confidence():
+    out = parse("", "7")
+    assert out["value"].isna().iloc[0] and out["confidence"].isna().iloc[0]
+    assert numeric.confidence_summary(out[["confidence"]]) == {
+        "answered": 1, "exact": 1, "estimated": 0, "unparsed": 0}
+
+
+def test_staff_counts_of_one_and_zero_survive_loading():
+    en = pd.DataFrame({
+        "Name of the institution": ["A", "B", "C"],
+        "Country": ["Ghana", "Ghana", "Ghana"],
+        "Availability of clinical staff": ["1", "0", "Yes"],
+        "Number of staff with doctorate (PhD)": ["1", "0", "12 staff"],
+    }).to_csv(index=False).encode()
+    df = pipeline.load_dataset(en, None, dedup="off")
+    # Yes/No answers are still unified, counts are left as typed
+    assert list(df["Availability of clinical staff"]) == ["Yes", "No", "Yes"]
+    bundle = pipeline.compute_metrics(df)
+    assert list(bundle["df"]["PhD"]) == [1, 0, 12]
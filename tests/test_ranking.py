@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ranking
+
+
+def bundle(n=60, seed=0, ties=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Name": [f"Site {i}" for i in range(n)],
+        "Country": rng.choice(["Togo", "Ghana", "Mali"], n),
+        "CapabilityScore": rng.integers(0, 3, n) if ties else rng.uniform(0, 8, n),
+        "InfraIndex": rng.integers(0, 2, n) if ties else rng.uniform(0, 4, n),
+        "HasIRB": rng.integers(0, 2, n),
+        "HasPhaseI": rng.integers(0, 2, n),
+        "Other Staff": rng.integers(0, 500, n),
+        "PhD": rng.integers(0, 20, n),
+    })
+    return {"df": df, "name_col": "Name"}
+
+
+def full_sort(b, weights, k):
+    """Reference: score every site, stable sort within each country."""
+    r = ranking.build_ranking(b)
+    sites = r["sites"].assign(Score=ranking.scores(r, weights))
+    sites["pos"] = sites["SiteName"].str.slice(5).astype(int)
+    best = (sites.sort_values(["Country", "Score", "pos"], ascending=[True, False, True], kind="stable")
+                 .groupby("Country").head(k))
+    return list(best["SiteName"])
+
+
+@pytest.mark.parametrize("ties", [False, True])
+@pytest.mark.parametrize("k", [1, 3, 100])
+def test_top_k_matches_a_full_sort(ties, k):
+    b = bundle(ties=ties)
+    weights = dict(ranking.default_weights, HasIRB=0.5, Staff=0.0)
+    out = ranking.top_k(ranking.build_ranking(b), weights, k)
+    assert list(out["SiteName"]) == full_sort(b, weights, k)
+    assert (out.groupby("Country")["Rank"].apply(lambda r: list(r) == list(range(1, len(r) + 1)))).all()
+
+
+def test_scores_range_from_0_to_100():
+    r = ranking.build_ranking(bundle())
+    s = ranking.scores(r, ranking.default_weights)
+    assert s.min() >= 0 and s.max() <= 100
+    # A site at the peak of every feature scores 100
+    r["matrix"][0] = 1.0
+    assert ranking.scores(r, ranking.default_weights)[0] == pytest.approx(100)
+    assert not ranking.scores(r, dict.fromkeys(ranking.features, 0)).any()
+
+
+def test_weights_pick_the_feature():
+    b = bundle()
+    only_phd = dict.fromkeys(ranking.features, 0.0)
+    only_phd["Staff"] = 1.0
+    out = ranking.top_k(ranking.build_ranking(b), only_phd, 1, countries=["Ghana"])
+    ghana = b["df"][b["df"]["Country"] == "Ghana"]
+    staff = ghana["Other Staff"] + ghana["PhD"]
+    assert list(out["Country"]) == ["Ghana"]
+    assert out["SiteName"].item() == ghana.loc[staff.idxmax(), "Name"]
+
+
+def test_missing_features_and_countries():
+    b = bundle()
+    r = ranking.build_ranking({"df": b["df"].drop(columns=["InfraIndex", "PhD"]), "name_col": "Name"})
+    assert (r["sites"]["InfraIndex"] == 0).all()
+    assert ranking.top_k(r, ranking.default_weights, 5, countries=["Chad"]).empty
@@ -0,0 +1,93 @@
+import io
+import zipfile
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+import equivalence
+import maps
+import pipeline
+import reports
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    df = pipeline.load_dataset(*equivalence.generate(40, seed=3), dedup="off")
+    return pipeline.compute_metrics(df)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(reports, "_payloads", OrderedDict())
+    monkeypatch.setattr(reports, "_reports", {})
+
+
+def test_payload_is_built_once_per_key(cache):
+    calls = []
+
+    def build(text):
+        return lambda: calls.append(text) or text
+
+    assert reports.peek(("ds1", "sites")) is None
+    assert reports.payload(("ds1", "sites"), build("a,b")) == b"a,b"
+    assert reports.payload(("ds1", "sites"), build("other")) == b"a,b"
+    # Another dataset with the same selection gets its own payload
+    assert reports.payload(("ds2", "sites"), build("c,d")) == b"c,d"
+    assert calls == ["a,b", "c,d"]
+    assert reports.peek(("ds1", "sites")) == b"a,b"
+
+
+def test_least_recently_used_payload_is_evicted(cache, monkeypatch):
+    monkeypatch.setattr(reports, "MAX_PAYLOADS", 2)
+    reports.payload("a", lambda: b"1")
+    reports.payload("b", lambda: b"2")
+    reports.peek("a")
+    reports.payload("c", lambda: b"3")
+    assert reports.peek("b") is None
+    assert reports.peek("a") == b"1" and reports.peek("c") == b"3"
+
+
+def names(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+@pytest.mark.parametrize("has_parquet", [True, False])
+def test_report_zip_contents(bundle, monkeypatch, has_parquet):
+    monkeypatch.setattr(reports, "HAS_PARQUET", has_parquet)
+    files = names(reports.build_report(bundle))
+    stems = set(reports.report_tables(bundle))
+
+    assert {n[len("tables/"):-4] for n in files if n.startswith("tables/")} == stems
+    parquet = {n[len("parquet/"):-8] for n in files if n.startswith("parquet/")}
+    assert parquet == (stems if has_parquet else set())
+    if has_parquet:
+        back = pd.read_parquet(io.BytesIO(files["parquet/site_list.parquet"]))
+        assert len(back) == len(reports.site_list(bundle["df"], bundle["name_col"]))
+
+    # One shared plotly.js; every map page points at it instead of inlining it
+    assert [n for n in files if n.endswith(".js")] == ["maps/plotly.min.js"]
+    pages = [n for n in files if n.startswith("maps/") and n.endswith(".html")]
+    metrics = list(bundle["map_long"]["Metric"].unique()) + ["All Metrics"]
+    assert sorted(pages) == sorted(f"maps/{maps.map_file_name(m)}" for m in metrics)
+    for page in pages:
+        html = files[page].decode("utf-8")
+        assert 'src="plotly.min.js"' in html
+        assert len(files[page]) < len(files["maps/plotly.min.js"])
+
+
+def test_report_is_built_once_per_dataset(bundle, cache, monkeypatch):
+    builds = []
+    monkeypatch.setattr(reports, "build_report", lambda b: builds.append(b) or b"zip")
+    first = reports.submit_report("ds1", bundle)
+    first.result(timeout=30)
+    assert reports.submit_report("ds1", bundle) is first
+    assert reports.report_future("ds1") is first
+    assert reports.peek(("ds1", "report")) == b"zip"
+    assert len(builds) == 1
+
+    # Evicted from the payload cache: the next request builds it again
+    reports._payloads.clear()
+    reports.submit_report("ds1", bundle).result(timeout=30)
+    assert len(builds) == 2
@@ -0,0 +1,59 @@
+import pandas as pd
+
+import search
+
+
+def bundle():
+    df = pd.DataFrame({
+        "Name of the institution": ["Hôpital de Lomé", "Korle Bu Teaching Hospital", "Noguchi Institute"],
+        "Country": ["Togo", "Ghana", "Ghana"],
+        "CapabilityScore": [1.0, 2.0, 3.0],
+        "If yes, list the research collaborations in the last 5 years": ["WHO; Pasteur", "", "NIH, WHO"],
+    })
+    return {"df": df, "name_col": "Name of the institution"}
+
+
+def names(hits):
+    return list(hits["SiteName"])
+
+
+def test_prefix_match_is_accent_and_case_insensitive():
+    index = search.build_index(bundle())
+    assert names(search.search(index, "HO")) == ["Hôpital de Lomé", "Korle Bu Teaching Hospital"]
+    assert names(search.search(index, "lome")) == ["Hôpital de Lomé"]
+
+
+def test_every_term_must_match():
+    index = search.build_index(bundle())
+    assert names(search.search(index, "who nog")) == ["Noguchi Institute"]
+    assert names(search.search(index, "who korle")) == []
+
+
+def test_stakeholder_text_is_indexed():
+    index = search.build_index(bundle())
+    assert names(search.search(index, "pasteur")) == ["Hôpital de Lomé"]
+    assert names(search.search(index, "who")) == ["Hôpital de Lomé", "Noguchi Institute"]
+
+
+def test_results_keep_the_site_columns():
+    hits = search.search(search.build_index(bundle()), "noguchi")
+    assert list(hits.columns) == ["SiteName", "Country", "CapabilityScore"]
+    assert hits.iloc[0]["Country"] == "Ghana"
+
+
+def test_empty_query_and_limit():
+    index = search.build_index(bundle())
+    assert search.search(index, "  ;; ").empty
+    assert len(search.search(index, "h", limit=1)) == 1
+    assert search.search(index, "zzz").empty
+
+
+def test_matches_a_full_scan():
+    b = bundle()
+    index = search.build_index(b)
+    text = (b["df"]["Name of the institution"] + " "
+            + b["df"]["If yes, list the research collaborations in the last 5 years"])
+    for term in ["h", "te", "w", "in", "x"]:
+        expected = [n for n, t in zip(b["df"]["Name of the institution"], text)
+                    if any(tok.startswith(term) for tok in search.tokenize(t))]
+        assert names(search.search(index, term)) == expected
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+import sketches
+import sql_backend
+
+
+def stake_rows():
+    return pd.DataFrame({
+        "Country": ["Ghana"] * 5 + ["Togo"] * 3,
+        "Site": ["A", "A", "B", "C", "C", "D", "E", "D"],
+        "Stakeholder": ["WHO", "WHO", "WHO", "MoH", "WHO", "WHO", "MoH", "Pasteur"],
+    })
+
+
+def test_hyperloglog_estimate_and_merge():
+    h = sketches.hash_values(np.arange(50_000))
+    a = sketches.HyperLogLog().add(h[:30_000])
+    b = sketches.HyperLogLog().add(h[20_000:])
+    assert a.count() == pytest.approx(30_000, rel=0.05)
+    assert sketches.merged([a, b], sketches.HyperLogLog).count() == pytest.approx(50_000, rel=0.05)
+    # Merging copies; the inputs are untouched
+    assert a.count() == pytest.approx(30_000, rel=0.05)
+    assert sketches.HyperLogLog().count() == 0
+
+
+def test_count_min_never_underestimates():
+    rng = np.random.default_rng(0)
+    items = rng.integers(0, 5_000, 20_000)
+    cms = sketches.CountMin(width=256).add(sketches.hash_values(items), 1)
+    keys, counts = np.unique(items, return_counts=True)
+    assert (cms.estimate(sketches.hash_values(keys)) >= counts).all()
+
+
+def test_quantile_sketch_relative_error():
+    values = np.random.default_rng(1).uniform(0, 10, 10_000)
+    q = sketches.QuantileSketch(alpha=0.01).add(values)
+    assert q.quantile(0.5) == pytest.approx(np.quantile(values, 0.5), rel=0.02)
+    assert q.count() == len(values)
+
+
+def test_stakeholder_sketches_count_distinct_sites_once():
+    tops, sites = sketches.build_stakeholder_sketches(stake_rows())
+    ghana = tops["Ghana"].top().set_index("Stakeholder")["CountSites"]
+    # A names WHO twice but counts once
+    assert ghana.to_dict() == {"WHO": 3, "MoH": 1}
+    per_country, total = sketches.site_counts(sites)
+    assert per_country.set_index("Country")["Sites"].to_dict() == {"Ghana": 3, "Togo": 2}
+    assert total == 5
+
+
+def test_stakeholder_table_matches_pandas_engine():
+    rows = stake_rows()
+    tops, _ = sketches.build_stakeholder_sketches(rows)
+    approx = sketches.stakeholder_table(tops, ["Ghana", "Togo"], ["Country", "Stakeholder"])
+    exact = pipeline.group_stakeholders(rows, ["Country", "Stakeholder"])
+    on = ["Country", "Stakeholder"]
+    merged = exact.merge(approx, on=on, suffixes=("", "_approx"))
+    assert len(merged) == len(exact)
+    assert (merged["CountSites"] == merged["CountSites_approx"]).all()
+    assert (approx["SitesList"] == "").all()
+
+
+def fake_aggregate(df, site_policy, site_clean):
+    return {"rows_seen": len(site_clean)}
+
+
+def test_approximate_switches_on_threshold(monkeypatch):
+    rows = stake_rows()
+    df = pd.DataFrame({"Country": ["Ghana", "Togo"], "InfraIndex": [1.0, 2.0]})
+    assert sketches.approximate(fake_aggregate)(df, None, rows) == {"rows_seen": len(rows)}
+
+    monkeypatch.setattr(sketches, "APPROX_ROWS", 3)
+    tables = sketches.approximate(fake_aggregate)(df, None, rows)
+    assert tables["approx"] and tables["rows_seen"] == 0
+    # The exploded rows are not kept once summarized
+    assert tables["site_clean"].empty and list(tables["site_clean"].columns) == list(rows.columns)
+    assert tables["stake_mentions"] == len(rows)
+    assert tables["stake_sites_total"] == 5
+
+
+def test_sqlite_cache_is_separate_for_approximate_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql_backend, "SQL_DIR", str(tmp_path))
+    built = []
+    monkeypatch.setattr(sql_backend, "materialize", lambda path, df, site_clean: built.append(path))
+    monkeypatch.setattr(sql_backend, "query_tables", lambda path: {})
+    aggregate = sql_backend.aggregator("k")
+    aggregate(None, None, stake_rows())
+    aggregate(None, None, stake_rows().iloc[0:0])
+    assert built == [sql_backend.db_path("k"), sql_backend.db_path("k", stakeholders=False)]
+    assert built[0] != built[1]
@@ -0,0 +1,101 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import equivalence
+import pipeline
+import sql_backend
+
+
+@pytest.fixture(scope="module")
+def prepared():
+    en, fr = equivalence.generate(300, seed=3)
+    df = pipeline.load_dataset(en, fr, dedup="off")
+    return pipeline.compute_metrics(df)
+
+
+@pytest.fixture(scope="module")
+def tables(prepared, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("sql") / "k.sqlite")
+    sql_backend.materialize(path, prepared["df"], prepared["site_clean"])
+    return sql_backend.query_tables(path)
+
+
+@pytest.mark.parametrize("name", ["cap_df", "tr_df", "infra_df", "er_df", "pol_df"])
+def test_country_tables_match_pandas(prepared, tables, name):
+    expected = prepared[name].reset_index(drop=True)
+    pd.testing.assert_frame_equal(tables[name].reset_index(drop=True), expected,
+                                  check_dtype=False, rtol=1e-9)
+
+
+def test_hr_sums_match_pandas(prepared, tables):
+    for name in ["bool_sum", "num_sum", "total_staff"]:
+        if isinstance(prepared[name], pd.Series):
+            pd.testing.assert_series_equal(tables[name], prepared[name], check_dtype=False,
+                                           check_names=False)
+        else:
+            pd.testing.assert_frame_equal(tables[name], prepared[name], check_dtype=False)
+
+
+def test_stakeholder_tables_match_pandas_including_order(prepared, tables):
+    for name in ["grouped_full", "stake_counts"]:
+        pd.testing.assert_frame_equal(
+            tables[name].reset_index(drop=True), prepared[name].reset_index(drop=True),
+            check_dtype=False,
+        )
+
+
+def test_sites_list_is_sorted_and_ties_break_on_stakeholder(tmp_path):
+    bundle = pipeline.compute_metrics(
+        pipeline.load_dataset(*equivalence.generate(20, seed=1), dedup="off"))
+    df = bundle["df"]
+    site_clean = pd.DataFrame({
+        "Country": ["Ghana"] * 5,
+        "Site": ["Zeta; clinic", "Alpha", "Mid", "Beta", "Alpha"],
+        "Stakeholder": ["WHO", "WHO", "WHO", "MoH", "MoH"],
+    })
+    path = str(tmp_path / "t.sqlite")
+    sql_backend.materialize(path, df, site_clean)
+    out = sql_backend.query_tables(path)
+    grouped = out["grouped_full"].set_index("Stakeholder")
+    assert grouped.loc["WHO", "SitesList"] == "Alpha; Mid; Zeta; clinic"
+    assert grouped.loc["MoH", "SitesList"] == "Alpha; Beta"
+
+    site_clean.loc[len(site_clean)] = ["Ghana", "Mid", "MoH"]
+    path = str(tmp_path / "tie.sqlite")
+    sql_backend.materialize(path, df, site_clean)
+    out = sql_backend.query_tables(path)
+    expected = pipeline.aggregate_metrics(df, bundle["site_policy"], site_clean)
+    # 3 sites each: the tie is broken by stakeholder name in both engines
+    assert list(out["stake_counts"]["Stakeholder"]) == ["MoH", "WHO"]
+    assert list(expected["stake_counts"]["Stakeholder"]) == ["MoH", "WHO"]
+    assert list(out["grouped_full"]["Stakeholder"]) == list(expected["grouped_full"]["Stakeholder"])
+
+
+def test_cache_is_rebuilt_when_the_rows_change(prepared, tmp_path):
+    path = str(tmp_path / "k.sqlite")
+    df, site_clean = prepared["df"], prepared["site_clean"]
+    sql_backend.materialize(path, df, site_clean)
+    built = sql_backend.stored_fingerprint(path)
+    sql_backend.materialize(path, df, site_clean)
+    assert sql_backend.stored_fingerprint(path) == built
+
+    # Same dataset key, different derived frame (e.g. a metrics.toml edit)
+    keep = df["Country"] != "Togo"
+    sql_backend.materialize(path, df[keep], site_clean[site_clean["Country"] != "Togo"])
+    assert sql_backend.stored_fingerprint(path) != built
+    assert "Togo" not in set(sql_backend.query_tables(path)["cap_df"]["Country"])
+
+
+def test_cache_without_fingerprint_is_rebuilt(prepared, tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE sites (Country TEXT)")
+    sql_backend.materialize(path, prepared["df"], prepared["site_clean"])
+    assert sql_backend.stored_fingerprint(path)
+    assert len(sql_backend.query_tables(path)["cap_df"]) == prepared["df"]["Country"].nunique()
+
+
+def test_cache_dir_is_next_to_the_app():
+    assert sql_backend.SQL_DIR.startswith(sql_backend.APP_DIR)
@@ -0,0 +1,33 @@
+import pytest
+
+import equivalence
+import maps
+import pipeline
+import static_site
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    df = pipeline.load_dataset(*equivalence.generate(40, seed=2), dedup="off")
+    return pipeline.compute_metrics(df)
+
+
+def test_renderer_version_follows_the_geometry(tmp_path, monkeypatch):
+    path = tmp_path / "geo.geojson"
+    monkeypatch.setattr(maps, "GEOMETRY_PATH", str(path))
+    missing = static_site.renderer_version()
+    path.write_text('{"type": "FeatureCollection", "features": []}')
+    installed = static_site.renderer_version()
+    path.write_text('{"type": "FeatureCollection", "features": [], "rebuilt": true}')
+    assert len({missing, installed, static_site.renderer_version()}) == 3
+
+
+def test_pages_draw_the_app_figures(bundle, tmp_path):
+    rendered, skipped = static_site.build_site(bundle, str(tmp_path), workers=1)
+    assert "index.html" in rendered and not skipped
+    page = (tmp_path / "index.html").read_text(encoding="utf-8")
+    for trace in ["sunburst", "heatmap", "scatter", "violin", "pie", "scatterpolar"]:
+        assert f'"type":"{trace}"' in page
+    assert "Staff Counts by Country" in page
+    # Unchanged inputs and renderer: nothing is rendered again
+    assert static_site.build_site(bundle, str(tmp_path), workers=1)[0] == []
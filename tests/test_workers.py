@@ -0,0 +1,85 @@
+import glob
+import time
+
+import pandas as pd
+import pytest
+
+import workers
+
+
+def double(df, progress):
+    progress(50, "doubling")
+    time.sleep(0.5)
+    return {"df": df * 2, "n": len(df)}
+
+
+def shm_segments():
+    return set(glob.glob("/dev/shm/psm_*"))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(workers, "WORKERS", 1)
+    yield
+    workers.shutdown()
+
+
+def test_encode_decode_round_trip_keeps_attrs_and_frees_memory():
+    before = shm_segments()
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    df.attrs["name_col"] = "b"
+    encoded = workers.encode({"df": df, "pair": (df, 3)})
+    out = workers.decode(encoded)
+    pd.testing.assert_frame_equal(out["df"], df)
+    assert out["df"].attrs["name_col"] == "b"
+    assert out["pair"][1] == 3
+    assert shm_segments() == before
+
+
+def test_release_frees_frames_never_decoded():
+    before = shm_segments()
+    workers.release(workers.encode((pd.DataFrame({"a": [1]}),)))
+    assert shm_segments() == before
+
+
+def test_non_string_columns_fall_back_to_pickle():
+    df = pd.DataFrame({0: [1.5], 1: [2.5]})
+    pd.testing.assert_frame_equal(workers.decode(workers.encode(df)), df)
+
+
+def test_concurrent_requests_share_one_future(pool):
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    first = workers.run("key", "stage", double, df)
+    second = workers.run("key", "stage", double, df)
+    assert first is second
+    result = first.result(timeout=120)
+    pd.testing.assert_frame_equal(result["df"], df * 2)
+    assert result["n"] == 3
+
+    # Once finished, the stage can run again
+    third = workers.run("key", "stage", double, df)
+    assert third is not first
+    third.result(timeout=120)
+
+
+def test_progress_reaches_the_listener(pool):
+    seen = []
+    workers.run("key2", "stage", double, pd.DataFrame({"a": [1]}),
+                progress=lambda pct, stage: seen.append((pct, stage))).result(timeout=120)
+    deadline = time.monotonic() + 5
+    while not seen and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert (50, "doubling") in seen
+
+
+def test_in_thread_mode(monkeypatch):
+    monkeypatch.setattr(workers, "WORKERS", 0)
+    out = workers.run("key3", "stage", double, pd.DataFrame({"a": [2]})).result()
+    assert out["df"]["a"].tolist() == [4]
+
+
+def test_pool_restarts_after_shutdown(pool):
+    workers.run("key4", "stage", double, pd.DataFrame({"a": [1]})).result(timeout=120)
+    workers.shutdown()
+    out = workers.run("key4", "stage", double, pd.DataFrame({"a": [1]})).result(timeout=120)
+    assert out["n"] == 1
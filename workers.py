@@ -0,0 +1,253 @@
+"""Shared process pool for the heavy pipeline stages.
+
+Ingestion and the metrics bundle are pandas-heavy and hold the GIL, so
+running them in threads serializes every session of the server. Stages
+submitted here run in a pool of worker processes shared by all sessions,
+with a single-flight registry keyed by (dataset key, stage): a second
+request for a stage that is already running waits on the same future
+instead of computing it again.
+
+DataFrames cross the process boundary as Arrow IPC streams written into a
+``multiprocessing.shared_memory`` segment: only the segment name goes
+through the executor pipe, and the receiving side copies the stream out
+once and unlinks the segment. Frames without an Arrow representation (or
+when pyarrow or shared memory is unavailable) fall back to a pickle; other
+values are pickled. Stage functions report progress through a queue that
+a listener thread in the server process dispatches to per-key callbacks.
+
+The pool size is ``DASHBOARD_WORKERS`` (default: number of cores, at most
+4); ``0`` runs the stages in the calling thread. The pool is shut down at
+interpreter exit (or with ``shutdown``), so scripts that use it exit
+normally.
+"""
+import atexit
+import multiprocessing
+import os
+import pickle
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+WORKERS = int(os.environ.get("DASHBOARD_WORKERS", min(4, os.cpu_count() or 1)))
+
+_lock = threading.Lock()
+_pool = None
+_queue = None
+_inflight = {}
+_listeners = {}
+
+# Set in worker processes by _init_worker
+_worker_queue = None
+
+
+def enabled():
+    return WORKERS > 0
+
+
+class _Frame:
+    """A DataFrame in transit: an Arrow IPC stream in shared memory (or a
+    pickle) plus its attrs. Decoded exactly once, by the receiving process."""
+
+    def __init__(self, df):
+        self.attrs = dict(df.attrs)
+        self.shm_name = None
+        self.size = 0
+        self.pickled = None
+        if pa is not None and all(isinstance(c, str) for c in df.columns) and df.columns.is_unique:
+            try:
+                table = pa.Table.from_pandas(df)
+                sink = pa.BufferOutputStream()
+                with pa.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+                self._share(sink.getvalue())
+            except (pa.ArrowException, TypeError, ValueError, OSError):
+                self.shm_name = None
+        if self.shm_name is None:
+            self.pickled = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _share(self, buf):
+        shm = shared_memory.SharedMemory(create=True, size=max(buf.size, 1))
+        try:
+            shm.buf[:buf.size] = memoryview(buf).cast("B")
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        # The receiver unlinks the segment; stop this process's resource
+        # tracker from unlinking it again (or warning) when it exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        self.shm_name, self.size = shm.name, buf.size
+        shm.close()
+
+    def frame(self):
+        if self.shm_name is not None:
+            shm = shared_memory.SharedMemory(name=self.shm_name)
+            try:
+                with shm.buf[:self.size] as view:
+                    data = pa.py_buffer(bytes(view))
+            finally:
+                shm.close()
+                shm.unlink()
+            self.shm_name = None
+            df = pa.ipc.open_stream(data).read_all().to_pandas()
+        else:
+            df = pickle.loads(self.pickled)
+        df.attrs.update(self.attrs)
+        return df
+
+    def release(self):
+        if self.shm_name is None:
+            return
+        try:
+            shm = shared_memory.SharedMemory(name=self.shm_name)
+        except FileNotFoundError:
+            pass  # already decoded on the other side
+        else:
+            shm.close()
+            shm.unlink()
+        self.shm_name = None
+
+
+def encode(value):
+    """Wrap DataFrames (top level or inside dicts and tuples) for transfer."""
+    if isinstance(value, pd.DataFrame):
+        return _Frame(value)
+    if isinstance(value, dict):
+        return {k: encode(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(encode(v) for v in value)
+    return value
+
+
+def decode(value):
+    if isinstance(value, _Frame):
+        return value.frame()
+    if isinstance(value, dict):
+        return {k: decode(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(decode(v) for v in value)
+    return value
+
+
+def release(value):
+    """Free the shared memory of frames that will never be decoded."""
+    if isinstance(value, _Frame):
+        value.release()
+    elif isinstance(value, dict):
+        for v in value.values():
+            release(v)
+    elif isinstance(value, tuple):
+        for v in value:
+            release(v)
+
+
+def _init_worker(queue):
+    global _worker_queue
+    _worker_queue = queue
+
+
+def _call(fn, key, args):
+    # Runs in a worker process
+    def progress(pct, stage):
+        _worker_queue.put((key, pct, stage))
+    return encode(fn(*decode(args), progress=progress))
+
+
+def _listen(queue):
+    while True:
+        key, pct, stage = queue.get()
+        callback = _listeners.get(key)
+        if callback is not None:
+            callback(pct, stage)
+
+
+def _get_pool():
+    global _pool, _queue
+    with _lock:
+        if _pool is None:
+            # spawn: forking a multi-threaded server process is not safe
+            ctx = multiprocessing.get_context("spawn")
+            _queue = ctx.Queue()
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=ctx,
+                                        initializer=_init_worker, initargs=(_queue,))
+            threading.Thread(target=_listen, args=(_queue,), daemon=True,
+                             name="worker-progress").start()
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+@atexit.register
+def shutdown():
+    """Stop the worker processes; the next ``run`` starts a fresh pool."""
+    with _lock:
+        _reset_pool()
+
+
+def run(key, stage, fn, *args, progress=None):
+    """Run ``fn(*args, progress=...)`` for this dataset stage; returns a Future.
+
+    ``fn`` must be a module-level function. Identical (key, stage) requests
+    made while one is in flight share its future. ``progress(pct, stage)``
+    receives the stage's progress reports.
+    """
+    with _lock:
+        future = _inflight.get((key, stage))
+        if future is not None:
+            return future
+        future = Future()
+        _inflight[(key, stage)] = future
+        if progress is not None:
+            _listeners[key] = progress
+
+    def finish(done):
+        try:
+            future.set_result(decode(done.result()))
+        except BaseException as e:
+            future.set_exception(e)
+        with _lock:
+            if isinstance(future.exception(), BrokenProcessPool):
+                # A worker died; start a fresh pool on the next request
+                _reset_pool()
+            _inflight.pop((key, stage), None)
+            if _listeners.get(key) is progress:
+                _listeners.pop(key, None)
+
+    if enabled():
+        sent = encode(args)
+
+        def finish_remote(done):
+            if done.cancelled() or isinstance(done.exception(), BrokenProcessPool):
+                # The worker never decoded the arguments
+                release(sent)
+            finish(done)
+
+        try:
+            _get_pool().submit(_call, fn, key, sent).add_done_callback(finish_remote)
+        except RuntimeError as e:  # pool shut down
+            failed = Future()
+            failed.set_exception(e)
+            finish_remote(failed)
+            release(sent)
+    else:
+        local = Future()
+        try:
+            local.set_result(fn(*args, progress=progress or (lambda pct, stage: None)))
+        except BaseException as e:
+            local.set_exception(e)
+        finish(local)
+    return future